@@ -3,45 +3,404 @@
 ZAI Plus Skill - 主入口脚本
 统一的命令行接口
 """
+import os
 import sys
-import argparse
-import logging
-from pathlib import Path
 
 # 添加项目根目录到Python路径
-project_root = Path(__file__).parent
-sys.path.insert(0, str(project_root))
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
 
-from src.analyzers.smart_analyzer import SmartVideoAnalyzer
-from src.utils.config_manager import get_config_manager
-from tools.check_environment import EnvironmentChecker
+# 注意: 模块级只导入解释器启动时已加载的 os/sys；
+# 各子命令用到的模块（包括 logging、pathlib、argparse）在命令函数内部导入，
+# 避免 version / config 等轻量命令加载分析器、执行器和进程池等重型依赖
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+DEFAULT_QUESTION = "请详细分析这个视频的内容，包括画面、声音、文案、主题等所有信息"
+DEFAULT_QUEUE_PATH = "zai_jobs.db"
+DEFAULT_RESULTS_DIR = "zai_results"
+DEFAULT_PROFILE_DIR = "zai_profile"
+VERSION = "2.1.0"
 
 
 def analyze_video(args):
     """视频分析命令"""
-    analyzer = SmartVideoAnalyzer()
-    result = analyzer.analyze(
-        args.input,
-        args.question,
-        show_plan=not args.no_plan,
-        auto_fallback=not args.no_fallback
-    )
+    from src.analyzers.smart_analyzer import SmartVideoAnalyzer, format_result, build_result_record
+
+    structured = args.output != "text"
+    analyzer = SmartVideoAnalyzer(verbose=not structured)
+    questions = args.question or [DEFAULT_QUESTION]
+
+    if len(questions) > 1:
+        # 多个问题合并为一次请求，视频只上传一次
+        result = analyzer.analyze_many(
+            args.input,
+            questions,
+            show_plan=not args.no_plan and not structured,
+            auto_fallback=not args.no_fallback,
+            session_id=args.session,
+            profile_dir=args.profile
+        )
+    else:
+        result = analyzer.analyze(
+            args.input,
+            questions[0],
+            show_plan=not args.no_plan and not structured,
+            auto_fallback=not args.no_fallback,
+            hedge_url=args.hedge_url,
+            session_id=args.session,
+            profile_dir=args.profile
+        )
+
+    if result and result.get("profile_dir"):
+        print(f"📈 剖析结果: {result['profile_dir']}（profile.pstats / allocations.txt / summary.json）", file=sys.stderr)
+
+    if structured:
+        record = build_result_record(result, args.input, questions if len(questions) > 1 else questions[0])
+        with _open_output(args.output_file, append=args.output == "jsonl") as output:
+            _write_record(output, record)
+        return 0 if record["ok"] else 1
+
+    if result:
+        print(format_result(result))
 
     if result and "error" not in result:
+        if args.session:
+            print(f"\n💬 会话已保存: {args.session}（使用 ask {args.session} \"问题\" 追问）")
         return 0
     else:
         return 1
 
 
+class _StdoutOutput:
+    """标准输出包装（作为上下文管理器使用时不关闭标准输出）"""
+
+    def __enter__(self):
+        return sys.stdout
+
+    def __exit__(self, *exc_info):
+        sys.stdout.flush()
+
+
+def _open_output(path, append=False):
+    """打开结构化结果输出（未指定文件时为标准输出）"""
+    if not path:
+        return _StdoutOutput()
+    return open(path, 'a' if append else 'w', encoding='utf-8')
+
+
+def _write_record(output, record):
+    """写入一条紧凑的JSON结果记录（一行）"""
+    import json
+
+    output.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+    output.flush()
+
+
+def ask_command(args):
+    """会话追问命令（优先使用文本上下文，无需重新上传视频）"""
+    from src.core.executor import execute_tool
+    from src.core.session_store import DEFAULT_CONTEXT_TOKENS
+    from src.analyzers.smart_analyzer import format_result
+
+    tool_input = {
+        "session_id": args.session_id,
+        "messages": [{"role": "user", "content": args.question}],
+        "max_context_tokens": args.context_tokens or DEFAULT_CONTEXT_TOKENS,
+        "refresh_media": args.refresh_media
+    }
+
+    result = execute_tool("chat_completion", tool_input)
+    if result:
+        print(format_result(result))
+
+    return 0 if result and "error" not in result else 1
+
+
+def batch_command(args):
+    """批量分析命令"""
+    from pathlib import Path
+    from src.analyzers.batch_analyzer import load_manifest
+    from src.core.job_queue import JobQueue
+    from src.core.sharding import parse_shard, select_shard
+
+    question = args.question or DEFAULT_QUESTION
+    items = load_manifest(Path(args.manifest), question)
+
+    if args.shard:
+        try:
+            index, total = parse_shard(args.shard)
+        except ValueError as e:
+            print(f"错误: {e}")
+            return 1
+
+        items = select_shard(items, index, total)
+        print(f"分片 {index}/{total}: 本节点负责 {len(items)} 个任务")
+
+    queue = JobQueue(Path(args.queue), max_attempts=args.max_attempts)
+    queue.add_jobs(items)
+
+    return _run_batch(queue, args)
+
+
+def resume_command(args):
+    """续跑命令：只执行队列中未完成的任务"""
+    from pathlib import Path
+    from src.core.job_queue import JobQueue
+
+    queue_path = Path(args.queue)
+    if not queue_path.exists():
+        print(f"错误: 任务队列不存在: {queue_path}")
+        return 1
+
+    queue = JobQueue(queue_path, max_attempts=args.max_attempts)
+    queue.requeue_unfinished(include_failed=args.retry_failed)
+
+    return _run_batch(queue, args)
+
+
+def watch_command(args):
+    """监视目录命令：持续分析目录中新出现的视频"""
+    from pathlib import Path
+    from src.core.job_queue import JobQueue
+    from src.core.watcher import FolderWatcher
+
+    directory = Path(args.directory)
+    if not directory.is_dir():
+        print(f"错误: 目录不存在: {directory}")
+        return 1
+
+    queue = JobQueue(Path(args.queue), max_attempts=args.max_attempts)
+    # 上次退出时正在执行的任务重新排队
+    queue.requeue_unfinished()
+
+    watcher = FolderWatcher(
+        directory,
+        queue,
+        args.question or DEFAULT_QUESTION,
+        settle_seconds=args.settle,
+        poll_interval=args.poll_interval
+    )
+    print(f"正在监视 {directory}（Ctrl+C 停止）", file=sys.stderr)
+
+    return _run_batch(queue, args, watcher=watcher)
+
+
+def _run_batch(queue, args, watcher=None):
+    """执行队列中的任务并打印统计（提供 watcher 时持续运行直到 Ctrl+C）"""
+    import threading
+    from pathlib import Path
+    from src.analyzers.batch_analyzer import BatchAnalyzer, export_report
+    from src.core.result_store import ResultStore
+    from src.analyzers.smart_analyzer import SmartVideoAnalyzer
+    from src.utils.memory_budget import get_memory_budget
+
+    if args.memory_budget is not None:
+        # 在创建分析器之前初始化全局预算，所有工作线程共享
+        get_memory_budget(args.memory_budget)
+
+    try:
+        result_store = ResultStore(
+            Path(args.results_dir),
+            drop_fields=[] if args.no_projection else args.drop_field,
+            compression=args.compression
+        )
+    except ValueError as e:
+        print(f"错误: {e}")
+        return 1
+
+    structured = args.output == "jsonl"
+    # 结构化输出到标准输出时，统计信息改写到标准错误
+    summary = sys.stderr if structured and not args.output_file else sys.stdout
+
+    with _open_output(args.output_file if structured else None, append=True) as output:
+        write_lock = threading.Lock()
+
+        def on_result(record):
+            with write_lock:
+                _write_record(output, record)
+
+        runner = BatchAnalyzer(
+            queue,
+            Path(args.results_dir),
+            workers=args.workers,
+            analyzer_factory=lambda: SmartVideoAnalyzer(verbose=not structured),
+            on_result=on_result if structured else None,
+            result_store=result_store,
+            shortest_first=args.order == "sjf",
+            aging_rate=args.aging_rate,
+            large_lane_workers=args.large_lane_workers
+        )
+        if watcher is None:
+            stats = runner.run()
+        else:
+            stop_event = threading.Event()
+            stats = {}
+            worker = threading.Thread(
+                target=lambda: stats.update(runner.run(stop_event)), name="batch-runner"
+            )
+            worker.start()
+            try:
+                watcher.run(stop_event)
+            except KeyboardInterrupt:
+                print("\n正在停止，等待执行中的任务完成...", file=sys.stderr)
+            finally:
+                stop_event.set()
+                worker.join()
+
+    if args.report:
+        export_report(queue, Path(args.report), result_store)
+
+    print("\n=== 批量分析统计 ===", file=summary)
+    for status, count in stats.items():
+        print(f"{status}: {count}", file=summary)
+
+    return 0 if stats.get("failed", 0) == 0 else 1
+
+
+def _add_queue_arguments(parser):
+    """添加批量/续跑命令共用的参数"""
+    parser.add_argument(
+        "--queue",
+        default=DEFAULT_QUEUE_PATH,
+        help=f"任务队列数据库文件（默认 {DEFAULT_QUEUE_PATH}）"
+    )
+    parser.add_argument(
+        "--results-dir",
+        default=DEFAULT_RESULTS_DIR,
+        help=f"分析结果保存目录（默认 {DEFAULT_RESULTS_DIR}）"
+    )
+    parser.add_argument(
+        "-j", "--workers",
+        type=int,
+        default=1,
+        help="并发工作线程数（默认 1）"
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="单个任务最大尝试次数（默认 3）"
+    )
+    parser.add_argument(
+        "--order",
+        choices=["sjf", "fifo"],
+        default="sjf",
+        help="任务执行顺序。sjf: 按预测耗时短作业优先（带老化），尽早产出结果；fifo: 按入队顺序（默认 sjf）"
+    )
+    parser.add_argument(
+        "--aging-rate",
+        type=float,
+        default=0.5,
+        help="短作业优先时每等待1秒抵扣的预测耗时（秒），避免大任务被饿死（默认 0.5）"
+    )
+    parser.add_argument(
+        "--large-lane-workers",
+        type=int,
+        default=0,
+        help="大任务通道的工作线程数：预测耗时较长的任务只由这些线程执行，其余线程专门处理小任务（默认 0，不分通道）"
+    )
+    parser.add_argument(
+        "--compression",
+        choices=["auto", "zstd", "gzip"],
+        default="auto",
+        help="结果存储的压缩方式（auto: 安装了 zstandard 时使用 zstd，否则 gzip）"
+    )
+    parser.add_argument(
+        "--drop-field",
+        action="append",
+        help="写入结果存储前丢弃的字段路径，可重复指定（默认丢弃 choices.*.message.reasoning_content 及响应元数据）"
+    )
+    parser.add_argument(
+        "--no-projection",
+        action="store_true",
+        help="保留API响应的全部字段"
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        help="并发Base64分析的内存预算（MB，默认取配置 memory_budget_mb 或物理内存的一半）"
+    )
+    parser.add_argument(
+        "--report",
+        help="结束后将结果导出为JSONL报告"
+    )
+    parser.add_argument(
+        "--output",
+        choices=["text", "jsonl"],
+        default="text",
+        help="jsonl: 每个任务结束时立即输出一行结构化结果记录（默认 text）"
+    )
+    parser.add_argument(
+        "--output-file",
+        help="结构化结果追加写入的文件（默认标准输出）"
+    )
+
+
+def merge_command(args):
+    """合并各分片报告"""
+    from pathlib import Path
+    from src.analyzers.batch_analyzer import merge_reports
+
+    count = merge_reports([Path(p) for p in args.reports], Path(args.output))
+    print(f"✅ 已合并 {count} 条记录到 {args.output}")
+    return 0
+
+
+def images_command(args):
+    """批量图像理解命令（逐图JSONL流式输出）"""
+    import json
+    import logging
+    from pathlib import Path
+    from src.analyzers.image_batch_analyzer import ImageBatchAnalyzer, load_image_list
+    from src.utils.image_preprocessor import ImagePreprocessor, DEFAULT_MAX_EDGE, DEFAULT_IMAGE_FORMAT
+
+    images = list(args.images)
+    if args.list_file:
+        images.extend(load_image_list(Path(args.list_file)))
+
+    if not images:
+        print("错误: 需要提供图像路径/URL或清单文件")
+        return 1
+
+    try:
+        preprocessor = ImagePreprocessor(
+            max_edge=args.max_edge or DEFAULT_MAX_EDGE,
+            image_format=args.image_format or DEFAULT_IMAGE_FORMAT,
+            workers=args.cpu_workers
+        )
+    except ValueError as e:
+        print(f"错误: {e}")
+        return 1
+
+    analyzer = ImageBatchAnalyzer(
+        max_images_per_request=args.per_request,
+        max_payload_mb=args.max_payload_mb,
+        max_tokens_per_request=args.max_tokens,
+        workers=args.workers,
+        rate_limit=args.rps,
+        preprocessor=preprocessor
+    )
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    failed = 0
+
+    try:
+        for record in analyzer.analyze_stream(images, args.question):
+            if record.get("error"):
+                failed += 1
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    logging.info(f"图像分析完成: 共 {len(images)} 张，失败 {failed} 张")
+    return 0 if failed == 0 else 1
+
+
 def check_env(args):
     """环境检查命令"""
+    from tools.check_environment import EnvironmentChecker
+
     checker = EnvironmentChecker()
     success = checker.run_all_checks()
     return 0 if success else 1
@@ -49,6 +408,8 @@ def check_env(args):
 
 def config_command(args):
     """配置管理命令"""
+    from src.utils.config_manager import get_config_manager
+
     manager = get_config_manager()
 
     if args.action == "show":
@@ -75,6 +436,26 @@ def config_command(args):
             print("❌ 设置失败")
             return 1
 
+    elif args.action == "set-upload":
+        if not args.value:
+            print("错误: 需要提供存储桶名称")
+            return 1
+
+        bucket = None if args.value.lower() == "none" else args.value
+        success = manager.set_preference("upload_bucket", bucket)
+        if success and args.endpoint:
+            success = manager.set_preference("upload_endpoint", args.endpoint)
+
+        if not success:
+            print("❌ 设置失败")
+            return 1
+
+        if bucket:
+            print(f"✅ 大文件将上传到存储桶 {bucket} 后按URL分析（凭证读取 AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY）")
+        else:
+            print("✅ 已关闭自动上传")
+        return 0
+
     elif args.action == "reset":
         success = manager.reset_preferences()
         if success:
@@ -87,8 +468,28 @@ def config_command(args):
     return 0
 
 
-def main():
-    """主函数"""
+def show_version(args=None):
+    """版本信息命令"""
+    print(f"ZAI Plus Skill v{VERSION}")
+    print("智谱AI多模态分析技能包")
+    return 0
+
+
+def _install_transport(args):
+    """按 --record / --replay 替换执行器的脚本执行后端"""
+    from src.core.executor import set_script_backend
+    from src.core.transport import FixtureStore, RecordingBackend, ReplayBackend
+
+    if args.record:
+        set_script_backend(RecordingBackend(FixtureStore(args.record)))
+    else:
+        set_script_backend(ReplayBackend(FixtureStore(args.replay), args.replay_timing))
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    import argparse
+
     parser = argparse.ArgumentParser(
         description="ZAI Plus Skill - 智谱AI多模态分析工具",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -97,19 +498,62 @@ def main():
   # 分析视频
   %(prog)s analyze "http://example.com/video.mp4"
   %(prog)s analyze "D:\\Video\\sample.mp4" -q "提取文案"
+  %(prog)s analyze "D:\\Video\\sample.mp4" -q "提取文案" -q "列出出现的商品"
+  %(prog)s analyze "http://example.com/video.mp4" --output jsonl --output-file results.jsonl
+
+  # 会话追问（追问只发送文本上下文）
+  %(prog)s analyze "http://example.com/video.mp4" --session demo
+  %(prog)s ask demo "视频里的主持人说了哪些产品卖点？"
+
+  # 批量分析（中断后可续跑）
+  %(prog)s batch videos.txt -j 4
+  %(prog)s resume
+
+  # 监视目录（新视频写入完成后自动分析，重启不会重复分析）
+  %(prog)s watch ./inbox -j 2 --output jsonl --output-file results.jsonl
+
+  # 多节点分片（各节点处理自己的分片后合并报告）
+  %(prog)s batch videos.txt --shard 0/4 --report shard0.jsonl
+  %(prog)s merge shard0.jsonl shard1.jsonl shard2.jsonl shard3.jsonl -o report.jsonl
+
+  # 批量图像理解
+  %(prog)s images -f images.txt -q "给图片打标签" -o tags.jsonl
 
   # 环境检查
   %(prog)s check
 
+  # 录制真实请求，之后离线回放（不访问网络，可按原始耗时或加速回放）
+  %(prog)s --record fixtures analyze "http://example.com/video.mp4"
+  %(prog)s --replay fixtures --replay-timing 0 analyze "http://example.com/video.mp4"
+
   # 配置管理
   %(prog)s config show
   %(prog)s config set-strategy auto
+  %(prog)s config set-upload my-bucket --endpoint http://127.0.0.1:9000
   %(prog)s config reset
 
 版本: 2.1.0
         """
     )
 
+    transport_group = parser.add_mutually_exclusive_group()
+    transport_group.add_argument(
+        "--record",
+        metavar="DIR",
+        help="录制模式：照常请求接口，并把请求/响应对（不含API密钥）保存到夹具目录"
+    )
+    transport_group.add_argument(
+        "--replay",
+        metavar="DIR",
+        help="回放模式：从夹具目录返回录制的响应，不访问网络"
+    )
+    parser.add_argument(
+        "--replay-timing",
+        type=float,
+        default=1.0,
+        help="回放耗时缩放：1 按录制耗时，0.5 两倍速，0 立即返回（默认 1）"
+    )
+
     subparsers = parser.add_subparsers(dest="command", help="可用命令")
 
     # analyze命令
@@ -117,8 +561,8 @@ def main():
     analyze_parser.add_argument("input", help="视频URL或文件路径")
     analyze_parser.add_argument(
         "-q", "--question",
-        default="请详细分析这个视频的内容，包括画面、声音、文案、主题等所有信息",
-        help="分析问题"
+        action="append",
+        help="分析问题（可重复指定多个，合并为一次请求）"
     )
     analyze_parser.add_argument(
         "--no-plan",
@@ -130,8 +574,118 @@ def main():
         action="store_true",
         help="禁用失败自动切换"
     )
+    analyze_parser.add_argument(
+        "--hedge-url",
+        help="同一视频的在线URL，本地小文件响应过慢时并行使用URL方式（对冲请求）"
+    )
+    analyze_parser.add_argument(
+        "--output",
+        choices=["text", "json", "jsonl"],
+        default="text",
+        help="输出格式：text 为可读文本；json/jsonl 为紧凑的结构化结果记录，不打印提示信息（默认 text）"
+    )
+    analyze_parser.add_argument(
+        "--output-file",
+        help="结构化结果写入的文件（json 覆盖写入，jsonl 追加一行；默认标准输出）"
+    )
+    analyze_parser.add_argument(
+        "--session",
+        help="会话ID：保存本次问答和视频描述，之后可用 ask 命令追问"
+    )
+    analyze_parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=DEFAULT_PROFILE_DIR,
+        metavar="DIR",
+        help=f"记录 cProfile、内存分配和子进程资源用量到剖析目录（默认 {DEFAULT_PROFILE_DIR}）"
+    )
     analyze_parser.set_defaults(func=analyze_video)
 
+    # ask命令
+    ask_parser = subparsers.add_parser("ask", help="在已有会话中追问")
+    ask_parser.add_argument("session_id", help="会话ID（analyze --session 指定）")
+    ask_parser.add_argument("question", help="追问内容")
+    ask_parser.add_argument(
+        "--context-tokens",
+        type=int,
+        help="历史上下文Token预算，超出时省略较早的对话（默认 6000）"
+    )
+    ask_parser.add_argument(
+        "--refresh-media",
+        action="store_true",
+        help="强制重新发送视频（仅在线URL视频）"
+    )
+    ask_parser.set_defaults(func=ask_command)
+
+    # batch命令
+    batch_parser = subparsers.add_parser("batch", help="批量分析（任务状态持久化）")
+    batch_parser.add_argument("manifest", help="任务清单文件（每行一个URL/路径或JSON对象）")
+    batch_parser.add_argument(
+        "-q", "--question",
+        help="清单中未指定问题时使用的分析问题"
+    )
+    batch_parser.add_argument(
+        "--shard",
+        help="只处理清单中属于本节点的分片，格式 i/N（例如 0/4）"
+    )
+    _add_queue_arguments(batch_parser)
+    batch_parser.set_defaults(func=batch_command)
+
+    # resume命令
+    resume_parser = subparsers.add_parser("resume", help="续跑批量任务中未完成的部分")
+    resume_parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="同时重试已失败的任务"
+    )
+    _add_queue_arguments(resume_parser)
+    resume_parser.set_defaults(func=resume_command)
+
+    # watch命令
+    watch_parser = subparsers.add_parser("watch", help="监视目录，持续分析新出现的视频")
+    watch_parser.add_argument("directory", help="监视的目录")
+    watch_parser.add_argument(
+        "-q", "--question",
+        help="对每个新视频提出的分析问题"
+    )
+    watch_parser.add_argument(
+        "--settle",
+        type=float,
+        default=5.0,
+        help="文件大小保持不变多少秒后才开始分析（默认 5）"
+    )
+    watch_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=2.0,
+        help="目录轮询间隔（秒，默认 2）"
+    )
+    _add_queue_arguments(watch_parser)
+    watch_parser.set_defaults(func=watch_command)
+
+    # merge命令
+    merge_parser = subparsers.add_parser("merge", help="合并各分片的JSONL报告")
+    merge_parser.add_argument("reports", nargs="+", help="分片报告文件")
+    merge_parser.add_argument("-o", "--output", required=True, help="合并后的报告文件")
+    merge_parser.set_defaults(func=merge_command)
+
+    # images命令
+    images_parser = subparsers.add_parser("images", help="批量图像理解（多图打包并发请求）")
+    images_parser.add_argument("images", nargs="*", help="图像路径或URL")
+    images_parser.add_argument("-f", "--list-file", help="图像清单文件（每行一个路径或URL）")
+    images_parser.add_argument("-q", "--question", default="请描述这张图片", help="对每张图像提出的问题")
+    images_parser.add_argument("-o", "--output", help="JSONL结果输出文件（默认输出到标准输出）")
+    images_parser.add_argument("--per-request", type=int, default=8, help="单次请求最多图像数（默认 8）")
+    images_parser.add_argument("--max-payload-mb", type=float, default=10.0, help="单次请求最大负载MB（默认 10）")
+    images_parser.add_argument("--max-tokens", type=int, default=16000, help="单次请求图像Token预算（默认 16000）")
+    images_parser.add_argument("-j", "--workers", type=int, default=4, help="并发请求数（默认 4）")
+    images_parser.add_argument("--rps", type=float, default=2.0, help="每秒最多请求数，0 表示不限速（默认 2）")
+    images_parser.add_argument("--max-edge", type=int, help="本地图像缩放后的最长边像素（默认 1536）")
+    images_parser.add_argument("--image-format", choices=["jpeg", "webp"], help="本地图像重新压缩格式（默认 jpeg）")
+    images_parser.add_argument("--cpu-workers", type=int, default=None,
+                               help="图像预处理进程数（默认CPU核数，0 表示在主进程处理）")
+    images_parser.set_defaults(func=images_command)
+
     # check命令
     check_parser = subparsers.add_parser("check", help="检查运行环境")
     check_parser.set_defaults(func=check_env)
@@ -140,29 +694,50 @@ def main():
     config_parser = subparsers.add_parser("config", help="配置管理")
     config_parser.add_argument(
         "action",
-        choices=["show", "set-strategy", "reset"],
+        choices=["show", "set-strategy", "set-upload", "reset"],
         help="配置操作"
     )
     config_parser.add_argument(
         "value",
         nargs="?",
-        help="配置值（仅用于set-strategy）"
+        help="配置值（set-strategy: 策略；set-upload: 存储桶名称，\"none\" 表示关闭上传）"
+    )
+    config_parser.add_argument(
+        "--endpoint",
+        help="S3兼容服务地址（仅用于set-upload，例如 http://127.0.0.1:9000）"
     )
     config_parser.set_defaults(func=config_command)
 
     # version命令
     version_parser = subparsers.add_parser("version", help="显示版本信息")
+    version_parser.set_defaults(func=show_version)
+
+    return parser
 
+
+def main():
+    """主函数"""
+    # version 调用频繁（任务包装器每次执行都会调用），跳过参数解析器构建和日志配置
+    if sys.argv[1:] == ["version"]:
+        return show_version()
+
+    import logging
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    parser = build_parser()
     args = parser.parse_args()
 
     if args.command is None:
         parser.print_help()
         return 0
 
-    if args.command == "version":
-        print("ZAI Plus Skill v2.1.0")
-        print("智谱AI多模态分析技能包")
-        return 0
+    if args.record or args.replay:
+        _install_transport(args)
 
     if hasattr(args, "func"):
         try:
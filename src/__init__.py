@@ -2,13 +2,43 @@
 ZAI Plus Skill - 智谱AI多模态分析技能包
 支持文本、图像、视频的智能分析
 """
+import importlib
+import sys
+from typing import Dict, Callable, Any
 
 __version__ = "2.1.0"
 __author__ = "ZAI Plus Skill Team"
 __description__ = "智谱AI多模态分析技能包，支持智能路由和自动策略选择"
 
-from src.core.router import VideoRouter
-from src.analyzers.smart_analyzer import SmartVideoAnalyzer
+
+def _lazy_loader(package: str, exports: Dict[str, str]) -> Callable[[str], Any]:
+    """
+    生成包级 __getattr__（PEP 562）：首次访问导出名称时才导入对应子模块，
+    使导入任意子模块不会连带加载执行器、进程池等重型依赖
+
+    Args:
+        package: 包名（传入 __name__）
+        exports: {导出名称: 所在模块}
+
+    Returns:
+        Callable: 包的 __getattr__ 函数
+    """
+    def __getattr__(name: str) -> Any:
+        module_name = exports.get(name)
+        if module_name is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+
+        value = getattr(importlib.import_module(module_name), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    return __getattr__
+
+
+__getattr__ = _lazy_loader(__name__, {
+    "VideoRouter": "src.core.router",
+    "SmartVideoAnalyzer": "src.analyzers.smart_analyzer",
+})
 
 __all__ = [
     "VideoRouter",
@@ -2,11 +2,22 @@
 分析器模块
 包含视频分析器和智能分析器
 """
+from src import _lazy_loader
 
-from src.analyzers.video_analyzer import VideoAnalyzer
-from src.analyzers.smart_analyzer import SmartVideoAnalyzer
+__getattr__ = _lazy_loader(__name__, {
+    "VideoAnalyzer": "src.analyzers.video_analyzer",
+    "SmartVideoAnalyzer": "src.analyzers.smart_analyzer",
+    "BatchAnalyzer": "src.analyzers.batch_analyzer",
+    "ImageBatchAnalyzer": "src.analyzers.image_batch_analyzer",
+    "AnalysisScheduler": "src.analyzers.scheduler",
+    "Priority": "src.analyzers.scheduler",
+})
 
 __all__ = [
     "VideoAnalyzer",
     "SmartVideoAnalyzer",
+    "BatchAnalyzer",
+    "ImageBatchAnalyzer",
+    "AnalysisScheduler",
+    "Priority",
 ]
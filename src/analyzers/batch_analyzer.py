@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+批量视频分析工具
+从持久化任务队列领取任务并执行分析，支持中断后续跑
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterable
+
+from src.core.job_queue import JobQueue, JobStatus, Lane, DEFAULT_AGING_RATE, job_digest
+from src.core.result_store import ResultStore
+from src.core.router import VideoRouter
+from src.analyzers.smart_analyzer import SmartVideoAnalyzer, build_result_record
+from src.utils.cpu_executor import get_cpu_executor
+
+logger = logging.getLogger(__name__)
+
+# 持续运行模式下队列为空时的轮询间隔（秒）
+IDLE_POLL_INTERVAL = 1.0
+
+# 预测耗时达到该值（秒）的任务进入大任务通道（约为20MB的Base64任务）
+DEFAULT_LARGE_JOB_SECONDS = 120.0
+
+# 预测任务耗时的并发数（URL输入需要预检请求）
+PRICING_WORKERS = 8
+
+
+def load_manifest(manifest_path: Path, default_question: str) -> List[Tuple[str, str]]:
+    """
+    读取批量任务清单
+
+    每行一个任务：可以是视频URL/文件路径，也可以是
+    {"input": "...", "question": "..."} 形式的JSON对象；空行和 # 开头的行会被忽略
+
+    Args:
+        manifest_path: 清单文件路径
+        default_question: 未指定问题时使用的默认问题
+
+    Returns:
+        List[Tuple[str, str]]: (视频输入, 问题) 列表
+    """
+    items = []
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            if line.startswith("{"):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"清单第 {line_no} 行JSON格式错误: {e}")
+
+                if not entry.get("input"):
+                    raise ValueError(f"清单第 {line_no} 行缺少 input 字段")
+
+                items.append((entry["input"], entry.get("question") or default_question))
+            else:
+                items.append((line, default_question))
+
+    return items
+
+
+def export_report(queue: JobQueue, report_path: Path, result_store: Optional[ResultStore] = None) -> int:
+    """
+    将队列中已结束（完成或失败）的任务导出为JSONL报告，结果内容内联
+
+    Args:
+        queue: 任务队列
+        report_path: 报告文件路径
+        result_store: 结果存储（按任务摘要读取结果）；旧版逐任务JSON文件仍可直接读取
+
+    Returns:
+        int: 导出的记录数
+    """
+    count = 0
+    report_path = Path(report_path)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(report_path, 'w', encoding='utf-8') as f:
+        for job in queue.list_jobs():
+            if job["status"] not in (JobStatus.DONE.value, JobStatus.FAILED.value):
+                continue
+
+            record = {key: job[key] for key in (
+                "digest", "input", "question", "status", "strategy", "attempts", "error",
+                "prompt_tokens", "completion_tokens", "total_tokens"
+            )}
+            record["result"] = None
+
+            if job["result_path"] and job["result_path"].endswith(".json"):
+                if Path(job["result_path"]).exists():
+                    with open(job["result_path"], 'r', encoding='utf-8') as rf:
+                        record["result"] = json.load(rf)
+            elif result_store is not None:
+                record["result"] = result_store.get(job["digest"])
+
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+
+    logger.info(f"报告已导出: {report_path} ({count} 条)")
+    return count
+
+
+def merge_reports(report_paths: Iterable[Path], output_path: Path) -> int:
+    """
+    合并多个分片的JSONL报告（按任务摘要去重，完成记录优先于失败记录）
+
+    Args:
+        report_paths: 各分片报告路径
+        output_path: 合并后的报告路径
+
+    Returns:
+        int: 合并后的记录数
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+
+    for report_path in report_paths:
+        with open(report_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+
+                record = json.loads(line)
+                existing = merged.get(record["digest"])
+                if existing is None or (
+                    existing["status"] != JobStatus.DONE.value
+                    and record["status"] == JobStatus.DONE.value
+                ):
+                    merged[record["digest"]] = record
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for record in merged.values():
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    logger.info(f"已合并 {len(merged)} 条记录到 {output_path}")
+    return len(merged)
+
+
+class BatchAnalyzer:
+    """批量视频分析器 - 多个工作线程共享一个持久化任务队列"""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        results_dir: Path,
+        workers: int = 1,
+        analyzer_factory: Callable[[], SmartVideoAnalyzer] = SmartVideoAnalyzer,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+        result_store: Optional[ResultStore] = None,
+        shortest_first: bool = True,
+        aging_rate: float = DEFAULT_AGING_RATE,
+        large_lane_workers: int = 0,
+        large_job_seconds: float = DEFAULT_LARGE_JOB_SECONDS,
+        router: Optional[VideoRouter] = None
+    ):
+        """
+        初始化批量分析器
+
+        Args:
+            queue: 任务队列
+            results_dir: 分析结果保存目录（未提供 result_store 时在此目录创建结果存储）
+            workers: 并发工作线程数
+            analyzer_factory: 分析器工厂（每个工作线程使用独立的分析器实例）
+            on_result: 任务结束（完成或最终失败）时的回调，参数为结果记录
+                （见 build_result_record，附加 digest、attempts 和 cache_hit）；在工作线程中调用
+            result_store: 结果存储，同时作为结果缓存：本地文件按内容摘要 + 问题查找（文件被修改后不会命中旧结果），
+                URL按任务摘要查找；已有结果的任务不再重复分析
+            shortest_first: 按路由器预测的耗时短作业优先执行（带老化），否则按入队顺序
+            aging_rate: 每等待1秒抵扣的预测耗时（秒）
+            large_lane_workers: 大任务通道的工作线程数。大于0时大任务只由这些线程执行
+                （没有大任务时它们也执行小任务），其余线程只执行小任务，避免大任务占满所有线程
+            large_job_seconds: 进入大任务通道的预测耗时阈值（秒）
+            router: 用于预测任务耗时的路由器，默认新建
+        """
+        self.queue = queue
+        self.results_dir = Path(results_dir)
+        self.result_store = result_store or ResultStore(self.results_dir)
+        self.workers = max(1, workers)
+        self.analyzer_factory = analyzer_factory
+        self.on_result = on_result
+        self.shortest_first = shortest_first
+        self.aging_rate = aging_rate
+        # 至少保留一个只执行小任务的线程
+        self.large_lane_workers = max(0, min(large_lane_workers, self.workers - 1))
+        self.large_job_seconds = large_job_seconds
+        self.router = router or VideoRouter()
+        self._pricing_lock = threading.Lock()
+
+    def run(self, stop_event: Optional[threading.Event] = None) -> Dict[str, int]:
+        """
+        执行队列中的待处理任务
+
+        Args:
+            stop_event: 停止信号（可选）。未提供时队列为空即结束；
+                提供时持续等待新任务（例如监视目录模式），直到信号置位
+
+        Returns:
+            Dict: 执行结束后各状态任务数量
+        """
+        self.price_pending()
+
+        threads = [
+            threading.Thread(
+                target=self._worker_loop,
+                args=(stop_event, self._worker_lane(i)),
+                name=f"batch-worker-{i}",
+                daemon=True
+            )
+            for i in range(self.workers)
+        ]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = self.queue.stats()
+        logger.info(f"批量分析结束: {stats}")
+        return stats
+
+    def _worker_lane(self, index: int) -> Optional[Lane]:
+        """工作线程所属的通道：未启用通道时为None"""
+        if self.large_lane_workers <= 0:
+            return None
+        return Lane.LARGE if index < self.large_lane_workers else Lane.SMALL
+
+    def price_pending(self) -> int:
+        """
+        用路由器预测尚未定价的待执行任务的耗时，并划分执行通道
+
+        Returns:
+            int: 本次定价的任务数
+        """
+        if not self.shortest_first and self.large_lane_workers <= 0:
+            return 0
+
+        priced = 0
+        # 多个工作线程同时发现新任务时只由一个线程定价，其余线程等待定价完成后再领取
+        with self._pricing_lock:
+            while True:
+                jobs = self.queue.unpriced_jobs()
+                if not jobs:
+                    return priced
+
+                with ThreadPoolExecutor(max_workers=PRICING_WORKERS) as pool:
+                    costs = list(pool.map(lambda job: self.router.estimate_cost(job["input"]), jobs))
+
+                self.queue.set_costs(
+                    (job["id"], cost, Lane.LARGE if cost >= self.large_job_seconds else Lane.SMALL)
+                    for job, cost in zip(jobs, costs)
+                )
+                priced += len(jobs)
+                logger.info(f"已预测 {len(jobs)} 个任务的耗时")
+
+    def _claim(self, lane: Optional[Lane]) -> Optional[Dict[str, Any]]:
+        """按排序方式和所属通道领取任务"""
+        if lane is None:
+            return self.queue.claim(self.shortest_first, self.aging_rate)
+
+        job = self.queue.claim(self.shortest_first, self.aging_rate, lane)
+        if job is None and lane == Lane.LARGE:
+            # 大任务通道空闲时帮助执行小任务
+            job = self.queue.claim(self.shortest_first, self.aging_rate, Lane.SMALL)
+        return job
+
+    def _worker_loop(self, stop_event: Optional[threading.Event] = None, lane: Optional[Lane] = None) -> None:
+        """工作线程主循环：领取任务 → 分析 → 记录结果"""
+        analyzer = self.analyzer_factory()
+
+        while stop_event is None or not stop_event.is_set():
+            # 持续运行模式下会有新任务入队，领取前先为其定价
+            self.price_pending()
+            job = self._claim(lane)
+            if job is None:
+                if stop_event is None:
+                    return
+                stop_event.wait(IDLE_POLL_INTERVAL)
+                continue
+
+            self.process_job(analyzer, job)
+
+    def process_job(self, analyzer: SmartVideoAnalyzer, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        执行单个任务并更新队列状态
+
+        Args:
+            analyzer: 分析器实例
+            job: 任务记录
+
+        Returns:
+            Optional[Dict]: 分析结果
+        """
+        logger.info(f"开始任务 #{job['id']} (第 {job['attempts']} 次尝试): {job['input'][:100]}")
+
+        cache_key = self._cache_key(job)
+        cached = self.result_store.get(cache_key) if cache_key else None
+        if cached is not None:
+            logger.info(f"任务 #{job['id']} 命中结果缓存")
+            self._link_job_result(job, cache_key)
+            cached["cache_hit"] = True
+            self.queue.mark_done(
+                job["id"],
+                strategy=cached.get("strategy"),
+                result_path=str(self.result_store.directory),
+                usage=cached.get("usage")
+            )
+            self._emit(job, cached)
+            return cached
+
+        try:
+            result = analyzer.analyze(job["input"], job["question"], show_plan=False)
+        except Exception as e:
+            result = {"error": str(e)}
+
+        if not result or "error" in result:
+            error = (result or {}).get("error", "未返回结果")
+            logger.error(f"任务 #{job['id']} 失败: {error}")
+            self.queue.mark_failed(job["id"], str(error), job["attempts"])
+            if job["attempts"] >= self.queue.max_attempts:
+                self._emit(job, result)
+            return result
+
+        # 结果按缓存键存入压缩结果存储（任务摘要指向同一条结果，供导出报告读取），队列中记录存储目录
+        if cache_key:
+            self.result_store.put(cache_key, result)
+            self._link_job_result(job, cache_key)
+        else:
+            self.result_store.put(job["digest"], result)
+
+        self.queue.mark_done(
+            job["id"],
+            strategy=result.get("strategy"),
+            result_path=str(self.result_store.directory),
+            usage=result.get("usage")
+        )
+        logger.info(f"任务 #{job['id']} 完成")
+        self._emit(job, result)
+        return result
+
+    def _cache_key(self, job: Dict[str, Any]) -> Optional[str]:
+        """
+        计算结果缓存键：本地文件为 内容摘要 + 问题（同一路径的文件被修改或替换后不再命中旧结果，
+        内容相同的不同路径共用结果），URL 为任务摘要
+
+        Args:
+            job: 任务记录
+
+        Returns:
+            Optional[str]: 缓存键，文件无法读取时返回None（不使用缓存）
+        """
+        if self.router.is_url(job["input"]):
+            return job["digest"]
+
+        try:
+            content_digest = get_cpu_executor().file_digest(job["input"])
+        except OSError as e:
+            logger.warning(f"任务 #{job['id']} 读取文件失败，不使用结果缓存: {e}")
+            return None
+        return job_digest(content_digest, job["question"])
+
+    def _link_job_result(self, job: Dict[str, Any], cache_key: str) -> None:
+        """让任务摘要指向缓存键下的结果（两者不同时），导出报告按任务摘要读取"""
+        if cache_key != job["digest"]:
+            self.result_store.link(job["digest"], cache_key)
+
+    def _emit(self, job: Dict[str, Any], result: Optional[Dict[str, Any]]) -> None:
+        """将任务结果转换为结果记录并交给回调"""
+        if self.on_result is None:
+            return
+
+        record = build_result_record(result, job["input"], job["question"])
+        record["digest"] = job["digest"]
+        record["attempts"] = job["attempts"]
+        record["cache_hit"] = bool((result or {}).get("cache_hit", False))
+
+        try:
+            self.on_result(record)
+        except Exception as e:
+            logger.error(f"结果回调失败: {e}")
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+批量图像理解工具
+将大量图像按负载大小和Token预算打包成多图请求，多组并发执行并以流式返回逐图结果
+"""
+import re
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterator
+
+from src.core.executor import execute_tool
+from src.analyzers.smart_analyzer import split_multi_answers
+from src.utils.rate_limiter import RateLimiter
+from src.utils.image_preprocessor import ImagePreprocessor, is_remote_image
+from src.utils.cpu_executor import get_cpu_executor
+
+logger = logging.getLogger(__name__)
+
+# 单张图像的预估Token数（偏保守，用于请求打包）
+IMAGE_TOKENS_ESTIMATE = 1600
+
+# 多图回答的分隔标记，例如 "[IMG1]"
+IMAGE_MARKER_PATTERN = re.compile(r'^\s*(?:#+\s*)?\[IMG(\d+)\]\s*', re.MULTILINE)
+
+
+def load_image_list(list_path: Path) -> List[str]:
+    """
+    读取图像清单文件（每行一个路径或URL，忽略空行和 # 开头的行）
+
+    Args:
+        list_path: 清单文件路径
+
+    Returns:
+        List[str]: 图像列表
+    """
+    with open(list_path, 'r', encoding='utf-8') as f:
+        return [
+            line.strip() for line in f
+            if line.strip() and not line.strip().startswith("#")
+        ]
+
+
+def build_multi_image_prompt(question: str, count: int) -> str:
+    """
+    构建多图请求的提示词
+
+    Args:
+        question: 对每张图像提出的问题
+        count: 图像数量
+
+    Returns:
+        str: 提示词
+    """
+    return (
+        f"上面依次给出了 {count} 张图片，编号为 1 到 {count}。"
+        f"请对每一张图片分别回答下面的问题。\n"
+        f"回答格式要求：每张图片的回答必须单独以一行标记开头，标记格式为 [IMG编号]，"
+        f"例如 [IMG1]，不要遗漏任何图片。\n\n"
+        f"问题: {question}"
+    )
+
+
+class ImageBatchAnalyzer:
+    """批量图像分析器 - 多图打包 + 并发执行 + 流式输出"""
+
+    def __init__(
+        self,
+        max_images_per_request: int = 8,
+        max_payload_mb: float = 10.0,
+        max_tokens_per_request: int = 16000,
+        workers: int = 4,
+        rate_limit: float = 2.0,
+        preprocessor: Optional[ImagePreprocessor] = None
+    ):
+        """
+        初始化批量图像分析器
+
+        Args:
+            max_images_per_request: 单次请求最多包含的图像数
+            max_payload_mb: 单次请求的最大负载（MB，按Base64编码后大小计算）
+            max_tokens_per_request: 单次请求的图像Token预算
+            workers: 并发请求数
+            rate_limit: 每秒最多发起的请求数（<= 0 表示不限速）
+            preprocessor: 本地图像预处理器（缩放/压缩，进程池执行），默认使用默认参数创建
+        """
+        self.max_images_per_request = max(1, max_images_per_request)
+        self.max_payload_bytes = int(max_payload_mb * 1024 * 1024)
+        self.max_tokens_per_request = max_tokens_per_request
+        self.workers = max(1, workers)
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.preprocessor = preprocessor or ImagePreprocessor()
+
+    def estimate_payload_bytes(self, image: str) -> int:
+        """
+        估算单张图像在请求中的负载大小
+
+        Args:
+            image: 图像路径或URL
+
+        Returns:
+            int: 负载字节数（本地文件按原图Base64编码后的大小估算，为预处理后的上限）
+        """
+        if is_remote_image(image):
+            return len(image)
+
+        try:
+            size = Path(image).stat().st_size
+        except OSError:
+            return 0
+
+        return (size + 2) // 3 * 4
+
+    def plan_groups(self, images: List[str]) -> List[List[str]]:
+        """
+        按图像数、负载和Token预算将图像顺序打包成请求组
+
+        Args:
+            images: 图像列表
+
+        Returns:
+            List[List[str]]: 请求分组
+        """
+        groups: List[List[str]] = []
+        current: List[str] = []
+        current_bytes = 0
+
+        for image in images:
+            payload = self.estimate_payload_bytes(image)
+            tokens = (len(current) + 1) * IMAGE_TOKENS_ESTIMATE
+
+            if current and (
+                len(current) >= self.max_images_per_request
+                or current_bytes + payload > self.max_payload_bytes
+                or tokens > self.max_tokens_per_request
+            ):
+                groups.append(current)
+                current, current_bytes = [], 0
+
+            current.append(image)
+            current_bytes += payload
+
+        if current:
+            groups.append(current)
+
+        return groups
+
+    def _analyze_group(self, group_index: int, group: List[str], question: str) -> List[Dict[str, Any]]:
+        """
+        执行一个多图请求并拆分为逐图结果
+
+        Args:
+            group_index: 分组序号
+            group: 本组图像
+            question: 分析问题
+
+        Returns:
+            List[Dict]: 逐图结果记录
+        """
+        records = [{"image": image, "group": group_index, "answer": None, "error": None} for image in group]
+
+        # 本地图像提交到进程池预处理；无法读取的图像单独标记失败，其余图像照常请求
+        futures = {
+            id(record): self.preprocessor.submit(record["image"])
+            for record in records
+            if not is_remote_image(record["image"])
+        }
+
+        pending, image_urls = [], []
+        for record in records:
+            future = futures.get(id(record))
+            if future is None:
+                image_urls.append(record["image"])
+                pending.append(record)
+                continue
+
+            try:
+                data, mime_type = future.result()
+            except Exception as e:
+                record["error"] = str(e)
+                continue
+
+            image_urls.append(f"data:{mime_type};base64,{get_cpu_executor().b64encode(data)}")
+            pending.append(record)
+
+        if not pending:
+            return records
+
+        prompt = question if len(pending) == 1 else build_multi_image_prompt(question, len(pending))
+
+        self.rate_limiter.acquire()
+        result = execute_tool("image_understanding", {"image_urls": image_urls, "question": prompt})
+
+        if not result or "error" in result:
+            error = (result or {}).get("error", "未返回结果")
+            for record in pending:
+                record["error"] = str(error)
+            return records
+
+        content = ""
+        if "choices" in result and len(result["choices"]) > 0:
+            content = result["choices"][0].get("message", {}).get("content", "")
+
+        if len(pending) == 1:
+            answers = [content]
+        else:
+            answers = split_multi_answers(content, len(pending), IMAGE_MARKER_PATTERN)
+
+        usage = result.get("usage")
+        for record, answer in zip(pending, answers):
+            record["answer"] = answer
+            record["group_size"] = len(pending)
+            record["group_usage"] = usage
+            if answer is None:
+                record["error"] = "未能从回答中拆分出该图像的结果"
+
+        return records
+
+    def analyze_stream(self, images: List[str], question: str) -> Iterator[Dict[str, Any]]:
+        """
+        批量分析图像，按请求完成顺序逐图产出结果
+
+        Args:
+            images: 图像路径或URL列表
+            question: 对每张图像提出的问题
+
+        Yields:
+            Dict: 单张图像的结果记录
+        """
+        groups = self.plan_groups(images)
+        logger.info(f"共 {len(images)} 张图像，打包为 {len(groups)} 个请求")
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {
+                    pool.submit(self._analyze_group, index, group, question): group
+                    for index, group in enumerate(groups)
+                }
+
+                for future in as_completed(futures):
+                    try:
+                        records = future.result()
+                    except Exception as e:
+                        records = [
+                            {"image": image, "answer": None, "error": str(e)}
+                            for image in futures[future]
+                        ]
+
+                    for record in records:
+                        yield record
+        finally:
+            self.preprocessor.close()
+
+    def analyze(self, images: List[str], question: str) -> List[Dict[str, Any]]:
+        """
+        批量分析图像并按输入顺序返回全部结果
+
+        Args:
+            images: 图像路径或URL列表
+            question: 对每张图像提出的问题
+
+        Returns:
+            List[Dict]: 逐图结果记录
+        """
+        order = {image: index for index, image in enumerate(images)}
+        records = list(self.analyze_stream(images, question))
+        return sorted(records, key=lambda record: order.get(record["image"], 0))
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+分析调度器
+在分析器前增加一层调度：请求分为交互式（interactive）、批量（batch）、回填（backfill）三个优先级，
+高优先级先执行，并为交互式请求保留工作线程；同一优先级内按租户权重公平分配（步幅调度），
+每个租户可以限制并发数和滑动时间窗口内的Token用量。Token配额用尽的租户的任务留在队列中，
+等窗口释放额度后再执行（其他租户照常调度），只有排队超过截止时间的任务才以错误结束
+"""
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from enum import Enum
+from typing import Optional, Dict, Any, Callable, Deque, Tuple
+
+from src.analyzers.smart_analyzer import SmartVideoAnalyzer
+from src.utils.config_manager import ConfigManager, get_config_manager
+from src.utils.latency import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(Enum):
+    """请求优先级（按声明顺序从高到低）"""
+    INTERACTIVE = "interactive"  # 用户等待中的请求
+    BATCH = "batch"              # 批量任务
+    BACKFILL = "backfill"        # 历史数据回填，只使用空闲资源
+
+
+PRIORITY_ORDER = list(Priority)
+
+DEFAULT_TENANT = "default"
+
+# 默认为交互式请求保留的工作线程数（只执行交互式请求）
+DEFAULT_INTERACTIVE_RESERVED = 1
+
+# Token配额的滑动统计窗口（秒）
+DEFAULT_TOKEN_WINDOW = 3600.0
+
+# 任务默认的排队截止时间（秒，从提交起计算），None 表示不限制
+DEFAULT_QUEUE_TIMEOUT = None
+
+# 分析任务：接收工作线程的分析器，返回分析结果
+AnalysisTask = Callable[[SmartVideoAnalyzer], Optional[Dict[str, Any]]]
+
+
+class _Tenant:
+    """租户的调度状态"""
+
+    def __init__(self, name: str, weight: float = 1.0, max_concurrency: int = 0, token_quota: int = 0):
+        self.name = name
+        self.weight = max(weight, 0.01)
+        self.max_concurrency = max_concurrency  # 0 表示不限制
+        self.token_quota = token_quota          # 0 表示不限制
+        self.running = 0
+        # 滑动窗口内每个已完成任务的 (完成时间, Token用量)，以及窗口内用量合计
+        self.usage: Deque[Tuple[float, int]] = deque()
+        self.tokens_used = 0
+        # 步幅调度的通行值：每分派一个任务增加 1/权重，值最小的租户先执行
+        self.pass_value = 0.0
+        # 各优先级的排队任务：(任务, Future, 提交时间, 排队截止时刻（None 表示不限制）)
+        self.queues: Dict[Priority, Deque[Tuple[AnalysisTask, Future, float, Optional[float]]]] = {
+            priority: deque() for priority in PRIORITY_ORDER
+        }
+
+    def record_usage(self, now: float, tokens: int) -> None:
+        if tokens > 0:
+            self.usage.append((now, tokens))
+            self.tokens_used += tokens
+
+    def _expire(self, now: float, window: float) -> None:
+        while self.usage and now - self.usage[0][0] >= window:
+            self.tokens_used -= self.usage.popleft()[1]
+
+    def quota_exhausted(self, now: float, window: float) -> bool:
+        self._expire(now, window)
+        return self.token_quota > 0 and self.tokens_used >= self.token_quota
+
+    def quota_frees_in(self, now: float, window: float) -> float:
+        """最早的用量滑出窗口、使用量回到配额以下还需的时间（秒）"""
+        remaining = self.tokens_used
+        for finished, tokens in self.usage:
+            remaining -= tokens
+            if remaining < self.token_quota:
+                return max(0.0, finished + window - now)
+        return 0.0
+
+
+class AnalysisScheduler:
+    """分析调度器 - 优先级 + 租户加权公平分配 + 租户并发/Token配额"""
+
+    def __init__(
+        self,
+        workers: int = 4,
+        analyzer_factory: Callable[[], SmartVideoAnalyzer] = SmartVideoAnalyzer,
+        tenants: Optional[Dict[str, Dict[str, Any]]] = None,
+        interactive_reserved: int = DEFAULT_INTERACTIVE_RESERVED,
+        token_window: float = DEFAULT_TOKEN_WINDOW,
+        queue_timeout: Optional[float] = DEFAULT_QUEUE_TIMEOUT
+    ):
+        """
+        初始化调度器并启动工作线程
+
+        Args:
+            workers: 工作线程数
+            analyzer_factory: 分析器工厂（每个工作线程使用独立的分析器实例）
+            tenants: 租户配置 {租户: {"weight": 权重, "max_concurrency": 最大并发,
+                "token_quota": 滑动窗口内Token上限}}，未配置的租户权重为1且不限制；
+                Token配额在分派任务时检查，已开始的任务不会中断，配额用尽时任务等待窗口释放额度
+            interactive_reserved: 只执行交互式请求的工作线程数（至少保留一个通用线程）
+            token_window: Token配额的滑动统计窗口（秒）
+            queue_timeout: 任务默认的排队截止时间（秒），超过后以错误结束；None 表示一直等待
+
+        Raises:
+            Exception: 分析器工厂抛出的异常（例如未配置API密钥），此时不会启动工作线程
+        """
+        self.workers = max(1, workers)
+        self.analyzer_factory = analyzer_factory
+        self.interactive_reserved = max(0, min(interactive_reserved, self.workers - 1))
+        self.token_window = token_window
+        self.queue_timeout = queue_timeout
+        self.wait_times = LatencyTracker(window_size=1000)
+
+        self._tenant_config = tenants or {}
+        self._tenants: Dict[str, _Tenant] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        # 下一次需要重新调度的时刻（配额释放或排队任务到期），没有时为None
+        self._wake_at: Optional[float] = None
+
+        # 在调用方线程中创建分析器，创建失败时直接抛给调用方，而不是让工作线程静默退出
+        analyzers = [analyzer_factory() for _ in range(self.workers)]
+
+        self._threads = [
+            threading.Thread(
+                target=self._worker_loop,
+                args=(analyzers[index], index < self.interactive_reserved),
+                name=f"scheduler-worker-{index}",
+                daemon=True
+            )
+            for index in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @classmethod
+    def from_config(
+        cls,
+        workers: int = 4,
+        config_manager: Optional[ConfigManager] = None,
+        analyzer_factory: Optional[Callable[[], SmartVideoAnalyzer]] = None
+    ) -> "AnalysisScheduler":
+        """
+        根据用户偏好（scheduler_tenants 等）创建调度器
+
+        Args:
+            workers: 工作线程数
+            config_manager: 配置管理器，默认使用全局实例
+            analyzer_factory: 分析器工厂，默认使用同一配置创建 SmartVideoAnalyzer
+
+        Returns:
+            AnalysisScheduler: 调度器实例
+        """
+        config = config_manager or get_config_manager()
+        queue_timeout = config.get_preference("scheduler_queue_timeout", DEFAULT_QUEUE_TIMEOUT)
+        return cls(
+            workers=workers,
+            analyzer_factory=analyzer_factory or (lambda: SmartVideoAnalyzer(config, verbose=False)),
+            tenants=config.get_preference("scheduler_tenants") or {},
+            interactive_reserved=int(config.get_preference(
+                "scheduler_interactive_reserved", DEFAULT_INTERACTIVE_RESERVED
+            )),
+            token_window=float(config.get_preference("scheduler_token_window", DEFAULT_TOKEN_WINDOW)),
+            queue_timeout=float(queue_timeout) if queue_timeout else None
+        )
+
+    def _tenant(self, name: str) -> _Tenant:
+        """获取（必要时创建）租户状态，调用方需持有锁"""
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            options = self._tenant_config.get(name, {})
+            tenant = _Tenant(
+                name,
+                weight=float(options.get("weight", 1.0)),
+                max_concurrency=int(options.get("max_concurrency", 0)),
+                token_quota=int(options.get("token_quota", 0))
+            )
+            self._tenants[name] = tenant
+        return tenant
+
+    def submit_task(
+        self,
+        task: AnalysisTask,
+        tenant: str = DEFAULT_TENANT,
+        priority: Any = Priority.BATCH,
+        queue_timeout: Optional[float] = None
+    ) -> Future:
+        """
+        提交分析任务
+
+        Args:
+            task: 分析任务，在工作线程中以该线程的分析器调用
+            tenant: 租户（或队列）名称
+            priority: 优先级（Priority 或其取值字符串）
+            queue_timeout: 排队截止时间（秒，从提交起计算），默认使用调度器的 queue_timeout
+
+        Returns:
+            Future: 结果为分析结果字典；排队超过截止时间时为包含 error 的字典
+        """
+        priority = Priority(priority)
+        future: Future = Future()
+        queue_timeout = self.queue_timeout if queue_timeout is None else queue_timeout
+        submitted = time.monotonic()
+        deadline_at = submitted + queue_timeout if queue_timeout else None
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("调度器已关闭")
+
+            state = self._tenant(tenant)
+            if not any(state.queues.values()):
+                # 空闲后重新活跃的租户从当前最小通行值开始，不能用空闲期间积累的份额插队
+                active = [t.pass_value for t in self._tenants.values() if t is not state and any(t.queues.values())]
+                state.pass_value = max(state.pass_value, min(active, default=state.pass_value))
+
+            state.queues[priority].append((task, future, submitted, deadline_at))
+            self._condition.notify_all()
+
+        return future
+
+    def submit(
+        self,
+        video_input: str,
+        question: str,
+        tenant: str = DEFAULT_TENANT,
+        priority: Any = Priority.BATCH,
+        queue_timeout: Optional[float] = None,
+        **analyze_options: Any
+    ) -> Future:
+        """
+        提交视频分析请求
+
+        Args:
+            video_input: 视频输入（URL或文件路径）
+            question: 分析问题
+            tenant: 租户（或队列）名称
+            priority: 优先级（Priority 或其取值字符串）
+            queue_timeout: 排队截止时间（秒），默认使用调度器的 queue_timeout
+            **analyze_options: 传给 SmartVideoAnalyzer.analyze 的其他参数
+
+        Returns:
+            Future: 结果为分析结果字典
+        """
+        analyze_options.setdefault("show_plan", False)
+        return self.submit_task(
+            lambda analyzer: analyzer.analyze(video_input, question, **analyze_options),
+            tenant,
+            priority,
+            queue_timeout
+        )
+
+    def analyze(
+        self,
+        video_input: str,
+        question: str,
+        tenant: str = DEFAULT_TENANT,
+        priority: Any = Priority.INTERACTIVE,
+        **analyze_options: Any
+    ) -> Optional[Dict[str, Any]]:
+        """
+        提交请求并等待结果（默认交互式优先级）
+
+        Returns:
+            Dict: 分析结果
+        """
+        return self.submit(video_input, question, tenant, priority, **analyze_options).result()
+
+    def _wake(self, at: float) -> None:
+        """记录需要重新调度的时刻（取最早者），调用方需持有锁"""
+        if self._wake_at is None or at < self._wake_at:
+            self._wake_at = at
+
+    def _expire_overdue(self, now: float) -> None:
+        """以错误结束排队超过截止时间的任务，并记录下一个到期时刻，调用方需持有锁"""
+        for tenant in self._tenants.values():
+            for priority, queue in tenant.queues.items():
+                if not any(deadline_at is not None for _, _, _, deadline_at in queue):
+                    continue
+
+                kept = deque()
+                for entry in queue:
+                    _, future, submitted, deadline_at = entry
+                    if deadline_at is None or deadline_at > now:
+                        kept.append(entry)
+                        if deadline_at is not None:
+                            self._wake(deadline_at)
+                        continue
+
+                    quota_exceeded = tenant.quota_exhausted(now, self.token_window)
+                    if quota_exceeded:
+                        error = f"租户 {tenant.name} 的Token配额已用尽，排队 {now - submitted:.0f} 秒后仍未恢复"
+                    else:
+                        error = f"任务排队 {now - submitted:.0f} 秒，超过截止时间"
+                    if future.set_running_or_notify_cancel():
+                        future.set_result({"error": error, "queue_timeout": True, "quota_exceeded": quota_exceeded})
+                tenant.queues[priority] = kept
+
+    def _fail_deferred(self) -> None:
+        """调度器关闭时以错误结束仍在等待配额释放的任务，调用方需持有锁"""
+        now = time.monotonic()
+        for tenant in self._tenants.values():
+            if not tenant.quota_exhausted(now, self.token_window):
+                continue
+            for queue in tenant.queues.values():
+                while queue:
+                    _, future, _, _ = queue.popleft()
+                    if future.set_running_or_notify_cancel():
+                        future.set_result({
+                            "error": f"调度器已关闭，租户 {tenant.name} 的Token配额尚未恢复",
+                            "quota_exceeded": True
+                        })
+
+    def _next_task(self, reserved: bool) -> Optional[Tuple[_Tenant, Priority, AnalysisTask, Future, float]]:
+        """
+        选择下一个要执行的任务，调用方需持有锁；配额已用尽租户的任务留在队列中，
+        等待窗口释放额度（同时记录释放时刻，工作线程届时重新调度），排队超过截止时间的任务以错误结束
+
+        Args:
+            reserved: 是否为交互式保留线程
+
+        Returns:
+            Optional[Tuple]: (租户, 优先级, 任务, Future, 提交时间)，没有可执行任务时返回None
+        """
+        now = time.monotonic()
+        priorities = PRIORITY_ORDER[:1] if reserved else PRIORITY_ORDER
+        self._wake_at = None
+        self._expire_overdue(now)
+
+        for priority in priorities:
+            candidates = [
+                tenant for tenant in self._tenants.values()
+                if tenant.queues[priority]
+                and (tenant.max_concurrency <= 0 or tenant.running < tenant.max_concurrency)
+            ]
+
+            for tenant in sorted(candidates, key=lambda t: t.pass_value):
+                if tenant.quota_exhausted(now, self.token_window):
+                    # 配额用尽：不占用份额，其他租户照常执行，额度释放后再调度该租户
+                    self._wake(now + tenant.quota_frees_in(now, self.token_window))
+                    continue
+
+                task, future, submitted, _ = tenant.queues[priority].popleft()
+                tenant.running += 1
+                tenant.pass_value += 1.0 / tenant.weight
+                return tenant, priority, task, future, submitted
+
+        return None
+
+    def _worker_loop(self, analyzer: SmartVideoAnalyzer, reserved: bool) -> None:
+        """工作线程主循环：按优先级和公平份额领取任务 → 分析 → 记录Token用量"""
+
+        while True:
+            with self._condition:
+                selected = self._next_task(reserved)
+                while selected is None:
+                    if self._closed:
+                        self._fail_deferred()
+                        return
+                    # 有等待配额释放或即将到期的任务时定时醒来重新调度
+                    timeout = None if self._wake_at is None else max(0.0, self._wake_at - time.monotonic())
+                    self._condition.wait(timeout)
+                    selected = self._next_task(reserved)
+
+            tenant, priority, task, future, submitted = selected
+            self.wait_times.record(priority.value, time.monotonic() - submitted)
+
+            if not future.set_running_or_notify_cancel():
+                result = None
+            else:
+                try:
+                    result = task(analyzer)
+                except Exception as e:
+                    logger.error(f"租户 {tenant.name} 的 {priority.value} 任务执行失败: {e}")
+                    result = {"error": str(e)}
+                future.set_result(result)
+
+            usage = result.get("usage") if isinstance(result, dict) else None
+            tokens = (usage or {}).get("total_tokens") or 0
+            with self._condition:
+                tenant.running -= 1
+                tenant.record_usage(time.monotonic(), tokens)
+                self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取调度状态
+
+        Returns:
+            Dict: 各租户的排队数、执行数、Token用量，以及各优先级排队时间百分位
+        """
+        with self._condition:
+            now = time.monotonic()
+            for tenant in self._tenants.values():
+                tenant.quota_exhausted(now, self.token_window)
+            tenants = {
+                tenant.name: {
+                    "weight": tenant.weight,
+                    "running": tenant.running,
+                    "pending": {priority.value: len(queue) for priority, queue in tenant.queues.items()},
+                    "tokens_used": tenant.tokens_used,
+                    "token_quota": tenant.token_quota or None,
+                }
+                for tenant in self._tenants.values()
+            }
+        return {"tenants": tenants, "queue_wait": self.wait_times.snapshot()}
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        关闭调度器：不再接受新任务，已提交的任务执行完后工作线程退出；
+        仍在等待Token配额释放的任务以错误结束
+
+        Args:
+            wait: 是否等待工作线程退出
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self) -> "AnalysisScheduler":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
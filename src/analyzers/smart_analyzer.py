@@ -3,14 +3,25 @@
 智能视频分析工具 - 集成路由器
 自动选择最优处理策略，支持失败自动切换
 """
+import re
 import sys
 import json
+import time
 import logging
-import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-from typing import Optional, Dict, Any
-from video_router import VideoRouter, ProcessStrategy
-from analyze_local_video import VideoAnalyzer
+from typing import Optional, Dict, Any, List
+from src.core.router import VideoRouter, ProcessStrategy
+from src.core.executor import execute_tool, VISION_MODEL
+from src.core.session_store import get_session_store, result_content
+from src.core.circuit_breaker import get_circuit_breakers
+from src.core.fallback import FallbackPolicy
+from src.analyzers.video_analyzer import VideoAnalyzer
+from src.utils.latency import get_latency_tracker
+from src.utils.memory_budget import estimate_peak_memory_mb, get_memory_budget
+from src.utils.profiler import Profiler, NULL_PROFILER
+from src.utils.config_manager import ConfigManager, get_config_manager
 
 # 配置日志
 logging.basicConfig(
@@ -20,27 +31,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 机器可读结果记录的格式版本（字段有不兼容变化时递增）
+RESULT_SCHEMA_VERSION = 2
+
+# 多问题合并时的答案分隔标记，例如 "[Q1]"
+ANSWER_MARKER_PATTERN = re.compile(r'^\s*(?:#+\s*)?\[Q(\d+)\]\s*', re.MULTILINE)
+
+# 对冲请求：主策略样本不足时使用默认对冲延迟
+HEDGE_MIN_SAMPLES = 5
+
 
 class SmartVideoAnalyzer:
     """智能视频分析器 - 集成路由和自动切换"""
 
-    def __init__(self, config_path: Optional[Path] = None):
+    def __init__(self, config_manager: Optional[ConfigManager] = None, verbose: bool = True):
         """
         初始化智能分析器
 
         Args:
-            config_path: 配置文件路径
+            config_manager: 配置管理器，默认使用全局实例（路由器和分析器共享）
+            verbose: 是否向标准输出打印路由决策、执行计划等提示信息
+                （输出机器可读结果时应关闭，避免混入标准输出）
         """
-        self.router = VideoRouter(config_path)
-        self.analyzer = VideoAnalyzer(config_path)
-        self.executor_path = Path(__file__).parent / "executor.py"
+        self.config = config_manager or get_config_manager()
+        self.verbose = verbose
+        self.router = VideoRouter(self.config)
+        self.analyzer = VideoAnalyzer(self.config)
+        self.latency = get_latency_tracker()
+        self.memory_budget = get_memory_budget(self.config.get_preference("memory_budget_mb"))
 
     def analyze(
         self,
         video_input: str,
         question: str = "请详细分析这个视频的内容，包括画面、声音、文案、主题等所有信息",
         show_plan: bool = True,
-        auto_fallback: bool = True
+        auto_fallback: bool = True,
+        hedge_url: Optional[str] = None,
+        session_id: Optional[str] = None,
+        profile_dir: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
         """
         智能分析视频
@@ -50,44 +78,77 @@ class SmartVideoAnalyzer:
             question: 分析问题
             show_plan: 是否显示执行计划
             auto_fallback: 失败时自动切换策略
+            hedge_url: 同一视频的在线URL（可选）。本地小文件超过对冲延迟
+                仍未返回时，并行启动URL方式，取先完成者
+            session_id: 会话ID（可选）。提供时记录本次问答和视频描述，
+                后续可通过该会话进行纯文本追问
+            profile_dir: 剖析结果目录（可选）。提供时记录 cProfile、内存分配、
+                各阶段峰值内存和子进程资源用量，结果目录写入 profile_dir 字段
 
         Returns:
             Dict: 分析结果
         """
+        profiler = Profiler(Path(profile_dir)) if profile_dir else NULL_PROFILER
+
+        with profiler:
+            result = self._analyze(
+                video_input, question, show_plan, auto_fallback, hedge_url, session_id, profiler
+            )
+
+        if profiler.enabled and result is not None:
+            result["profile_dir"] = str(profiler.output_dir)
+        return result
+
+    def _analyze(
+        self,
+        video_input: str,
+        question: str,
+        show_plan: bool,
+        auto_fallback: bool,
+        hedge_url: Optional[str],
+        session_id: Optional[str],
+        profiler: Any
+    ) -> Optional[Dict[str, Any]]:
+        """执行智能分析（参数见 analyze，profiler 用于记录各阶段资源用量）"""
+        started = time.monotonic()
+
         logger.info("="*60)
         logger.info("🚀 智能视频分析系统启动")
         logger.info("="*60)
 
         # 步骤1: 路由决策
         logger.info("\n📊 步骤1: 分析输入并制定策略...")
-        decision = self.router.route(video_input, question)
+        with profiler.stage("route"):
+            decision = self.router.route(video_input, question)
 
         # 显示分析结果
         analysis = decision['input_analysis']
-        print(f"\n📹 输入类型: {analysis['type'].upper()}")
+        self._echo(f"\n📹 输入类型: {analysis['type'].upper()}")
 
-        if analysis['type'] == 'file' and analysis['file_size_mb']:
-            print(f"📦 文件大小: {analysis['file_size_mb']} MB")
+        if analysis['file_size_mb']:
+            self._echo(f"📦 文件大小: {analysis['file_size_mb']} MB")
+        if analysis['duration_seconds']:
+            self._echo(f"⏱️  视频时长: {analysis['duration_seconds']} 秒")
 
         if not analysis['valid']:
-            print(f"\n❌ 输入无效: {analysis['error']}")
+            self._echo(f"\n❌ 输入无效: {analysis['error']}")
             return {"error": analysis['error']}
 
         # 显示策略
         strategy = decision['strategy']
-        print(f"\n✅ 选定策略: {strategy.value.upper().replace('_', ' ')}")
+        self._echo(f"\n✅ 选定策略: {strategy.value.upper().replace('_', ' ')}")
 
         # 显示警告
         if decision['warnings']:
-            print("\n⚠️  警告信息:")
+            self._echo("\n⚠️  警告信息:")
             for warning in decision['warnings']:
-                print(f"  {warning}")
+                self._echo(f"  {warning}")
 
         # 显示推荐
         if decision['recommendations']:
-            print("\n💡 建议:")
+            self._echo("\n💡 建议:")
             for rec in decision['recommendations']:
-                print(f"  {rec}")
+                self._echo(f"  {rec}")
 
         # 如果推荐上传，直接返回
         if strategy == ProcessStrategy.UPLOAD_RECOMMEND:
@@ -99,24 +160,36 @@ class SmartVideoAnalyzer:
         # 显示执行计划
         if show_plan and decision['execution_plan']:
             plan = decision['execution_plan']
-            print(f"\n📋 执行计划:")
-            print(f"  处理方法: {plan['method']}")
-            print(f"  预估时间: {plan['estimated_time']}")
-            print(f"  预估Token: {plan['estimated_tokens']}")
-            print(f"  临时文件: {plan['temp_files']} 个")
+            self._echo(f"\n📋 执行计划:")
+            self._echo(f"  处理方法: {plan['method']}")
+            self._echo(f"  预估时间: {plan['estimated_time']}")
+            self._echo(f"  预估Token: {plan['estimated_tokens']}（问题约 {plan['question_tokens']}，上下文上限 {plan['context_limit']:,}）")
+            self._echo(f"  预估峰值内存: {plan['estimated_memory_mb']} MB（内存预算 {self.memory_budget.limit_mb} MB）")
+            self._echo(f"  临时文件: {plan['temp_files']} 个")
 
         # 步骤2: 执行分析
-        print("\n" + "="*60)
+        self._echo("\n" + "="*60)
         logger.info("📊 步骤2: 执行视频分析...")
-        print("="*60 + "\n")
+        self._echo("="*60 + "\n")
 
         result = None
         tried_strategies = []
+        policy = FallbackPolicy.from_config(self.config)
+        deadline_at = policy.deadline_at(started)
 
         # 尝试执行主策略
         try:
-            result = self._execute_strategy(video_input, question, strategy)
-            tried_strategies.append(strategy.value)
+            with profiler.stage(f"execute:{strategy.value}"):
+                if hedge_url and strategy == ProcessStrategy.BASE64_SMALL:
+                    result = self._execute_hedged(
+                        video_input, hedge_url, question, strategy, tried_strategies,
+                        policy, deadline_at, analysis['file_size_mb']
+                    )
+                else:
+                    tried_strategies.append(strategy.value)
+                    result = self._execute_with_budget(
+                        video_input, question, strategy, policy, deadline_at, analysis['file_size_mb']
+                    )
 
             # 检查结果是否有错误
             if result and "error" in result:
@@ -127,22 +200,96 @@ class SmartVideoAnalyzer:
 
             # 自动切换策略
             if auto_fallback and self.router.preferences.get("auto_fallback", True):
-                result = self._try_fallback_strategies(
-                    video_input,
-                    question,
-                    strategy,
-                    tried_strategies
-                )
+                with profiler.stage("fallback"):
+                    result = self._try_fallback_strategies(
+                        video_input,
+                        question,
+                        strategy,
+                        tried_strategies,
+                        policy,
+                        deadline_at,
+                        analysis['file_size_mb']
+                    )
             else:
                 return {"error": str(e), "tried_strategies": tried_strategies}
 
+        if result:
+            result.setdefault("timings", {})["total_seconds"] = round(time.monotonic() - started, 3)
+
+        if result and "error" not in result:
+            result["tried_strategies"] = tried_strategies
+
+            if session_id:
+                with profiler.stage("session"):
+                    get_session_store().record_exchange(
+                        session_id, question, result_content(result), media=video_input
+                    )
+                result["session_id"] = session_id
+
+        return result
+
+    def analyze_many(
+        self,
+        video_input: str,
+        questions: List[str],
+        show_plan: bool = True,
+        auto_fallback: bool = True,
+        session_id: Optional[str] = None,
+        profile_dir: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        一次请求回答同一视频的多个问题
+
+        多个问题合并为一个结构化提示词，视频只上传一次，
+        返回结果中的 answers 字段按问题顺序拆分回答。
+
+        Args:
+            video_input: 视频输入（URL或文件路径）
+            questions: 问题列表
+            show_plan: 是否显示执行计划
+            auto_fallback: 失败时自动切换策略
+            session_id: 会话ID（可选），用于后续追问
+            profile_dir: 剖析结果目录（可选），见 analyze
+
+        Returns:
+            Dict: 分析结果，成功时包含 answers 列表
+        """
+        questions = [q for q in questions if q and q.strip()]
+        if not questions:
+            return {"error": "缺少分析问题"}
+
+        if len(questions) == 1:
+            prompt = questions[0]
+        else:
+            prompt = build_multi_question_prompt(questions)
+
+        result = self.analyze(
+            video_input, prompt, show_plan, auto_fallback, session_id=session_id, profile_dir=profile_dir
+        )
+
+        if not result or "error" in result:
+            return result
+
+        content = result_content(result)
+
+        if len(questions) == 1:
+            answers = [content]
+        else:
+            answers = split_multi_answers(content, len(questions))
+
+        result["answers"] = [
+            {"question": question, "answer": answer}
+            for question, answer in zip(questions, answers)
+        ]
         return result
 
     def _execute_strategy(
         self,
         video_input: str,
         question: str,
-        strategy: ProcessStrategy
+        strategy: ProcessStrategy,
+        cancel_event: Optional[threading.Event] = None,
+        timeout: Optional[float] = None
     ) -> Optional[Dict[str, Any]]:
         """
         执行指定策略
@@ -151,114 +298,331 @@ class SmartVideoAnalyzer:
             video_input: 视频输入
             question: 分析问题
             strategy: 处理策略
+            cancel_event: 取消信号
+            timeout: 分析请求的超时时间（秒），默认使用执行器的超时时间
 
         Returns:
             Dict: 分析结果
         """
         logger.info(f"正在使用策略: {strategy.value}")
+        started = time.monotonic()
+        memory_wait = 0.0
 
         if strategy == ProcessStrategy.URL_DIRECT:
-            return self._analyze_url(video_input, question)
+            result = self._analyze_url(video_input, question, cancel_event, timeout)
 
         elif strategy in [ProcessStrategy.BASE64_SMALL, ProcessStrategy.BASE64_LARGE]:
-            return self.analyzer.analyze(video_input, question)
+            # Base64方式需要在内存中持有整个视频，预算不足时排队等待
+            memory_mb = estimate_peak_memory_mb(self.router.get_file_size_mb(video_input), strategy)
+            memory_wait = self.memory_budget.acquire(memory_mb, cancel_event)
+            if memory_wait is None:
+                return {"error": "等待内存预算时被取消", "cancelled": True}
+
+            try:
+                started = time.monotonic()
+                result = self.analyzer.analyze(video_input, question, cancel_event, timeout)
+            finally:
+                self.memory_budget.release(memory_mb)
+
+        elif strategy == ProcessStrategy.UPLOAD:
+            upload = self.router.uploader.upload(video_input)
+            if "error" in upload:
+                return upload
+
+            self._echo(f"☁️  {'上传完成' if upload['uploaded'] else '已上传过，复用对象'}: {upload['object_key']}")
+            remaining = timeout - (time.monotonic() - started) if timeout else None
+            if remaining is not None and remaining <= 0:
+                return {"error": f"上传耗时超过策略超时时间 ({timeout:g} 秒)", "timeout": True}
+            result = self._analyze_url(upload["url"], question, cancel_event, remaining)
+            if result and "error" not in result:
+                result["upload"] = {key: upload[key] for key in ("object_key", "digest", "uploaded", "seconds")}
 
         else:
             raise ValueError(f"不支持的策略: {strategy}")
 
-    def _analyze_url(self, video_url: str, question: str) -> Dict[str, Any]:
+        # 只记录成功请求的耗时（不含排队时间），作为对冲延迟的依据
+        if result and "error" not in result:
+            elapsed = time.monotonic() - started
+            self.latency.record(strategy.value, elapsed)
+            result["strategy"] = strategy.value
+            result["timings"] = {"strategy_seconds": round(elapsed, 3)}
+            if memory_wait:
+                result["timings"]["memory_wait_seconds"] = round(memory_wait, 3)
+
+        return result
+
+    def _execute_with_budget(
+        self,
+        video_input: str,
+        question: str,
+        strategy: ProcessStrategy,
+        policy: FallbackPolicy,
+        deadline_at: Optional[float],
+        size_mb: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        按策略的尝试次数和超时时间执行策略，每次尝试的超时不超过距离总截止时间的剩余时间；
+        成功和超时的尝试都记录耗时，作为后续自适应超时的依据
+
+        Args:
+            video_input: 视频输入
+            question: 分析问题
+            strategy: 处理策略
+            policy: 回退策略
+            deadline_at: 总截止时刻（time.monotonic() 时间轴），None 表示不限制
+            size_mb: 文件大小（MB），未知时为None
+
+        Returns:
+            Dict: 分析结果（最后一次尝试的结果）
+        """
+        attempts = policy.attempts(strategy)
+        result = None
+
+        for attempt in range(1, attempts + 1):
+            timeout = policy.attempt_timeout(strategy, deadline_at, size_mb)
+            if timeout <= 0:
+                return {"error": f"已超过分析总截止时间 ({policy.deadline:g} 秒)", "deadline_exceeded": True}
+
+            if attempt > 1:
+                self._echo(f"🔁 重试策略 {strategy.value}（第 {attempt}/{attempts} 次）")
+
+            try:
+                result = self._execute_strategy(video_input, question, strategy, timeout=timeout)
+            except Exception as e:
+                logger.error(f"策略 {strategy.value} 第 {attempt} 次尝试失败: {e}")
+                result = {"error": str(e)}
+
+            if result and "error" not in result:
+                policy.record(strategy, size_mb, result["timings"]["strategy_seconds"])
+                return result
+            if result and result.get("timeout"):
+                policy.record(strategy, size_mb, timeout)
+            # 熔断和取消不会因为重试而好转
+            if result and (result.get("circuit_open") or result.get("cancelled")):
+                break
+
+        return result
+
+    def _strategy_applicable(
+        self,
+        strategy: ProcessStrategy,
+        video_input: str,
+        size_mb: Optional[float] = None
+    ) -> bool:
+        """
+        判断策略能否处理该输入：URL输入只能直接访问，本地文件可以（已配置存储桶时）上传，
+        或在不超过Base64大小上限时编码发送
+
+        Args:
+            strategy: 处理策略
+            video_input: 视频输入
+            size_mb: 文件大小（MB），未知时不按大小判断
+
+        Returns:
+            bool: 是否适用
+        """
+        is_url = self.router.is_url(video_input)
+        if strategy == ProcessStrategy.URL_DIRECT:
+            return is_url
+        if strategy == ProcessStrategy.UPLOAD:
+            return not is_url and self.router.uploader.available
+        if strategy in (ProcessStrategy.BASE64_SMALL, ProcessStrategy.BASE64_LARGE):
+            return not is_url and (size_mb is None or size_mb <= self.router.LARGE_FILE_THRESHOLD)
+        return False
+
+    def _analyze_url(
+        self,
+        video_url: str,
+        question: str,
+        cancel_event: Optional[threading.Event] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
         使用URL方式分析
 
         Args:
             video_url: 视频URL
             question: 分析问题
+            cancel_event: 取消信号
+            timeout: 超时时间（秒）
 
         Returns:
             Dict: 分析结果
         """
+        tool_input = {
+            "messages": [{
+                "role": "user",
+                "content": question,
+                "video_url": video_url
+            }],
+            "model": VISION_MODEL
+        }
+
+        return execute_tool("chat_completion", tool_input, cancel_event, timeout)
+
+    def _hedge_delay(self, strategy: ProcessStrategy) -> float:
+        """
+        计算对冲延迟：主策略历史耗时的百分位数，样本不足时使用默认值
+
+        Args:
+            strategy: 主策略
+
+        Returns:
+            float: 对冲延迟（秒）
+        """
+        default_delay = float(self.router.preferences.get("hedge_default_delay", 60.0))
+
+        if self.latency.count(strategy.value) < HEDGE_MIN_SAMPLES:
+            return default_delay
+
+        percentile = float(self.router.preferences.get("hedge_percentile", 95))
+        return self.latency.percentile(strategy.value, percentile, default_delay)
+
+    def _execute_hedged(
+        self,
+        video_input: str,
+        hedge_url: str,
+        question: str,
+        strategy: ProcessStrategy,
+        tried_strategies: list,
+        policy: FallbackPolicy,
+        deadline_at: Optional[float],
+        size_mb: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        对冲执行：主策略超过对冲延迟未返回时并行启动URL方式，
+        采用先成功的结果并取消另一方（各自使用策略的超时时间，不重试）
+
+        Args:
+            video_input: 本地视频路径
+            hedge_url: 同一视频的在线URL
+            question: 分析问题
+            strategy: 主策略
+            tried_strategies: 已尝试的策略列表
+            policy: 回退策略
+            deadline_at: 总截止时刻，None 表示不限制
+            size_mb: 本地视频大小（MB）
+
+        Returns:
+            Dict: 分析结果
+        """
+        delay = self._hedge_delay(strategy)
+        cancel_events = {
+            strategy: threading.Event(),
+            ProcessStrategy.URL_DIRECT: threading.Event()
+        }
+
+        # 不使用 with：离开时取消仍在执行的一方并立即返回，不等待落败的请求结束
+        pool = ThreadPoolExecutor(max_workers=2)
+        futures = {
+            pool.submit(
+                self._execute_strategy, video_input, question, strategy,
+                cancel_events[strategy], policy.attempt_timeout(strategy, deadline_at, size_mb)
+            ): strategy
+        }
+        tried_strategies.append(strategy.value)
+
         try:
-            # 构建命令参数
-            tool_input = {
-                "messages": [{
-                    "role": "user",
-                    "content": question,
-                    "video_url": video_url
-                }],
-                "model": "glm-4.6v"
-            }
+            done, _ = wait(futures, timeout=delay)
+            primary_result = next(iter(done)).result() if done else None
 
-            tool_input_json = json.dumps(tool_input, ensure_ascii=False)
+            if primary_result and "error" not in primary_result:
+                return primary_result
 
-            # 执行executor.py
-            result = subprocess.run(
-                [sys.executable, str(self.executor_path), "chat_completion", tool_input_json],
-                capture_output=True,
-                text=True,
-                timeout=300,
-                cwd=self.executor_path.parent
-            )
+            if not done:
+                self._echo(f"\n⏱️  主策略超过对冲延迟 {delay:.1f} 秒未返回，并行启动URL方式")
 
-            if result.returncode == 0:
-                return json.loads(result.stdout)
-            else:
-                error_msg = result.stderr or "未知错误"
-                return {"error": error_msg}
+            hedge_timeout = policy.attempt_timeout(ProcessStrategy.URL_DIRECT, deadline_at)
+            if hedge_timeout <= 0:
+                return primary_result or {
+                    "error": f"已超过分析总截止时间 ({policy.deadline:g} 秒)，主策略仍未返回",
+                    "timeout": True
+                }
 
-        except subprocess.TimeoutExpired:
-            return {"error": "分析超时"}
-        except Exception as e:
-            return {"error": str(e)}
+            futures[pool.submit(
+                self._execute_strategy, hedge_url, question, ProcessStrategy.URL_DIRECT,
+                cancel_events[ProcessStrategy.URL_DIRECT], hedge_timeout
+            )] = ProcessStrategy.URL_DIRECT
+            tried_strategies.append(ProcessStrategy.URL_DIRECT.value)
+
+            result = primary_result
+            pending = {future for future in futures if not future.done()}
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"error": str(e)}
+
+                    if result and "error" not in result:
+                        logger.info(f"对冲请求由策略 {futures[future].value} 先完成")
+                        return result
+
+            return result or {"error": "对冲请求均未返回结果"}
+
+        finally:
+            for future, future_strategy in futures.items():
+                if not future.done():
+                    cancel_events[future_strategy].set()
+            pool.shutdown(wait=False)
 
     def _try_fallback_strategies(
         self,
         video_input: str,
         question: str,
         failed_strategy: ProcessStrategy,
-        tried_strategies: list
+        tried_strategies: list,
+        policy: FallbackPolicy,
+        deadline_at: Optional[float],
+        size_mb: Optional[float] = None
     ) -> Optional[Dict[str, Any]]:
         """
-        尝试回退策略
+        沿回退图尝试回退策略：先尝试失败策略的直接回退目标，某个回退策略也失败时，
+        把它的回退目标追加到待尝试队列；跳过已尝试和不适用于该输入的策略
 
         Args:
             video_input: 视频输入
             question: 分析问题
             failed_strategy: 失败的策略
             tried_strategies: 已尝试的策略列表
+            policy: 回退策略
+            deadline_at: 总截止时刻，None 表示不限制
+            size_mb: 文件大小（MB），未知时为None
 
         Returns:
             Dict: 分析结果
         """
-        print(f"\n🔄 主策略失败，尝试回退方案...")
+        self._echo(f"\n🔄 主策略失败，尝试回退方案...")
 
-        # 定义回退策略链
-        fallback_chain = {
-            ProcessStrategy.URL_DIRECT: [],  # URL失败无回退
-            ProcessStrategy.BASE64_SMALL: [],
-            ProcessStrategy.BASE64_LARGE: [ProcessStrategy.BASE64_SMALL]
-        }
+        pending = policy.next_strategies(failed_strategy)
 
-        fallback_strategies = fallback_chain.get(failed_strategy, [])
-
-        for fallback in fallback_strategies:
-            if fallback.value in tried_strategies:
+        while pending:
+            fallback = pending.pop(0)
+            if fallback.value in tried_strategies or not self._strategy_applicable(fallback, video_input, size_mb):
                 continue
 
-            print(f"\n🔄 尝试备选策略: {fallback.value.upper().replace('_', ' ')}")
+            if deadline_at is not None and deadline_at <= time.monotonic():
+                self._echo(f"⏱️  已超过分析总截止时间 ({policy.deadline:g} 秒)，停止回退")
+                return {
+                    "error": f"已超过分析总截止时间 ({policy.deadline:g} 秒)",
+                    "deadline_exceeded": True,
+                    "tried_strategies": tried_strategies
+                }
+
+            self._echo(f"\n🔄 尝试备选策略: {fallback.value.upper().replace('_', ' ')}")
             tried_strategies.append(fallback.value)
 
-            try:
-                result = self._execute_strategy(video_input, question, fallback)
+            result = self._execute_with_budget(video_input, question, fallback, policy, deadline_at, size_mb)
 
-                if result and "error" not in result:
-                    print(f"✅ 备选策略执行成功！")
-                    return result
-                else:
-                    print(f"❌ 备选策略也失败了: {result.get('error', '未知错误')}")
+            if result and "error" not in result:
+                self._echo(f"✅ 备选策略执行成功！")
+                return result
 
-            except Exception as e:
-                logger.error(f"备选策略 {fallback.value} 执行失败: {e}")
-                continue
+            self._echo(f"❌ 备选策略也失败了: {(result or {}).get('error', '未知错误')}")
+            pending.extend(policy.next_strategies(fallback))
 
         # 所有策略都失败
         return {
@@ -266,6 +630,11 @@ class SmartVideoAnalyzer:
             "tried_strategies": tried_strategies
         }
 
+    def _echo(self, message: str = "") -> None:
+        """打印提示信息（verbose 关闭时不输出）"""
+        if self.verbose:
+            print(message)
+
     def set_default_strategy(self, strategy: str) -> bool:
         """
         设置默认策略
@@ -278,11 +647,117 @@ class SmartVideoAnalyzer:
         """
         return self.router.set_default_strategy(strategy)
 
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取运行指标：各策略耗时分布与各模型熔断器状态
+
+        Returns:
+            Dict: 指标快照
+        """
+        return {
+            "latency": self.latency.snapshot(),
+            "circuit_breakers": get_circuit_breakers().snapshot()
+        }
+
     def show_strategy_comparison(self) -> None:
         """显示策略对比"""
         print(self.router.get_strategy_comparison())
 
 
+def build_multi_question_prompt(questions: List[str]) -> str:
+    """
+    将多个问题合并为一个结构化提示词
+
+    Args:
+        questions: 问题列表
+
+    Returns:
+        str: 合并后的提示词
+    """
+    lines = [
+        "请观看这个视频，并依次回答下面的每一个问题。",
+        "回答格式要求：每个回答必须单独以一行标记开头，标记格式为 [Q编号]，"
+        "例如 [Q1]，标记后紧接该问题的完整回答，不要遗漏任何问题。",
+        ""
+    ]
+    for index, question in enumerate(questions, 1):
+        lines.append(f"[Q{index}] {question.strip()}")
+
+    return "\n".join(lines)
+
+
+def split_multi_answers(
+    content: str,
+    count: int,
+    pattern: "re.Pattern[str]" = ANSWER_MARKER_PATTERN
+) -> List[Optional[str]]:
+    """
+    按 [Q编号] 标记拆分多问题回答
+
+    Args:
+        content: 模型返回的完整回答
+        count: 问题数量
+        pattern: 标记正则，第一个分组为从1开始的编号
+
+    Returns:
+        List[Optional[str]]: 按问题顺序排列的回答，无法拆分的问题为None
+    """
+    answers: List[Optional[str]] = [None] * count
+    matches = list(pattern.finditer(content or ""))
+
+    for i, match in enumerate(matches):
+        index = int(match.group(1)) - 1
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        if 0 <= index < count and answers[index] is None:
+            answers[index] = content[match.end():end].strip()
+
+    # 未找到任何标记时，将完整回答归入第一个问题
+    if not matches and content:
+        answers[0] = content.strip()
+        logger.warning("回答中未找到问题标记，无法按问题拆分")
+
+    return answers
+
+
+def build_result_record(
+    result: Optional[Dict[str, Any]],
+    video_input: str,
+    question: Any
+) -> Dict[str, Any]:
+    """
+    将分析结果转换为紧凑的机器可读记录（字段固定，随 RESULT_SCHEMA_VERSION 演进）
+
+    Args:
+        result: 分析结果字典
+        video_input: 视频输入（URL或文件路径）
+        question: 分析问题（多问题时为列表）
+
+    Returns:
+        Dict: 结果记录
+    """
+    result = result or {"error": "未返回结果"}
+
+    message = {}
+    if "choices" in result and len(result["choices"]) > 0:
+        message = result["choices"][0].get("message", {})
+
+    return {
+        "schema_version": RESULT_SCHEMA_VERSION,
+        "input": video_input,
+        "question": question,
+        "ok": "error" not in result,
+        "strategy": result.get("strategy"),
+        "tried_strategies": result.get("tried_strategies", []),
+        "timings": result.get("timings", {}),
+        "usage": result.get("usage"),
+        "content": message.get("content"),
+        "reasoning": message.get("reasoning_content"),
+        "answers": result.get("answers"),
+        "session_id": result.get("session_id"),
+        "error": result.get("error"),
+    }
+
+
 def format_result(result: Dict[str, Any]) -> str:
     """
     格式化分析结果
@@ -319,7 +794,14 @@ def format_result(result: Dict[str, Any]) -> str:
             if reasoning:
                 output.extend(["### 分析推理过程", reasoning, ""])
 
-            if content:
+            if result.get("answers") and len(result["answers"]) > 1:
+                for index, item in enumerate(result["answers"], 1):
+                    output.extend([
+                        f"### 问题{index}: {item['question']}",
+                        item["answer"] if item["answer"] is not None else "（未能从回答中拆分出该问题的答案）",
+                        ""
+                    ])
+            elif content:
                 output.extend(["### 核心内容", content, ""])
 
             # 添加使用统计
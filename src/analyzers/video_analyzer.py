@@ -3,14 +3,20 @@
 本地视频分析工具 - 增强版
 支持本地视频文件的智能分析，使用智谱AI GLM-4.6V模型
 """
-import base64
 import json
 import sys
 import os
-import subprocess
+import threading
+import uuid
 import logging
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from src.core.executor import execute_node_script, VISION_MODEL
+from src.core.circuit_breaker import get_circuit_breakers, CircuitState
+from src.core.fallback import request_timeout
+from src.core.timeouts import base64_strategy
+from src.utils.config_manager import ConfigManager, get_config_manager
+from src.utils.cpu_executor import get_cpu_executor
 
 # 配置日志
 logging.basicConfig(
@@ -23,44 +29,28 @@ logger = logging.getLogger(__name__)
 # 配置常量
 MAX_VIDEO_SIZE_MB = 100  # 最大视频文件大小（MB）
 SUPPORTED_FORMATS = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.webm']
-SCRIPT_TIMEOUT = 600  # 脚本执行超时时间（秒）
+SCRIPT_TIMEOUT = 600  # 默认脚本执行超时时间（秒），analyze 未指定超时时按视频大小和历史耗时计算
 
 
 class VideoAnalyzer:
     """视频分析器类"""
 
-    def __init__(self, config_path: Optional[Path] = None):
+    def __init__(self, config_manager: Optional[ConfigManager] = None):
         """
         初始化视频分析器
 
         Args:
-            config_path: 配置文件路径，默认为当前目录下的 mcp_config.json
+            config_manager: 配置管理器，默认使用全局实例
         """
-        self.config_path = config_path or Path(__file__).parent / "mcp_config.json"
-        self.api_key = None
-        self.temp_files = []  # 跟踪临时文件以便清理
+        self.config = config_manager or get_config_manager()
 
-        self._load_config()
+        if not self.api_key:
+            raise ValueError("配置文件中未找到 Z_AI_API_KEY")
 
-    def _load_config(self) -> None:
-        """加载配置文件"""
-        try:
-            if not self.config_path.exists():
-                raise FileNotFoundError(f"配置文件不存在: {self.config_path}")
-
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-
-            self.api_key = config.get("env", {}).get("Z_AI_API_KEY", "")
-
-            if not self.api_key:
-                raise ValueError("配置文件中未找到 Z_AI_API_KEY")
-
-            logger.info("配置加载成功")
-
-        except Exception as e:
-            logger.error(f"加载配置失败: {e}")
-            raise
+    @property
+    def api_key(self) -> str:
+        """API密钥（每次读取，配置文件修改后自动生效）"""
+        return self.config.get_api_key()
 
     def _validate_video_file(self, video_path: str) -> Path:
         """
@@ -98,41 +88,44 @@ class VideoAnalyzer:
         logger.info(f"视频文件验证通过: {video_path} ({file_size_mb:.2f} MB)")
         return video_file
 
-    def _encode_video_to_base64(self, video_path: Path) -> str:
+    def _encode_video_to_file(self, video_path: Path, temp_files: List[Path]) -> Path:
         """
-        将视频文件编码为Base64
+        将视频文件编码为Base64并写入临时文件（在CPU阶段进程池中执行，编码结果不经过当前进程的内存）
 
         Args:
             video_path: 视频文件路径
+            temp_files: 本次分析的临时文件列表（新文件追加到其中，分析结束后清理）
 
         Returns:
-            str: Base64编码的视频数据
+            Path: Base64数据临时文件路径
         """
+        base64_file = Path(__file__).parent / f"temp_video_base64_{uuid.uuid4().hex[:12]}.txt"
+        temp_files.append(base64_file)
+
         try:
             logger.info("开始读取和编码视频文件...")
-            with open(video_path, "rb") as video_file:
-                video_data = video_file.read()
-                video_base64 = base64.b64encode(video_data).decode('utf-8')
-
-            logger.info(f"Base64编码完成 (长度: {len(video_base64)} 字符)")
-            return video_base64
+            length = get_cpu_executor().encode_file_base64(video_path, base64_file)
+            logger.info(f"Base64编码完成 (长度: {length} 字符)，已保存到临时文件: {base64_file}")
+            return base64_file
 
         except Exception as e:
             logger.error(f"编码视频文件失败: {e}")
             raise
 
-    def _create_analysis_script(self, content: str) -> Path:
+    def _create_analysis_script(self, content: str, base64_file: Path, temp_files: List[Path]) -> Path:
         """
         创建临时分析脚本
 
         Args:
             content: 问题或分析需求
+            base64_file: Base64数据临时文件
+            temp_files: 本次分析的临时文件列表（新文件追加到其中，分析结束后清理）
 
         Returns:
             Path: 脚本文件路径
         """
-        script_path = Path(__file__).parent / "temp_video_analysis.js"
-        self.temp_files.append(script_path)
+        script_path = Path(__file__).parent / f"temp_video_analysis_{uuid.uuid4().hex[:12]}.js"
+        temp_files.append(script_path)
 
         # 转义特殊字符
         content_escaped = (
@@ -151,10 +144,10 @@ async function analyzeVideo() {{
     const ai = new ZhipuAI({{apiKey: "{self.api_key}"}});
 
     // 从文件读取Base64数据
-    const videoBase64 = fs.readFileSync('temp_video_base64.txt', 'utf-8');
+    const videoBase64 = fs.readFileSync('{base64_file.name}', 'utf-8');
 
     const result = await ai.createCompletions({{
-      model: "glm-4.6v",
+      model: "{VISION_MODEL}",
       messages: [{{
         role: "user",
         content: [
@@ -195,81 +188,34 @@ analyzeVideo();
             logger.error(f"创建分析脚本失败: {e}")
             raise
 
-    def _save_base64_data(self, video_base64: str) -> Path:
+    def _execute_analysis(
+        self,
+        script_path: Path,
+        cancel_event: Optional[threading.Event] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
-        保存Base64数据到临时文件
+        执行分析脚本（熔断、超时和取消处理与其他视频请求共用 executor.execute_node_script）
 
         Args:
-            video_base64: Base64编码的视频数据
+            script_path: 脚本文件路径
+            cancel_event: 取消信号，置位后终止分析进程
+            timeout: 超时时间（秒），默认为 SCRIPT_TIMEOUT
 
         Returns:
-            Path: 临时文件路径
+            Dict: 分析结果
         """
-        base64_file = Path(__file__).parent / "temp_video_base64.txt"
-        self.temp_files.append(base64_file)
+        logger.info("正在调用AI分析视频...")
+        return execute_node_script(script_path, cancel_event, VISION_MODEL, timeout or SCRIPT_TIMEOUT)
 
-        try:
-            with open(base64_file, 'w', encoding='utf-8') as f:
-                f.write(video_base64)
-            logger.info(f"Base64数据已保存到临时文件: {base64_file}")
-            return base64_file
-
-        except Exception as e:
-            logger.error(f"保存Base64数据失败: {e}")
-            raise
-
-    def _execute_analysis(self, script_path: Path) -> Dict[str, Any]:
+    def _cleanup(self, temp_files: List[Path]) -> None:
         """
-        执行分析脚本
+        清理一次分析创建的临时文件（每次分析单独跟踪，并发分析之间互不影响）
 
         Args:
-            script_path: 脚本文件路径
-
-        Returns:
-            Dict: 分析结果
+            temp_files: 本次分析的临时文件列表
         """
-        original_cwd = os.getcwd()
-
-        try:
-            os.chdir(Path(__file__).parent)
-            logger.info("正在调用AI分析视频...")
-
-            result = subprocess.run(
-                ['node', str(script_path)],
-                capture_output=True,
-                text=True,
-                timeout=SCRIPT_TIMEOUT
-            )
-
-            os.chdir(original_cwd)
-
-            if result.returncode == 0:
-                try:
-                    response = json.loads(result.stdout)
-                    logger.info("AI分析完成")
-                    return response
-                except json.JSONDecodeError as e:
-                    logger.warning(f"JSON解析失败: {e}")
-                    return {"result": result.stdout}
-            else:
-                error_msg = result.stderr or "未知错误"
-                logger.error(f"脚本执行失败: {error_msg}")
-                return {"error": error_msg}
-
-        except subprocess.TimeoutExpired:
-            logger.error(f"脚本执行超时 (超过 {SCRIPT_TIMEOUT} 秒)")
-            return {"error": f"分析超时 (超过 {SCRIPT_TIMEOUT} 秒)"}
-
-        except Exception as e:
-            logger.error(f"执行分析脚本时出错: {e}")
-            return {"error": str(e)}
-
-        finally:
-            os.chdir(original_cwd)
-
-    def _cleanup(self) -> None:
-        """清理临时文件"""
-        for temp_file in self.temp_files:
+        for temp_file in temp_files:
             try:
                 if temp_file.exists():
                     os.unlink(temp_file)
@@ -277,12 +223,14 @@ analyzeVideo();
             except Exception as e:
                 logger.warning(f"清理临时文件失败 {temp_file}: {e}")
 
-        self.temp_files.clear()
+        temp_files.clear()
 
     def analyze(
         self,
         video_path: str,
-        question: str = "请详细分析这个视频的内容，包括画面、声音、文案、主题等所有信息"
+        question: str = "请详细分析这个视频的内容，包括画面、声音、文案、主题等所有信息",
+        cancel_event: Optional[threading.Event] = None,
+        timeout: Optional[float] = None
     ) -> Optional[Dict[str, Any]]:
         """
         分析本地视频文件
@@ -290,25 +238,33 @@ analyzeVideo();
         Args:
             video_path: 视频文件路径
             question: 分析问题或需求
+            cancel_event: 取消信号，置位后终止分析
+            timeout: 分析脚本的超时时间（秒），默认按视频大小和历史耗时计算
 
         Returns:
             Dict: 分析结果，失败时返回None
         """
+        # 熔断中直接失败，避免无谓的Base64编码
+        if get_circuit_breakers().state_of(VISION_MODEL) == CircuitState.OPEN:
+            return {"error": f"模型 {VISION_MODEL} 服务熔断中，请稍后重试", "circuit_open": True}
+
+        temp_files: List[Path] = []
+
         try:
             # 1. 验证视频文件
             video_file = self._validate_video_file(video_path)
+            if timeout is None:
+                size_mb = video_file.stat().st_size / (1024 * 1024)
+                timeout = request_timeout(base64_strategy(size_mb), size_mb, self.config)
 
-            # 2. 编码为Base64
-            video_base64 = self._encode_video_to_base64(video_file)
-
-            # 3. 保存Base64数据
-            self._save_base64_data(video_base64)
+            # 2. 编码为Base64并保存到临时文件
+            base64_file = self._encode_video_to_file(video_file, temp_files)
 
-            # 4. 创建分析脚本
-            script_path = self._create_analysis_script(question)
+            # 3. 创建分析脚本
+            script_path = self._create_analysis_script(question, base64_file, temp_files)
 
-            # 5. 执行分析
-            result = self._execute_analysis(script_path)
+            # 4. 执行分析
+            result = self._execute_analysis(script_path, cancel_event, timeout)
 
             return result
 
@@ -317,8 +273,8 @@ analyzeVideo();
             return {"error": str(e)}
 
         finally:
-            # 6. 清理临时文件
-            self._cleanup()
+            # 5. 清理临时文件
+            self._cleanup(temp_files)
 
 
 def format_result(result: Dict[str, Any]) -> str:
@@ -2,11 +2,46 @@
 核心功能模块
 包含执行器和路由器
 """
+from src import _lazy_loader
 
-from src.core.executor import execute_tool
-from src.core.router import VideoRouter
+__getattr__ = _lazy_loader(__name__, {
+    "execute_tool": "src.core.executor",
+    "VideoRouter": "src.core.router",
+    "CircuitBreaker": "src.core.circuit_breaker",
+    "CircuitState": "src.core.circuit_breaker",
+    "get_circuit_breakers": "src.core.circuit_breaker",
+    "JobQueue": "src.core.job_queue",
+    "JobStatus": "src.core.job_queue",
+    "SessionStore": "src.core.session_store",
+    "get_session_store": "src.core.session_store",
+    "FolderWatcher": "src.core.watcher",
+    "ResultStore": "src.core.result_store",
+    "S3Uploader": "src.core.uploader",
+    "get_uploader": "src.core.uploader",
+    "FixtureStore": "src.core.transport",
+    "RecordingBackend": "src.core.transport",
+    "ReplayBackend": "src.core.transport",
+    "FallbackPolicy": "src.core.fallback",
+    "AdaptiveTimeouts": "src.core.timeouts",
+})
 
 __all__ = [
     "execute_tool",
     "VideoRouter",
+    "CircuitBreaker",
+    "CircuitState",
+    "get_circuit_breakers",
+    "JobQueue",
+    "JobStatus",
+    "SessionStore",
+    "get_session_store",
+    "FolderWatcher",
+    "ResultStore",
+    "S3Uploader",
+    "get_uploader",
+    "FixtureStore",
+    "RecordingBackend",
+    "ReplayBackend",
+    "FallbackPolicy",
+    "AdaptiveTimeouts",
 ]
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+熔断器模块
+按模型统计调用错误率与慢调用率，服务异常时快速失败，避免大量进程挂起等待超时；
+只有服务端异常（超时、网络/进程错误、5xx、限流过载）计入失败，无效输入等客户端错误不计入
+"""
+import re
+import time
+import logging
+import threading
+from collections import deque
+from enum import Enum
+from typing import Dict, Any, Optional, Deque, Tuple
+
+from src.utils.config_manager import ConfigManager, DEFAULT_PREFERENCES, get_config_manager
+
+logger = logging.getLogger(__name__)
+
+# 熔断器参数默认值（即偏好 circuit_breaker 的默认值）
+DEFAULT_CIRCUIT_BREAKER_OPTIONS = DEFAULT_PREFERENCES["circuit_breaker"]
+
+# 错误信息中的HTTP状态码，例如 "Request failed with status code 503"、"HTTP 429"
+_STATUS_PATTERN = re.compile(r"(?:status(?:\s*code)?|HTTP)\s*:?\s*(\d{3})\b", re.IGNORECASE)
+
+# 网络传输和服务过载类错误
+_TRANSIENT_PATTERN = re.compile(
+    r"ECONNRESET|ECONNREFUSED|ECONNABORTED|ETIMEDOUT|ENOTFOUND|EAI_AGAIN|EPIPE|"
+    r"socket hang up|network error|overload|too many requests|service unavailable|"
+    r"服务(?:繁忙|不可用)|过载",
+    re.IGNORECASE
+)
+
+
+def is_service_failure(response: Dict[str, Any]) -> bool:
+    """
+    判断失败响应是否为服务端异常（计入熔断）：超时、网络传输错误、5xx 和 429 限流；
+    无效输入、请求过大、其他 4xx 等客户端错误不代表服务异常
+
+    Args:
+        response: 包含 error 字段的响应
+
+    Returns:
+        bool: 是否计入熔断失败
+    """
+    if response.get("timeout"):
+        return True
+
+    text = f"{response.get('error', '')} {response.get('code', '')}"
+    status = response.get("status") or response.get("status_code")
+    if status is None:
+        match = _STATUS_PATTERN.search(text)
+        status = match.group(1) if match else None
+
+    if status is not None:
+        try:
+            status = int(status)
+        except (TypeError, ValueError):
+            status = None
+        if status is not None:
+            return status >= 500 or status == 429
+
+    return bool(_TRANSIENT_PATTERN.search(text))
+
+
+class CircuitState(Enum):
+    """熔断器状态枚举"""
+    CLOSED = "closed"        # 正常放行
+    OPEN = "open"            # 熔断中，直接拒绝
+    HALF_OPEN = "half_open"  # 半开，放行少量探测请求
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被拒绝"""
+
+
+class CircuitBreaker:
+    """基于滑动窗口的熔断器（线程安全）"""
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = DEFAULT_CIRCUIT_BREAKER_OPTIONS["window_size"],
+        min_calls: int = DEFAULT_CIRCUIT_BREAKER_OPTIONS["min_calls"],
+        failure_rate_threshold: float = DEFAULT_CIRCUIT_BREAKER_OPTIONS["failure_rate_threshold"],
+        slow_call_duration: float = DEFAULT_CIRCUIT_BREAKER_OPTIONS["slow_call_duration"],
+        slow_call_rate_threshold: float = DEFAULT_CIRCUIT_BREAKER_OPTIONS["slow_call_rate_threshold"],
+        open_duration: float = DEFAULT_CIRCUIT_BREAKER_OPTIONS["open_duration"],
+        half_open_max_calls: int = DEFAULT_CIRCUIT_BREAKER_OPTIONS["half_open_max_calls"]
+    ):
+        """
+        初始化熔断器
+
+        Args:
+            name: 熔断器名称（通常为模型名）
+            window_size: 统计窗口内的调用次数
+            min_calls: 开始计算比率前所需的最少调用次数
+            failure_rate_threshold: 失败率阈值，达到后打开熔断
+            slow_call_duration: 慢调用判定耗时（秒）
+            slow_call_rate_threshold: 慢调用率阈值，达到后打开熔断
+            open_duration: 打开状态持续时间（秒），之后进入半开
+            half_open_max_calls: 半开状态允许的并发探测请求数
+        """
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+
+        # 窗口元素: (是否失败, 是否慢调用)
+        self._calls: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        """当前状态（打开超时后自动转为半开）"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> CircuitState:
+        if (self._state == CircuitState.OPEN
+                and time.monotonic() - self._opened_at >= self.open_duration):
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_in_flight = 0
+            logger.info(f"熔断器 {self.name} 进入半开状态，开始探测")
+        return self._state
+
+    def allow_request(self) -> bool:
+        """
+        判断是否放行请求（半开状态下会占用一个探测名额）
+
+        Returns:
+            bool: 是否放行
+        """
+        with self._lock:
+            state = self._current_state()
+
+            if state == CircuitState.CLOSED:
+                return True
+
+            if state == CircuitState.HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                return True
+
+            return False
+
+    def record_success(self, duration: float) -> None:
+        """
+        记录一次成功调用
+
+        Args:
+            duration: 调用耗时（秒）
+        """
+        self._record(False, duration)
+
+    def record_failure(self, duration: float) -> None:
+        """
+        记录一次失败调用
+
+        Args:
+            duration: 调用耗时（秒）
+        """
+        self._record(True, duration)
+
+    def record_result(self, response: Dict[str, Any], duration: float, service_failure: bool = False) -> None:
+        """
+        按调用结果记录：成功计入成功，服务端异常计入失败，客户端错误只释放半开探测名额
+
+        Args:
+            response: 调用结果
+            duration: 调用耗时（秒）
+            service_failure: 调用方已确定为服务端异常（如进程启动失败、传输异常）
+        """
+        if "error" not in response:
+            self.record_success(duration)
+        elif service_failure or is_service_failure(response):
+            self.record_failure(duration)
+        else:
+            self.release()
+
+    def release(self) -> None:
+        """释放半开探测名额（调用被取消、客户端错误等无法判定服务成败时使用）"""
+        with self._lock:
+            if self._half_open_in_flight > 0:
+                self._half_open_in_flight -= 1
+
+    def _record(self, failed: bool, duration: float) -> None:
+        slow = duration >= self.slow_call_duration
+
+        with self._lock:
+            state = self._current_state()
+
+            if state == CircuitState.HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                if failed or slow:
+                    self._open()
+                else:
+                    self._state = CircuitState.CLOSED
+                    self._calls.clear()
+                    logger.info(f"熔断器 {self.name} 探测成功，恢复正常")
+                return
+
+            self._calls.append((failed, slow))
+
+            if state == CircuitState.CLOSED and len(self._calls) >= self.min_calls:
+                failure_rate, slow_rate = self._rates()
+                if (failure_rate >= self.failure_rate_threshold
+                        or slow_rate >= self.slow_call_rate_threshold):
+                    self._open()
+
+    def _rates(self) -> Tuple[float, float]:
+        total = len(self._calls)
+        if total == 0:
+            return 0.0, 0.0
+        failures = sum(1 for failed, _ in self._calls if failed)
+        slow_calls = sum(1 for _, slow in self._calls if slow)
+        return failures / total, slow_calls / total
+
+    def _open(self) -> None:
+        self._state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        logger.warning(f"熔断器 {self.name} 已打开，{self.open_duration:.0f} 秒内请求将快速失败")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取熔断器状态摘要
+
+        Returns:
+            Dict: 状态、窗口调用数、失败率、慢调用率
+        """
+        with self._lock:
+            state = self._current_state()
+            failure_rate, slow_rate = self._rates()
+            return {
+                "name": self.name,
+                "state": state.value,
+                "calls": len(self._calls),
+                "failure_rate": round(failure_rate, 3),
+                "slow_call_rate": round(slow_rate, 3),
+            }
+
+
+class CircuitBreakerRegistry:
+    """按名称（模型）管理熔断器"""
+
+    def __init__(self, **breaker_options: Any):
+        """
+        初始化熔断器注册表
+
+        Args:
+            **breaker_options: 创建熔断器时使用的参数
+        """
+        self.breaker_options = breaker_options
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        """
+        获取（必要时创建）指定名称的熔断器
+
+        Args:
+            name: 熔断器名称，通常为模型名
+
+        Returns:
+            CircuitBreaker: 熔断器实例
+        """
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, **self.breaker_options)
+                self._breakers[name] = breaker
+            return breaker
+
+    def state_of(self, name: str) -> Optional[CircuitState]:
+        """
+        查询熔断器状态（不创建新熔断器）
+
+        Args:
+            name: 熔断器名称
+
+        Returns:
+            Optional[CircuitState]: 状态，未使用过的名称返回None
+        """
+        with self._lock:
+            breaker = self._breakers.get(name)
+        return breaker.state if breaker else None
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取所有熔断器状态
+
+        Returns:
+            Dict: {名称: 状态摘要}
+        """
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+    @classmethod
+    def from_config(cls, config_manager: Optional[ConfigManager] = None) -> "CircuitBreakerRegistry":
+        """
+        根据用户偏好 circuit_breaker 创建注册表（未知参数记录警告后忽略）
+
+        Args:
+            config_manager: 配置管理器，默认使用全局实例
+
+        Returns:
+            CircuitBreakerRegistry: 熔断器注册表
+        """
+        config = config_manager or get_config_manager()
+        options = {}
+        for key, value in (config.get_preference("circuit_breaker") or {}).items():
+            if key in DEFAULT_CIRCUIT_BREAKER_OPTIONS:
+                options[key] = type(DEFAULT_CIRCUIT_BREAKER_OPTIONS[key])(value)
+            else:
+                logger.warning(f"未知的熔断器参数，已忽略: {key}")
+        return cls(**options)
+
+    def reset(self) -> None:
+        """清除所有熔断器的状态和统计（下次使用时重新创建）"""
+        with self._lock:
+            self._breakers.clear()
+
+
+# 全局熔断器注册表
+_global_circuit_breakers = None
+
+
+def get_circuit_breakers() -> CircuitBreakerRegistry:
+    """
+    获取全局熔断器注册表（单例模式，参数取偏好 circuit_breaker，仅在首次创建时读取）
+
+    Returns:
+        CircuitBreakerRegistry: 熔断器注册表
+    """
+    global _global_circuit_breakers
+    if _global_circuit_breakers is None:
+        _global_circuit_breakers = CircuitBreakerRegistry.from_config()
+    return _global_circuit_breakers
@@ -7,9 +7,24 @@ import json
 import sys
 import os
 import subprocess
+import threading
+import time
+import uuid
 import logging
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable
+from src.core.circuit_breaker import get_circuit_breakers
+from src.core.fallback import request_timeout
+from src.core.router import ProcessStrategy
+from src.core.timeouts import base64_strategy
+from src.core.session_store import (
+    get_session_store, needs_media, result_content, DEFAULT_CONTEXT_TOKENS
+)
+from src.utils.config_manager import get_config_manager
+from src.utils.tokens import content_text, fit_messages, get_token_estimator
+from src.utils.image_preprocessor import (
+    ImagePreprocessor, is_remote_image, DEFAULT_MAX_EDGE, DEFAULT_IMAGE_FORMAT
+)
 
 # 配置日志
 logging.basicConfig(
@@ -20,12 +35,37 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # 配置常量
-SCRIPT_TIMEOUT = 300  # 脚本执行超时时间（秒）
+SCRIPT_TIMEOUT = 300  # 默认脚本执行超时时间（秒），视频分析请求未指定超时时按大小和历史耗时计算
+CANCEL_POLL_INTERVAL = 0.2  # 检查取消信号的间隔（秒）
+VISION_MODEL = "glm-4.6v"  # 图像/视频理解使用的模型
+
+# 脚本执行后端：签名同 run_node_script，None 表示启动真实的 Node.js 进程；
+# 压测时替换为模拟后端，脚本生成、熔断、Base64编码等其余环节保持不变
+ScriptBackend = Callable[[Path, float, Optional[threading.Event]], subprocess.CompletedProcess]
+_script_backend: Optional[ScriptBackend] = None
+
+
+class ScriptCancelled(Exception):
+    """脚本执行被取消（例如对冲请求中落败的一方）"""
+
+
+def _temp_path(prefix: str, suffix: str) -> Path:
+    """
+    生成唯一的临时文件路径，避免并发请求互相覆盖
+
+    Args:
+        prefix: 文件名前缀
+        suffix: 文件扩展名
+
+    Returns:
+        Path: 临时文件路径
+    """
+    return Path(__file__).parent / f"{prefix}_{uuid.uuid4().hex[:12]}{suffix}"
 
 
 def load_mcp_config() -> Dict[str, Any]:
     """
-    加载MCP配置文件
+    加载MCP配置（共享全局 ConfigManager 的缓存，文件修改后自动重新加载）
 
     Returns:
         Dict: 配置字典
@@ -34,39 +74,23 @@ def load_mcp_config() -> Dict[str, Any]:
         FileNotFoundError: 配置文件不存在
         ValueError: 配置文件格式错误或缺少必要字段
     """
-    config_path = Path(__file__).parent / "mcp_config.json"
-
-    try:
-        if not config_path.exists():
-            raise FileNotFoundError(f"配置文件不存在: {config_path}")
-
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-
-        # 验证必要字段
-        if "env" not in config:
-            raise ValueError("配置文件缺少 'env' 字段")
-
-        if "Z_AI_API_KEY" not in config.get("env", {}):
-            raise ValueError("配置文件中未找到 Z_AI_API_KEY")
-
-        logger.info("配置加载成功")
-        return config
-
-    except json.JSONDecodeError as e:
-        raise ValueError(f"配置文件JSON格式错误: {e}")
-    except Exception as e:
-        logger.error(f"加载配置失败: {e}")
-        raise
+    return get_config_manager().load_mcp_config()
 
 
-def execute_tool(tool_name: str, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+def execute_tool(
+    tool_name: str,
+    tool_input: Dict[str, Any],
+    cancel_event: Optional[threading.Event] = None,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
     """
     执行指定的MCP工具
 
     Args:
         tool_name: 工具名称
         tool_input: 工具输入参数
+        cancel_event: 取消信号，置位后终止正在执行的脚本
+        timeout: 视频分析脚本的超时时间（秒），默认为 SCRIPT_TIMEOUT
 
     Returns:
         Dict: 执行结果
@@ -75,7 +99,7 @@ def execute_tool(tool_name: str, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         config = load_mcp_config()
 
         if tool_name == "chat_completion":
-            return handle_chat_completion(tool_input, config)
+            return handle_chat_completion(tool_input, config, cancel_event, timeout)
         elif tool_name == "image_understanding":
             return handle_image_understanding(tool_input, config)
         elif tool_name == "text_generation":
@@ -88,13 +112,20 @@ def execute_tool(tool_name: str, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         return {"error": str(e)}
 
 
-def handle_chat_completion(tool_input: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+def handle_chat_completion(
+    tool_input: Dict[str, Any],
+    config: Dict[str, Any],
+    cancel_event: Optional[threading.Event] = None,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
     """
     处理聊天完成请求
 
     Args:
         tool_input: 工具输入参数
         config: 配置字典
+        cancel_event: 取消信号
+        timeout: 视频分析脚本的超时时间（秒）
 
     Returns:
         Dict: 执行结果
@@ -105,6 +136,9 @@ def handle_chat_completion(tool_input: Dict[str, Any], config: Dict[str, Any]) -
     if not messages:
         return {"error": "缺少 messages 参数"}
 
+    if tool_input.get("session_id"):
+        return handle_session_chat(tool_input, api_key, cancel_event, timeout)
+
     video_base64 = None
     video_url = None
     content = ""
@@ -121,33 +155,138 @@ def handle_chat_completion(tool_input: Dict[str, Any], config: Dict[str, Any]) -
     # 根据不同输入类型调用相应处理函数
     if video_base64:
         logger.info("使用Base64格式处理视频")
-        return analyze_video_base64(video_base64, content, api_key)
+        return analyze_video_base64(video_base64, content, api_key, cancel_event, timeout)
     elif video_url:
         logger.info("使用URL格式处理视频")
-        return analyze_video_url(video_url, content, api_key)
+        return analyze_video_url(video_url, content, api_key, cancel_event, timeout)
     else:
         # 普通文本聊天
         logger.info("处理普通文本聊天")
-        return handle_text_chat(messages, tool_input.get("model", "glm-4"), api_key)
+        return handle_text_chat(
+            messages, tool_input.get("model", "glm-4"), api_key, tool_input.get("max_tokens")
+        )
 
 
-def handle_text_chat(messages: list, model: str, api_key: str) -> Dict[str, Any]:
+def handle_session_chat(
+    tool_input: Dict[str, Any],
+    api_key: str,
+    cancel_event: Optional[threading.Event] = None,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    处理带会话ID的对话请求
+
+    携带视频的请求正常分析并记录到会话；追问默认只发送文本上下文
+    （历史问答 + 视频描述），仅当问题需要重新查看画面（或 refresh_media 为真）
+    且会话视频为URL时才重新发送视频
+
+    Args:
+        tool_input: 工具输入参数（session_id、messages，可选 max_context_tokens、refresh_media）
+        api_key: API密钥
+        cancel_event: 取消信号
+        timeout: 脚本超时时间（秒）
+
+    Returns:
+        Dict: 执行结果，附带 session_id 和 context_only（是否仅使用文本上下文）
+    """
+    store = get_session_store()
+    session_id = tool_input["session_id"]
+    messages = tool_input["messages"]
+
+    video_url = None
+    video_base64 = None
+    for msg in messages:
+        video_url = msg.pop("video_url", video_url)
+        video_base64 = msg.pop("video_base64", video_base64)
+
+    # 多模态消息只取文本部分作为问题
+    question = content_text(messages[-1].get("content")) or "请分析这个视频"
+    session = store.get_session(session_id)
+
+    if video_url or video_base64:
+        # 新视频：正常分析，回答作为后续追问的上下文
+        if video_url:
+            result = analyze_video_url(video_url, question, api_key, cancel_event, timeout)
+        else:
+            result = analyze_video_base64(video_base64, question, api_key, cancel_event, timeout)
+        media = video_url
+        context_only = False
+
+    elif session is None:
+        return {"error": f"会话不存在: {session_id}"}
+
+    elif (tool_input.get("refresh_media") or needs_media(question)) and \
+            (session.get("media") or "").startswith(("http://", "https://")):
+        logger.info(f"会话 {session_id}: 问题需要查看画面，重新发送视频")
+        context = store.build_messages(
+            session_id, question, int(tool_input.get("max_context_tokens", DEFAULT_CONTEXT_TOKENS))
+        )
+        prompt = "\n\n".join(
+            f"[{msg['role']}] {msg['content']}" for msg in context[1:-1]
+        )
+        prompt = f"之前的对话:\n{prompt}\n\n问题: {question}" if prompt else question
+        result = analyze_video_url(session["media"], prompt, api_key, cancel_event, timeout)
+        media = None
+        context_only = False
+
+    else:
+        if needs_media(question):
+            logger.warning(f"会话 {session_id}: 视频不是在线URL，无法重新发送，仅使用文本上下文")
+        logger.info(f"会话 {session_id}: 使用文本上下文回答追问")
+        chat_messages = store.build_messages(
+            session_id, question, int(tool_input.get("max_context_tokens", DEFAULT_CONTEXT_TOKENS))
+        )
+        result = handle_text_chat(
+            chat_messages, tool_input.get("model", "glm-4"), api_key, tool_input.get("max_tokens")
+        )
+        media = None
+        context_only = True
+
+    if not result or "error" in result:
+        return result
+
+    store.record_exchange(session_id, question, result_content(result), media)
+    result["session_id"] = session_id
+    result["context_only"] = context_only
+    return result
+
+
+def handle_text_chat(
+    messages: list,
+    model: str,
+    api_key: str,
+    max_tokens: Optional[int] = None
+) -> Dict[str, Any]:
     """
     处理普通文本聊天
 
+    发送前估算提示词Token数：超出模型上下文时从最早的历史消息开始裁剪，
+    裁剪后仍超出则直接返回错误，不发起请求
+
     Args:
         messages: 消息列表
         model: 模型名称
         api_key: API密钥
+        max_tokens: 回答的最大Token数（可选）
 
     Returns:
-        Dict: 执行结果
+        Dict: 执行结果，附带 estimated_prompt_tokens
     """
     try:
-        script_path = Path(__file__).parent / "temp_chat_script.js"
+        messages, estimated_tokens, dropped = fit_messages(messages, model, max_tokens)
+    except ValueError as e:
+        logger.error(f"提示词超出上下文限制: {e}")
+        return {"error": str(e)}
+
+    if dropped:
+        logger.warning(f"提示词超出上下文限制，已省略最早的 {dropped} 条消息")
+
+    try:
+        script_path = _temp_path("temp_chat_script", ".js")
 
         # 转换消息格式
         messages_json = json.dumps(messages, ensure_ascii=False)
+        max_tokens_option = f",\n      max_tokens: {int(max_tokens)}" if max_tokens else ""
 
         with open(script_path, 'w', encoding='utf-8') as f:
             f.write(f'''
@@ -160,7 +299,7 @@ async function chat() {{
 
     const result = await ai.createCompletions({{
       model: "{model}",
-      messages: messages
+      messages: messages{max_tokens_option}
     }});
 
     console.log(JSON.stringify(result));
@@ -177,12 +316,17 @@ chat();
 ''')
 
         # 执行脚本
-        result = _execute_node_script(script_path)
+        result = execute_node_script(script_path, model=model)
 
         # 清理临时文件
         if script_path.exists():
             os.unlink(script_path)
 
+        if result and "error" not in result:
+            # 用真实用量校准本地估算
+            get_token_estimator().observe(messages, (result.get("usage") or {}).get("prompt_tokens"))
+            result["estimated_prompt_tokens"] = estimated_tokens
+
         return result
 
     except Exception as e:
@@ -194,6 +338,9 @@ def handle_image_understanding(tool_input: Dict[str, Any], config: Dict[str, Any
     """
     处理图像理解请求
 
+    支持单张图像（image_url）或一次请求多张图像（image_urls）；
+    本地图像路径会被缩放（max_edge）并重新压缩（image_format）后发送
+
     Args:
         tool_input: 工具输入参数
         config: 配置字典
@@ -201,42 +348,54 @@ def handle_image_understanding(tool_input: Dict[str, Any], config: Dict[str, Any
     Returns:
         Dict: 执行结果
     """
-    image_url = tool_input.get("image_url", "")
+    image_urls = tool_input.get("image_urls") or []
+    if tool_input.get("image_url"):
+        image_urls = [tool_input["image_url"]] + list(image_urls)
     question = tool_input.get("question", "请描述这张图片")
     api_key = config.get("env", {}).get("Z_AI_API_KEY", "")
 
-    if not image_url:
+    if not image_urls:
         return {"error": "缺少 image_url 参数"}
 
     try:
-        script_path = Path(__file__).parent / "temp_image_script.js"
-        question_escaped = question.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
-        image_url_escaped = image_url.replace('\\', '\\\\').replace('"', '\\"')
+        # 本地图像：缩放、重新压缩后以Data URI发送
+        local_images = [url for url in image_urls if not is_remote_image(url)]
+        if local_images:
+            preprocessor = ImagePreprocessor(
+                max_edge=int(tool_input.get("max_edge", DEFAULT_MAX_EDGE)),
+                image_format=tool_input.get("image_format", DEFAULT_IMAGE_FORMAT)
+            )
+            data_uris = dict(zip(local_images, preprocessor.preprocess_many(local_images)))
+            image_urls = [data_uris.get(url, url) for url in image_urls]
+
+        script_path = _temp_path("temp_image_script", ".js")
+        content_file = _temp_path("temp_image_content", ".json")
+
+        # 图像数据（可能是较大的Base64）写入单独文件，避免嵌入脚本源码
+        content = [
+            {"type": "image_url", "image_url": {"url": url}}
+            for url in image_urls
+        ]
+        content.append({"type": "text", "text": question})
+
+        with open(content_file, 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False)
 
         with open(script_path, 'w', encoding='utf-8') as f:
             f.write(f'''
 const {{ZhipuAI}} = require("zhipuai-sdk-nodejs-v4");
+const fs = require('fs');
 
 async function analyzeImage() {{
   try {{
     const ai = new ZhipuAI({{apiKey: "{api_key}"}});
+    const content = JSON.parse(fs.readFileSync('{content_file.name}', 'utf-8'));
 
     const result = await ai.createCompletions({{
-      model: "glm-4.6v",
+      model: "{VISION_MODEL}",
       messages: [{{
         role: "user",
-        content: [
-          {{
-            type: "image_url",
-            image_url: {{
-              url: "{image_url_escaped}"
-            }}
-          }},
-          {{
-            type: "text",
-            text: "{question_escaped}"
-          }}
-        ]
+        content: content
       }}]
     }});
 
@@ -254,11 +413,12 @@ analyzeImage();
 ''')
 
         # 执行脚本
-        result = _execute_node_script(script_path)
+        result = execute_node_script(script_path, model=VISION_MODEL)
 
         # 清理临时文件
-        if script_path.exists():
-            os.unlink(script_path)
+        for temp_file in [script_path, content_file]:
+            if temp_file.exists():
+                os.unlink(temp_file)
 
         return result
 
@@ -286,10 +446,16 @@ def handle_text_generation(tool_input: Dict[str, Any], config: Dict[str, Any]) -
         return {"error": "缺少 prompt 参数"}
 
     messages = [{"role": "user", "content": prompt}]
-    return handle_text_chat(messages, model, api_key)
+    return handle_text_chat(messages, model, api_key, tool_input.get("max_tokens"))
 
 
-def analyze_video_base64(video_base64: str, content: str, api_key: str) -> Dict[str, Any]:
+def analyze_video_base64(
+    video_base64: str,
+    content: str,
+    api_key: str,
+    cancel_event: Optional[threading.Event] = None,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
     """
     使用Base64编码的视频进行分析
 
@@ -297,13 +463,19 @@ def analyze_video_base64(video_base64: str, content: str, api_key: str) -> Dict[
         video_base64: Base64编码的视频数据
         content: 分析问题
         api_key: API密钥
+        cancel_event: 取消信号
+        timeout: 脚本超时时间（秒），默认按视频大小和历史耗时计算
 
     Returns:
         Dict: 分析结果
     """
+    if timeout is None:
+        size_mb = len(video_base64) * 3 / 4 / (1024 * 1024)
+        timeout = request_timeout(base64_strategy(size_mb), size_mb)
+
     try:
-        script_path = Path(__file__).parent / "temp_base64_script.js"
-        base64_file = Path(__file__).parent / "temp_video_base64.txt"
+        script_path = _temp_path("temp_base64_script", ".js")
+        base64_file = _temp_path("temp_video_base64", ".txt")
 
         # 保存Base64数据到文件
         with open(base64_file, 'w', encoding='utf-8') as f:
@@ -319,10 +491,10 @@ const fs = require('fs');
 async function analyzeVideo() {{
   try {{
     const ai = new ZhipuAI({{apiKey: "{api_key}"}});
-    const videoBase64 = fs.readFileSync('temp_video_base64.txt', 'utf-8');
+    const videoBase64 = fs.readFileSync('{base64_file.name}', 'utf-8');
 
     const result = await ai.createCompletions({{
-      model: "glm-4.6v",
+      model: "{VISION_MODEL}",
       messages: [{{
         role: "user",
         content: [
@@ -354,7 +526,7 @@ analyzeVideo();
 ''')
 
         # 执行脚本
-        result = _execute_node_script(script_path)
+        result = execute_node_script(script_path, cancel_event, VISION_MODEL, timeout)
 
         # 清理临时文件
         for temp_file in [script_path, base64_file]:
@@ -368,7 +540,13 @@ analyzeVideo();
         return {"error": str(e)}
 
 
-def analyze_video_url(video_url: str, content: str, api_key: str) -> Dict[str, Any]:
+def analyze_video_url(
+    video_url: str,
+    content: str,
+    api_key: str,
+    cancel_event: Optional[threading.Event] = None,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
     """
     使用视频URL进行分析
 
@@ -376,12 +554,17 @@ def analyze_video_url(video_url: str, content: str, api_key: str) -> Dict[str, A
         video_url: 视频URL
         content: 分析问题
         api_key: API密钥
+        cancel_event: 取消信号
+        timeout: 脚本超时时间（秒），默认按URL方式的历史耗时计算
 
     Returns:
         Dict: 分析结果
     """
+    if timeout is None:
+        timeout = request_timeout(ProcessStrategy.URL_DIRECT, None)
+
     try:
-        script_path = Path(__file__).parent / "temp_url_script.js"
+        script_path = _temp_path("temp_url_script", ".js")
 
         # 转义特殊字符
         content_escaped = content.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -396,7 +579,7 @@ async function analyzeVideo() {{
     const ai = new ZhipuAI({{apiKey: "{api_key}"}});
 
     const result = await ai.createCompletions({{
-      model: "glm-4.6v",
+      model: "{VISION_MODEL}",
       messages: [{{
         role: "user",
         content: [
@@ -428,7 +611,7 @@ analyzeVideo();
 ''')
 
         # 执行脚本
-        result = _execute_node_script(script_path)
+        result = execute_node_script(script_path, cancel_event, VISION_MODEL, timeout)
 
         # 清理临时文件
         if script_path.exists():
@@ -441,54 +624,159 @@ analyzeVideo();
         return {"error": str(e)}
 
 
-def _execute_node_script(script_path: Path) -> Dict[str, Any]:
+def set_script_backend(backend: Optional[ScriptBackend]) -> Optional[ScriptBackend]:
+    """
+    替换脚本执行后端（对本模块和 VideoAnalyzer 的所有脚本执行生效）
+
+    Args:
+        backend: 新的执行后端，None 表示恢复为启动 Node.js 进程
+
+    Returns:
+        Optional[ScriptBackend]: 之前的执行后端
+    """
+    global _script_backend
+    previous, _script_backend = _script_backend, backend
+    return previous
+
+
+def run_node_script(
+    script_path: Path,
+    timeout: float = SCRIPT_TIMEOUT,
+    cancel_event: Optional[threading.Event] = None
+) -> subprocess.CompletedProcess:
+    """
+    执行Node.js脚本（设置了执行后端时交给后端处理）
+
+    Args:
+        script_path: 脚本文件路径
+        timeout: 超时时间（秒）
+        cancel_event: 取消信号，置位后立即终止进程
+
+    Returns:
+        subprocess.CompletedProcess: 进程执行结果
+
+    Raises:
+        subprocess.TimeoutExpired: 执行超时
+        ScriptCancelled: 执行被取消
     """
-    执行Node.js脚本
+    backend = _script_backend
+    if backend is not None:
+        return backend(script_path, timeout, cancel_event)
+    return spawn_node_script(script_path, timeout, cancel_event)
+
+
+def spawn_node_script(
+    script_path: Path,
+    timeout: float = SCRIPT_TIMEOUT,
+    cancel_event: Optional[threading.Event] = None
+) -> subprocess.CompletedProcess:
+    """
+    以脚本所在目录为工作目录启动Node.js进程，支持超时与取消
 
     Args:
         script_path: 脚本文件路径
+        timeout: 超时时间（秒）
+        cancel_event: 取消信号，置位后立即终止进程
+
+    Returns:
+        subprocess.CompletedProcess: 进程执行结果
+
+    Raises:
+        subprocess.TimeoutExpired: 执行超时
+        ScriptCancelled: 执行被取消
+    """
+    process = subprocess.Popen(
+        ['node', str(script_path)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding='utf-8',
+        cwd=str(script_path.parent)
+    )
+    deadline = time.monotonic() + timeout
+
+    while True:
+        remaining = deadline - time.monotonic()
+
+        if remaining <= 0:
+            process.kill()
+            process.communicate()
+            raise subprocess.TimeoutExpired(process.args, timeout)
+
+        if cancel_event is not None and cancel_event.is_set():
+            process.kill()
+            process.communicate()
+            raise ScriptCancelled(f"脚本执行已取消: {script_path.name}")
+
+        try:
+            stdout, stderr = process.communicate(timeout=min(remaining, CANCEL_POLL_INTERVAL))
+            return subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr)
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def execute_node_script(
+    script_path: Path,
+    cancel_event: Optional[threading.Event] = None,
+    model: str = VISION_MODEL,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    执行Node.js脚本（经过模型熔断器）
+
+    Args:
+        script_path: 脚本文件路径
+        cancel_event: 取消信号
+        model: 请求使用的模型，用于选择熔断器
+        timeout: 超时时间（秒），默认为 SCRIPT_TIMEOUT
 
     Returns:
         Dict: 执行结果
     """
-    original_cwd = os.getcwd()
+    breaker = get_circuit_breakers().get(model)
+    if not breaker.allow_request():
+        logger.warning(f"模型 {model} 熔断中，跳过脚本执行: {script_path.name}")
+        return {"error": f"模型 {model} 服务熔断中，请稍后重试", "circuit_open": True}
+
+    timeout = timeout or SCRIPT_TIMEOUT
+    started = time.monotonic()
+    service_failure = False
 
     try:
-        os.chdir(Path(__file__).parent)
         logger.info(f"执行脚本: {script_path.name}")
 
-        result = subprocess.run(
-            ['node', str(script_path)],
-            capture_output=True,
-            text=True,
-            timeout=SCRIPT_TIMEOUT
-        )
-
-        os.chdir(original_cwd)
+        result = run_node_script(script_path, timeout, cancel_event)
 
         if result.returncode == 0:
             try:
                 response = json.loads(result.stdout)
                 logger.info("脚本执行成功")
-                return response
             except json.JSONDecodeError as e:
                 logger.warning(f"JSON解析失败: {e}")
-                return {"result": result.stdout}
+                response = {"result": result.stdout}
         else:
             error_msg = result.stderr or "未知错误"
             logger.error(f"脚本执行失败: {error_msg}")
-            return {"error": error_msg}
+            response = {"error": error_msg}
 
     except subprocess.TimeoutExpired:
-        logger.error(f"脚本执行超时 (超过 {SCRIPT_TIMEOUT} 秒)")
-        return {"error": f"脚本执行超时 (超过 {SCRIPT_TIMEOUT} 秒)"}
+        logger.error(f"脚本执行超时 (超过 {timeout:g} 秒)")
+        response = {"error": f"脚本执行超时 (超过 {timeout:g} 秒)", "timeout": True}
+
+    except ScriptCancelled as e:
+        logger.info(str(e))
+        breaker.release()
+        return {"error": str(e), "cancelled": True}
 
     except Exception as e:
         logger.error(f"执行脚本时出错: {e}")
-        return {"error": str(e)}
+        response = {"error": str(e)}
+        service_failure = True
+
+    # 无效输入、请求过大、4xx 等客户端错误不计入熔断失败
+    breaker.record_result(response, time.monotonic() - started, service_failure)
 
-    finally:
-        os.chdir(original_cwd)
+    return response
 
 
 if __name__ == "__main__":
@@ -496,7 +784,7 @@ if __name__ == "__main__":
         print("用法: executor.py <tool_name> <tool_input_json>")
         print("\n支持的工具:")
         print("  - chat_completion: 聊天对话和视频分析")
-        print("  - image_understanding: 图像理解")
+        print("  - image_understanding: 图像理解（image_url 或多图 image_urls）")
         print("  - text_generation: 文本生成")
         print("\n示例:")
         print('  python executor.py chat_completion \'{"messages":[{"role":"user","content":"你好"}]}\'')
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+回退策略图
+按用户偏好声明各处理策略失败后可以切换到哪些策略（fallback_graph，设为 None 时由 strategy_order
+推导），以及每个策略的超时上限和尝试次数（strategy_policies）；启用自适应超时（adaptive_timeouts）时，
+每次尝试的超时按文件大小和历史耗时计算（见 timeouts 模块），不超过策略的超时上限。
+一次分析的主策略、重试和所有回退共同受总截止时间（analysis_deadline）约束
+"""
+import time
+import logging
+from typing import Optional, Dict, Any, List
+
+from src.core.router import ProcessStrategy
+from src.core.timeouts import AdaptiveTimeouts
+from src.utils.config_manager import ConfigManager, DEFAULT_PREFERENCES, get_config_manager
+
+logger = logging.getLogger(__name__)
+
+# 默认回退图、各策略的超时上限（秒）和尝试次数以及总截止时间（秒）均取偏好默认值
+DEFAULT_FALLBACK_GRAPH = DEFAULT_PREFERENCES["fallback_graph"]
+DEFAULT_STRATEGY_POLICIES = DEFAULT_PREFERENCES["strategy_policies"]
+DEFAULT_ANALYSIS_DEADLINE = float(DEFAULT_PREFERENCES["analysis_deadline"])
+
+# 未在策略配置中列出的策略使用的默认值
+DEFAULT_STRATEGY_TIMEOUT = 300.0
+DEFAULT_STRATEGY_ATTEMPTS = 1
+
+
+def _strategy(name: Any) -> Optional[ProcessStrategy]:
+    """把策略名称转换为 ProcessStrategy，无法识别时记录警告并返回None"""
+    try:
+        return ProcessStrategy(getattr(name, "value", name))
+    except ValueError:
+        logger.warning(f"回退配置中存在未知策略，已忽略: {name}")
+        return None
+
+
+class FallbackPolicy:
+    """回退策略图 + 各策略的超时/尝试次数预算 + 总截止时间"""
+
+    def __init__(
+        self,
+        strategy_order: Optional[List[str]] = None,
+        graph: Optional[Dict[str, List[str]]] = None,
+        policies: Optional[Dict[str, Dict[str, Any]]] = None,
+        deadline: Optional[float] = DEFAULT_ANALYSIS_DEADLINE,
+        adaptive: Optional[AdaptiveTimeouts] = None
+    ):
+        """
+        初始化回退策略
+
+        Args:
+            strategy_order: 策略优先顺序；未配置回退图时，每个策略失败后依次回退到顺序中排在它之后的策略，
+                配置了回退图时用于对同一策略的多个回退目标排序
+            graph: 回退图 {策略: [回退策略, ...]}，为None时由 strategy_order 推导
+            policies: 各策略的预算 {策略: {"timeout": 秒, "attempts": 次数}}，与默认值合并
+            deadline: 一次分析的总截止时间（秒），None 或 <= 0 表示不限制
+            adaptive: 自适应超时计算器，为None时每次尝试都使用策略的超时上限
+        """
+        order = [s for s in (_strategy(name) for name in strategy_order or []) if s is not None]
+        self.order = list(dict.fromkeys(order))
+
+        if graph is None:
+            self.graph = {
+                strategy: self.order[index + 1:]
+                for index, strategy in enumerate(self.order)
+            }
+        else:
+            self.graph = {}
+            for source, targets in graph.items():
+                strategy = _strategy(source)
+                if strategy is None:
+                    continue
+                targets = [t for t in (_strategy(name) for name in targets or []) if t is not None]
+                self.graph[strategy] = sorted(
+                    dict.fromkeys(targets),
+                    key=lambda t: self.order.index(t) if t in self.order else len(self.order)
+                )
+
+        self.policies: Dict[str, Dict[str, Any]] = {
+            name: dict(options) for name, options in DEFAULT_STRATEGY_POLICIES.items()
+        }
+        for name, options in (policies or {}).items():
+            self.policies.setdefault(name, {}).update(options or {})
+
+        self.deadline = deadline if deadline and deadline > 0 else None
+        self.adaptive = adaptive
+
+    @classmethod
+    def from_config(cls, config_manager: Optional[ConfigManager] = None) -> "FallbackPolicy":
+        """
+        根据用户偏好（strategy_order、fallback_graph、strategy_policies、analysis_deadline、
+        adaptive_timeouts）创建回退策略
+
+        Args:
+            config_manager: 配置管理器，默认使用全局实例
+
+        Returns:
+            FallbackPolicy: 回退策略实例
+        """
+        config = config_manager or get_config_manager()
+        deadline = config.get_preference("analysis_deadline", DEFAULT_ANALYSIS_DEADLINE)
+        return cls(
+            strategy_order=config.get_preference("strategy_order") or [],
+            graph=config.get_preference("fallback_graph", DEFAULT_FALLBACK_GRAPH),
+            policies=config.get_preference("strategy_policies") or {},
+            deadline=float(deadline) if deadline else None,
+            adaptive=AdaptiveTimeouts.from_config(config) if config.get_preference("adaptive_timeouts", True) else None
+        )
+
+    def next_strategies(self, strategy: Any) -> List[ProcessStrategy]:
+        """
+        获取策略失败后可以回退到的策略（按优先顺序）
+
+        Args:
+            strategy: 失败的策略（ProcessStrategy 或其取值字符串）
+
+        Returns:
+            List[ProcessStrategy]: 回退策略列表
+        """
+        return list(self.graph.get(_strategy(strategy), []))
+
+    def timeout(self, strategy: Any) -> float:
+        """单次尝试的超时上限（秒）"""
+        key = getattr(strategy, "value", strategy)
+        return float(self.policies.get(key, {}).get("timeout", DEFAULT_STRATEGY_TIMEOUT))
+
+    def attempts(self, strategy: Any) -> int:
+        """策略的尝试次数（至少一次）"""
+        key = getattr(strategy, "value", strategy)
+        return max(1, int(self.policies.get(key, {}).get("attempts", DEFAULT_STRATEGY_ATTEMPTS)))
+
+    def deadline_at(self, started: Optional[float] = None) -> Optional[float]:
+        """
+        计算总截止时刻
+
+        Args:
+            started: 分析开始的 time.monotonic() 时刻，默认为当前时刻
+
+        Returns:
+            Optional[float]: 截止时刻（time.monotonic() 时间轴），不限制时返回None
+        """
+        if self.deadline is None:
+            return None
+        return (started if started is not None else time.monotonic()) + self.deadline
+
+    def attempt_timeout(
+        self,
+        strategy: Any,
+        deadline_at: Optional[float],
+        size_mb: Optional[float] = None
+    ) -> float:
+        """
+        计算下一次尝试的超时时间：策略超时（启用自适应超时时按文件大小和历史耗时计算）
+        与距离总截止时刻的剩余时间中较小者
+
+        Args:
+            strategy: 处理策略
+            deadline_at: 总截止时刻（见 deadline_at），None 表示不限制
+            size_mb: 文件大小（MB），未知时为None
+
+        Returns:
+            float: 超时时间（秒），<= 0 表示已超过总截止时间
+        """
+        timeout = self.timeout(strategy)
+        if self.adaptive is not None:
+            timeout = self.adaptive.timeout(strategy, size_mb, timeout)
+        if deadline_at is None:
+            return timeout
+        return min(timeout, deadline_at - time.monotonic())
+
+    def record(self, strategy: Any, size_mb: Optional[float], seconds: float) -> None:
+        """
+        记录一次尝试的耗时，供自适应超时使用（未启用时忽略）
+
+        Args:
+            strategy: 处理策略
+            size_mb: 文件大小（MB）
+            seconds: 耗时（秒），超时的尝试为所用的超时时间
+        """
+        if self.adaptive is not None:
+            self.adaptive.record(strategy, size_mb, seconds)
+
+    def describe(self) -> Dict[str, Any]:
+        """
+        获取回退配置的可读描述
+
+        Returns:
+            Dict: 回退图、各策略预算和总截止时间
+        """
+        return {
+            "graph": {
+                source.value: [target.value for target in targets]
+                for source, targets in self.graph.items()
+            },
+            "policies": {
+                strategy.value: {"timeout": self.timeout(strategy), "attempts": self.attempts(strategy)}
+                for strategy in ProcessStrategy if strategy != ProcessStrategy.UPLOAD_RECOMMEND
+            },
+            "deadline": self.deadline,
+            "adaptive": self.adaptive is not None,
+        }
+
+
+def request_timeout(
+    strategy: Any,
+    size_mb: Optional[float],
+    config_manager: Optional[ConfigManager] = None
+) -> float:
+    """
+    计算未经智能分析器的请求（MCP工具调用、单独使用 VideoAnalyzer）的超时时间
+
+    Args:
+        strategy: 处理策略
+        size_mb: 文件大小（MB），未知时为None
+        config_manager: 配置管理器，默认使用全局实例
+
+    Returns:
+        float: 超时时间（秒）
+    """
+    return FallbackPolicy.from_config(config_manager).attempt_timeout(strategy, None, size_mb)
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+持久化任务队列
+基于SQLite记录批量分析任务的状态、策略、重试次数、结果位置和Token用量，
+进程中断后可以只重跑未完成的任务；多个进程可共享同一个队列文件领取任务
+"""
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import time
+from enum import Enum
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(Enum):
+    """任务状态枚举"""
+    PENDING = "pending"    # 等待执行
+    RUNNING = "running"    # 执行中
+    DONE = "done"          # 已完成
+    FAILED = "failed"      # 执行失败
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    digest TEXT NOT NULL UNIQUE,
+    input TEXT NOT NULL,
+    question TEXT NOT NULL,
+    status TEXT NOT NULL,
+    strategy TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result_path TEXT,
+    error TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    total_tokens INTEGER,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);
+"""
+
+# 旧版本队列文件缺少的列（打开队列时自动补齐）
+_MIGRATIONS = {
+    "cost": "ALTER TABLE jobs ADD COLUMN cost REAL",  # 预测耗时（秒），用于短作业优先
+    "lane": "ALTER TABLE jobs ADD COLUMN lane TEXT",  # 执行通道（small / large）
+}
+
+# 短作业优先排序时，每等待1秒抵扣的预测耗时（秒），避免大任务在持续入队时被饿死
+DEFAULT_AGING_RATE = 0.5
+
+
+class Lane(Enum):
+    """执行通道：大任务与小任务分开执行，大任务最多占用部分工作线程"""
+    SMALL = "small"
+    LARGE = "large"
+
+
+def job_digest(video_input: str, question: str) -> str:
+    """
+    计算任务摘要（输入 + 问题），用于去重
+
+    Args:
+        video_input: 视频输入（URL或文件路径）
+        question: 分析问题
+
+    Returns:
+        str: SHA-256 十六进制摘要
+    """
+    return hashlib.sha256(f"{video_input}\0{question}".encode("utf-8")).hexdigest()
+
+
+class JobQueue:
+    """SQLite持久化任务队列"""
+
+    def __init__(self, db_path: Path, max_attempts: int = 3):
+        """
+        初始化任务队列
+
+        Args:
+            db_path: SQLite数据库文件路径
+            max_attempts: 单个任务的最大尝试次数
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in _MIGRATIONS.items():
+                if column not in columns:
+                    try:
+                        conn.execute(statement)
+                    except sqlite3.OperationalError:
+                        # 其他进程同时打开队列并已补齐该列
+                        pass
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        创建数据库连接（每次操作独立连接，便于多线程/多进程共享）
+
+        Returns:
+            sqlite3.Connection: 数据库连接
+        """
+        conn = sqlite3.connect(str(self.db_path), timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def add_jobs(self, items: Iterable[Tuple[str, ...]]) -> int:
+        """
+        批量添加任务（已存在的任务会被忽略）
+
+        Args:
+            items: (视频输入, 问题) 序列；也可以是 (视频输入, 问题, 摘要)，
+                用自定义摘要（例如文件内容摘要）代替默认的 job_digest 去重
+
+        Returns:
+            int: 新增的任务数
+        """
+        now = time.time()
+        rows = [
+            (item[2] if len(item) > 2 else job_digest(item[0], item[1]),
+             item[0], item[1], JobStatus.PENDING.value, now, now)
+            for item in items
+        ]
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs "
+                "(digest, input, question, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        logger.info(f"任务入队: 新增 {added} 个，共提交 {len(rows)} 个")
+        return added
+
+    def claim(
+        self,
+        shortest_first: bool = False,
+        aging_rate: float = DEFAULT_AGING_RATE,
+        lane: Optional[Lane] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        原子地领取一个待执行任务并标记为执行中
+
+        Args:
+            shortest_first: 按预测耗时从短到长领取（等待时间按 aging_rate 抵扣预测耗时），
+                否则按入队顺序领取；尚未预测耗时的任务排在最前
+            aging_rate: 每等待1秒抵扣的预测耗时（秒）
+            lane: 只领取指定通道的任务（可选）
+
+        Returns:
+            Optional[Dict]: 任务记录，队列为空时返回None
+        """
+        query = "SELECT * FROM jobs WHERE status = ?"
+        params: List[Any] = [JobStatus.PENDING.value]
+        if lane is not None:
+            query += " AND lane = ?"
+            params.append(lane.value)
+        if shortest_first:
+            query += " ORDER BY COALESCE(cost, 0) - ? * (? - created_at), id LIMIT 1"
+            params.extend([aging_rate, time.time()])
+        else:
+            query += " ORDER BY id LIMIT 1"
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(query, params).fetchone()
+
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, updated_at = ? "
+                "WHERE id = ?",
+                (JobStatus.RUNNING.value, self.worker_id, time.time(), row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        job = dict(row)
+        job["attempts"] += 1
+        job["status"] = JobStatus.RUNNING.value
+        return job
+
+    def unpriced_jobs(self, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        列出尚未预测耗时的待执行任务
+
+        Args:
+            limit: 最多返回的任务数
+
+        Returns:
+            List[Dict]: 任务记录（id、input）
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, input FROM jobs WHERE status = ? AND cost IS NULL ORDER BY id LIMIT ?",
+                (JobStatus.PENDING.value, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        return [dict(row) for row in rows]
+
+    def set_costs(self, costs: Iterable[Tuple[int, float, Lane]]) -> None:
+        """
+        记录任务的预测耗时和执行通道
+
+        Args:
+            costs: (任务ID, 预测耗时秒数, 通道) 序列
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE jobs SET cost = ?, lane = ? WHERE id = ?",
+                [(cost, lane.value, job_id) for job_id, cost, lane in costs]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def mark_done(
+        self,
+        job_id: int,
+        strategy: Optional[str] = None,
+        result_path: Optional[str] = None,
+        usage: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        标记任务完成
+
+        Args:
+            job_id: 任务ID
+            strategy: 实际使用的策略
+            result_path: 结果存放位置
+            usage: Token用量
+        """
+        usage = usage or {}
+        self._update(
+            job_id,
+            status=JobStatus.DONE.value,
+            strategy=strategy,
+            result_path=result_path,
+            error=None,
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            total_tokens=usage.get("total_tokens")
+        )
+
+    def mark_failed(self, job_id: int, error: str, attempts: int) -> None:
+        """
+        标记任务失败；未达到最大尝试次数时重新放回队列
+
+        Args:
+            job_id: 任务ID
+            error: 错误信息
+            attempts: 已尝试次数
+        """
+        status = JobStatus.PENDING if attempts < self.max_attempts else JobStatus.FAILED
+        self._update(job_id, status=status.value, error=error)
+
+    def _update(self, job_id: int, **fields: Any) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+        finally:
+            conn.close()
+
+    def requeue_unfinished(self, include_failed: bool = False) -> int:
+        """
+        将中断遗留的执行中任务（以及可选的失败任务）重新放回队列
+
+        注意: 仅应在没有其他进程正在消费该队列时调用
+
+        Args:
+            include_failed: 是否同时重试已失败的任务（重置尝试次数）
+
+        Returns:
+            int: 重新入队的任务数
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?",
+                (JobStatus.PENDING.value, time.time(), JobStatus.RUNNING.value)
+            )
+            if include_failed:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = 0, updated_at = ? WHERE status = ?",
+                    (JobStatus.PENDING.value, time.time(), JobStatus.FAILED.value)
+                )
+            requeued = conn.total_changes - before
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        logger.info(f"重新入队 {requeued} 个未完成任务")
+        return requeued
+
+    def stats(self) -> Dict[str, int]:
+        """
+        统计各状态任务数量
+
+        Returns:
+            Dict: {状态: 数量}
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        counts = {status.value: 0 for status in JobStatus}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def list_jobs(self, status: Optional[JobStatus] = None) -> List[Dict[str, Any]]:
+        """
+        列出任务
+
+        Args:
+            status: 只列出指定状态的任务（可选）
+
+        Returns:
+            List[Dict]: 任务记录列表
+        """
+        conn = self._connect()
+        try:
+            if status is None:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY id", (status.value,)
+                ).fetchall()
+        finally:
+            conn.close()
+
+        return [dict(row) for row in rows]
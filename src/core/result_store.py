@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+压缩结果存储
+分析结果经字段裁剪（默认丢弃推理过程和响应元数据）后压缩追加到分段文件中，
+每条记录是独立的 gzip 成员 / zstd 帧，分段文件整体仍可流式解压；
+SQLite 索引按任务摘要记录 (分段, 偏移, 长度)，按摘要读取只需一次定位读取
+
+依赖 zstandard（可选）：未安装时使用 gzip
+"""
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 取决于运行环境
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# 默认丢弃的字段（点分路径，* 匹配列表中的每个元素）
+DEFAULT_DROP_FIELDS = (
+    "choices.*.message.reasoning_content",
+    "id",
+    "created",
+    "object",
+    "request_id",
+)
+
+# 单个分段文件的大小上限（字节），超过后新建分段
+DEFAULT_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+
+# 压缩级别
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+_SUFFIXES = {
+    "gzip": ".jsonl.gz",
+    "zstd": ".jsonl.zst",
+}
+
+_INDEX_NAME = "index.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    digest TEXT PRIMARY KEY,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def project_result(result: Dict[str, Any], drop_fields: Iterable[str] = DEFAULT_DROP_FIELDS) -> Dict[str, Any]:
+    """
+    按字段路径裁剪结果（返回副本，不修改原结果）
+
+    Args:
+        result: 分析结果
+        drop_fields: 要丢弃的字段路径，例如 "choices.*.message.reasoning_content"
+
+    Returns:
+        Dict: 裁剪后的结果
+    """
+    projected = json.loads(json.dumps(result, ensure_ascii=False))
+
+    def drop(node: Any, parts: List[str]) -> None:
+        if not parts:
+            return
+        head, rest = parts[0], parts[1:]
+
+        if head == "*":
+            children = node if isinstance(node, list) else []
+        elif isinstance(node, dict) and head in node:
+            if not rest:
+                del node[head]
+                return
+            children = [node[head]]
+        else:
+            return
+
+        for child in children:
+            drop(child, rest)
+
+    for field in drop_fields:
+        drop(projected, field.split("."))
+
+    return projected
+
+
+class ResultStore:
+    """分段压缩结果存储（追加写入，按摘要定位读取，多线程/多进程安全）"""
+
+    def __init__(
+        self,
+        directory: Path,
+        drop_fields: Optional[Iterable[str]] = None,
+        compression: str = "auto",
+        segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES
+    ):
+        """
+        初始化结果存储
+
+        Args:
+            directory: 存储目录（分段文件和索引数据库）
+            drop_fields: 写入前丢弃的字段路径，默认 DEFAULT_DROP_FIELDS，传入空列表表示保留全部字段
+            compression: auto | zstd | gzip（auto 在安装了 zstandard 时使用 zstd）
+            segment_max_bytes: 单个分段文件的大小上限（字节）
+
+        Raises:
+            ValueError: 不支持的压缩方式，或未安装 zstandard 却指定了 zstd
+        """
+        if compression == "auto":
+            compression = "zstd" if zstandard is not None else "gzip"
+        if compression not in _SUFFIXES:
+            raise ValueError(f"不支持的压缩方式: {compression} (可选: auto, {', '.join(_SUFFIXES)})")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("未安装 zstandard，无法使用 zstd 压缩（pip install zstandard）")
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.drop_fields = tuple(DEFAULT_DROP_FIELDS if drop_fields is None else drop_fields)
+        self.compression = compression
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.Lock()
+
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        创建索引数据库连接
+
+        Returns:
+            sqlite3.Connection: 数据库连接
+        """
+        conn = sqlite3.connect(str(self.directory / _INDEX_NAME), timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+    @staticmethod
+    def _decompress(segment: str, frame: bytes) -> bytes:
+        # 按分段文件后缀判断压缩方式，允许新旧压缩方式的分段共存
+        if segment.endswith(_SUFFIXES["zstd"]):
+            if zstandard is None:
+                raise RuntimeError(f"读取 {segment} 需要安装 zstandard")
+            return zstandard.ZstdDecompressor().decompress(frame)
+        return gzip.decompress(frame)
+
+    def _segments(self) -> List[Path]:
+        """按编号顺序列出全部分段文件"""
+        return sorted(
+            path for path in self.directory.iterdir()
+            if path.name.startswith("segment-") and path.name.endswith(tuple(_SUFFIXES.values()))
+        )
+
+    def _writable_segment(self) -> Path:
+        """获取当前可追加的分段文件（最新分段已满或压缩方式不同时新建）"""
+        segments = self._segments()
+        suffix = _SUFFIXES[self.compression]
+
+        if segments:
+            latest = segments[-1]
+            if latest.name.endswith(suffix) and latest.stat().st_size < self.segment_max_bytes:
+                return latest
+            number = int(latest.name[len("segment-"):].split(".")[0]) + 1
+        else:
+            number = 1
+
+        return self.directory / f"segment-{number:06d}{suffix}"
+
+    def put(self, digest: str, result: Dict[str, Any]) -> Tuple[str, int, int]:
+        """
+        裁剪、压缩并追加一条结果（同一摘要再次写入时覆盖索引）
+
+        Args:
+            digest: 任务摘要
+            result: 分析结果
+
+        Returns:
+            Tuple[str, int, int]: (分段文件名, 偏移, 长度)
+        """
+        record = project_result(result, self.drop_fields) if self.drop_fields else result
+        frame = self._compress(
+            (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        )
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                # 索引写锁同时串行化其他进程对分段文件的追加
+                conn.execute("BEGIN IMMEDIATE")
+                segment = self._writable_segment()
+                with open(segment, 'ab') as f:
+                    offset = f.tell()
+                    f.write(frame)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (digest, segment, offset, length, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (digest, segment.name, offset, len(frame), time.time())
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+        return segment.name, offset, len(frame)
+
+    def link(self, alias: str, digest: str) -> bool:
+        """
+        让另一个摘要指向已有结果（只写索引，不重复写入数据；alias 已有结果时覆盖）
+
+        Args:
+            alias: 新摘要
+            digest: 已有结果的摘要
+
+        Returns:
+            bool: digest 是否存在
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.execute(
+                    "INSERT OR REPLACE INTO results (digest, segment, offset, length, created_at) "
+                    "SELECT ?, segment, offset, length, ? FROM results WHERE digest = ?",
+                    (alias, time.time(), digest)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+        return cursor.rowcount > 0
+
+    def locate(self, digest: str) -> Optional[Tuple[str, int, int]]:
+        """
+        查询结果位置
+
+        Args:
+            digest: 任务摘要
+
+        Returns:
+            Optional[Tuple[str, int, int]]: (分段文件名, 偏移, 长度)，不存在时返回None
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT segment, offset, length FROM results WHERE digest = ?", (digest,)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        return (row["segment"], row["offset"], row["length"]) if row else None
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """
+        按摘要读取结果
+
+        Args:
+            digest: 任务摘要
+
+        Returns:
+            Optional[Dict]: 分析结果，不存在时返回None
+        """
+        location = self.locate(digest)
+        if location is None:
+            return None
+
+        segment, offset, length = location
+        try:
+            with open(self.directory / segment, 'rb') as f:
+                f.seek(offset)
+                frame = f.read(length)
+            return json.loads(self._decompress(segment, frame))
+        except (OSError, ValueError, RuntimeError) as e:
+            logger.warning(f"读取结果失败 ({digest}): {e}")
+            return None
+
+    def __contains__(self, digest: str) -> bool:
+        return self.locate(digest) is not None
+
+    def iter_results(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        按写入顺序遍历当前有效的全部结果（被覆盖的旧记录会被跳过）
+
+        Yields:
+            Tuple[str, Dict]: (任务摘要, 分析结果)
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT digest, segment, offset, length FROM results ORDER BY segment, offset"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        handles: Dict[str, Any] = {}
+        try:
+            for row in rows:
+                segment = row["segment"]
+                if segment not in handles:
+                    handles[segment] = open(self.directory / segment, 'rb')
+                f = handles[segment]
+                f.seek(row["offset"])
+                yield row["digest"], json.loads(self._decompress(segment, f.read(row["length"])))
+        finally:
+            for f in handles.values():
+                f.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取存储统计
+
+        Returns:
+            Dict: 结果数、分段数、压缩后总大小和压缩方式
+        """
+        conn = self._connect()
+        try:
+            count = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        finally:
+            conn.close()
+
+        segments = self._segments()
+        return {
+            "results": count,
+            "segments": len(segments),
+            "bytes": sum(path.stat().st_size for path in segments),
+            "compression": self.compression,
+        }
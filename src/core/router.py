@@ -4,13 +4,18 @@
 根据输入自动选择最优的视频处理策略，支持失败自动切换
 """
 import os
-import json
 import logging
 import re
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Tuple
 from enum import Enum
 from urllib.parse import urlparse
+from src.core.circuit_breaker import get_circuit_breakers, CircuitState
+from src.utils.config_manager import ConfigManager, get_config_manager
+from src.utils.tokens import estimate_tokens, context_limit
+from src.utils.memory_budget import estimate_peak_memory_mb
+from src.utils.url_probe import get_url_probe
+from src.core.uploader import S3Uploader, get_uploader, upload_settings
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +25,7 @@ class ProcessStrategy(Enum):
     URL_DIRECT = "url_direct"              # 在线URL直接访问（最优）
     BASE64_SMALL = "base64_small"          # 小文件Base64编码（< 5MB）
     BASE64_LARGE = "base64_large"          # 大文件Base64编码（5-100MB，带警告）
+    UPLOAD = "upload"                      # 分片上传到S3兼容存储后按URL分析（已配置存储桶时 > 5MB）
     UPLOAD_RECOMMEND = "upload_recommend"  # 建议上传到云存储（> 100MB）
 
 
@@ -30,6 +36,21 @@ class VideoRouter:
     SMALL_FILE_THRESHOLD = 5.0
     LARGE_FILE_THRESHOLD = 100.0
 
+    # 视频分析使用的模型（用于查询熔断器状态）
+    ANALYSIS_MODEL = "glm-4.6v"
+
+    # 各策略的耗时估算（秒）：(下限基数, 下限每MB, 上限基数, 上限每MB)
+    TIME_ESTIMATES = {
+        ProcessStrategy.URL_DIRECT: (20, 1, 30, 2),
+        ProcessStrategy.BASE64_SMALL: (20, 2, 30, 3),
+        ProcessStrategy.UPLOAD: (20, 1, 30, 2),
+        ProcessStrategy.BASE64_LARGE: (30, 3, 50, 5),
+    }
+
+    # 预测成本的附加项：上传速度（MB/秒）和每秒视频时长增加的处理耗时（秒）
+    UPLOAD_MB_PER_SECOND = 10.0
+    DURATION_COST_FACTOR = 0.2
+
     # 支持的视频格式
     SUPPORTED_FORMATS = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.webm']
 
@@ -42,64 +63,20 @@ class VideoRouter:
         r'(?::\d+)?'  # 可选端口
         r'(?:/?|[/?]\S+)$', re.IGNORECASE)
 
-    def __init__(self, config_path: Optional[Path] = None):
+    def __init__(self, config_manager: Optional[ConfigManager] = None):
         """
         初始化路由器
 
         Args:
-            config_path: 配置文件路径
-        """
-        self.config_path = config_path or Path(__file__).parent / "user_preferences.json"
-        self.preferences = self._load_preferences()
-
-    def _load_preferences(self) -> Dict[str, Any]:
+            config_manager: 配置管理器，默认使用全局实例
         """
-        加载用户偏好设置
+        self.config = config_manager or get_config_manager()
+        self._uploader: Optional[S3Uploader] = None
 
-        Returns:
-            Dict: 用户偏好配置
-        """
-        default_preferences = {
-            "default_strategy": "auto",  # auto | url_first | base64_only
-            "auto_fallback": True,       # 失败时自动切换策略
-            "max_file_size_mb": 100.0,   # 最大文件大小限制
-            "warn_large_file": True,     # 大文件警告
-            "prefer_url": True,          # 优先使用URL方式
-            "strategy_order": [          # 回退策略链
-                "url_direct",
-                "base64_small",
-                "base64_large"
-            ]
-        }
-
-        try:
-            if self.config_path.exists():
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    user_prefs = json.load(f)
-                    default_preferences.update(user_prefs)
-                    logger.info("用户偏好设置加载成功")
-            else:
-                # 创建默认配置文件
-                self._save_preferences(default_preferences)
-                logger.info("创建默认偏好设置")
-        except Exception as e:
-            logger.warning(f"加载偏好设置失败，使用默认配置: {e}")
-
-        return default_preferences
-
-    def _save_preferences(self, preferences: Dict[str, Any]) -> None:
-        """
-        保存用户偏好设置
-
-        Args:
-            preferences: 偏好配置
-        """
-        try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(preferences, f, indent=2, ensure_ascii=False)
-            logger.info("偏好设置保存成功")
-        except Exception as e:
-            logger.error(f"保存偏好设置失败: {e}")
+    @property
+    def preferences(self) -> Dict[str, Any]:
+        """用户偏好设置（由配置管理器缓存，文件修改后自动重新加载）"""
+        return self.config.load_user_preferences()
 
     def set_default_strategy(self, strategy: str) -> bool:
         """
@@ -117,8 +94,9 @@ class VideoRouter:
             logger.error(f"无效的策略: {strategy}, 可选值: {valid_strategies}")
             return False
 
-        self.preferences["default_strategy"] = strategy
-        self._save_preferences(self.preferences)
+        if not self.config.set_preference("default_strategy", strategy):
+            return False
+
         logger.info(f"默认策略已设置为: {strategy}")
         return True
 
@@ -167,12 +145,23 @@ class VideoRouter:
 
         return None
 
-    def validate_video_file(self, file_path: str) -> Tuple[bool, str]:
+    @property
+    def uploader(self) -> S3Uploader:
+        """对象存储上传器（未配置存储桶时 available 为 False；上传偏好变化后重新创建）"""
+        if self.config is get_config_manager():
+            return get_uploader()
+        # 使用独立配置的路由器按自己的偏好创建上传器
+        if self._uploader is None or self._uploader.settings != upload_settings(self.config):
+            self._uploader = S3Uploader.from_config(self.config)
+        return self._uploader
+
+    def validate_video_file(self, file_path: str, check_size: bool = True) -> Tuple[bool, str]:
         """
         验证视频文件
 
         Args:
             file_path: 文件路径
+            check_size: 是否检查文件大小上限（上传方式不受Base64大小限制）
 
         Returns:
             Tuple[bool, str]: (是否有效, 错误信息)
@@ -196,7 +185,7 @@ class VideoRouter:
             return False, "无法获取文件大小"
 
         max_size = self.preferences.get("max_file_size_mb", 100.0)
-        if size_mb > max_size:
+        if check_size and size_mb > max_size:
             return False, f"文件过大: {size_mb} MB (最大支持 {max_size} MB)"
 
         return True, ""
@@ -218,7 +207,9 @@ class VideoRouter:
             "error": None,
             "file_size_mb": None,
             "recommended_strategy": None,
-            "fallback_strategies": []
+            "estimated_memory_mb": None,  # 按推荐策略估算的峰值内存
+            "duration_seconds": None,     # 视频时长（URL预检解析MP4文件头获得）
+            "preflight": None             # URL预检结果
         }
 
         # 判断输入类型
@@ -226,13 +217,25 @@ class VideoRouter:
             result["type"] = "url"
             result["valid"] = True
             result["recommended_strategy"] = ProcessStrategy.URL_DIRECT
-            result["fallback_strategies"] = []  # URL方式无回退
+
+            # 预检URL：失效链接或网页地址在请求模型之前即可判定
+            if self.preferences.get("url_preflight", True):
+                probe = get_url_probe().probe(video_input)
+                result["preflight"] = probe
+                result["file_size_mb"] = probe["size_mb"]
+                result["duration_seconds"] = probe["duration_seconds"]
+
+                if not probe["ok"]:
+                    result["valid"] = False
+                    result["error"] = probe["error"]
+                    result["recommended_strategy"] = None
 
         else:
             result["type"] = "file"
 
-            # 验证文件
-            is_valid, error_msg = self.validate_video_file(video_input)
+            # 验证文件（可以上传时不受Base64大小限制）
+            can_upload = self.uploader.available
+            is_valid, error_msg = self.validate_video_file(video_input, check_size=not can_upload)
             result["valid"] = is_valid
             result["error"] = error_msg
 
@@ -243,16 +246,68 @@ class VideoRouter:
                 # 根据文件大小选择策略
                 if size_mb <= self.SMALL_FILE_THRESHOLD:
                     result["recommended_strategy"] = ProcessStrategy.BASE64_SMALL
-                    result["fallback_strategies"] = []
+                elif can_upload:
+                    # 上传后按URL分析，避免Base64膨胀约33%的请求体
+                    result["recommended_strategy"] = ProcessStrategy.UPLOAD
                 elif size_mb <= self.LARGE_FILE_THRESHOLD:
                     result["recommended_strategy"] = ProcessStrategy.BASE64_LARGE
-                    result["fallback_strategies"] = []
                 else:
                     result["recommended_strategy"] = ProcessStrategy.UPLOAD_RECOMMEND
-                    result["fallback_strategies"] = []
+
+        if result["recommended_strategy"] is not None:
+            result["estimated_memory_mb"] = estimate_peak_memory_mb(
+                result["file_size_mb"], result["recommended_strategy"]
+            )
 
         return result
 
+    def estimate_time_range(
+        self,
+        strategy: Optional[ProcessStrategy],
+        size_mb: Optional[float]
+    ) -> Optional[Tuple[int, int]]:
+        """
+        估算分析耗时范围
+
+        Args:
+            strategy: 处理策略
+            size_mb: 文件大小（MB），未知时按0计算
+
+        Returns:
+            Optional[Tuple[int, int]]: (下限, 上限) 秒，不支持的策略返回None
+        """
+        estimate = self.TIME_ESTIMATES.get(strategy)
+        if estimate is None:
+            return None
+
+        size_mb = size_mb or 0
+        low_base, low_per_mb, high_base, high_per_mb = estimate
+        return int(low_base + size_mb * low_per_mb), int(high_base + size_mb * high_per_mb)
+
+    def estimate_cost(self, video_input: str) -> float:
+        """
+        预测单个任务的执行成本（秒），用于批量任务排序：
+        按推荐策略和文件大小取耗时估算的中值，并计入上传时间和已知的视频时长
+
+        Args:
+            video_input: 视频输入（URL或文件路径）
+
+        Returns:
+            float: 预测耗时（秒）；无效输入会很快失败，成本为0
+        """
+        analysis = self.analyze_input(video_input)
+        strategy = analysis["recommended_strategy"]
+        time_range = self.estimate_time_range(strategy, analysis["file_size_mb"])
+        if not analysis["valid"] or time_range is None:
+            return 0.0
+
+        cost = sum(time_range) / 2
+        if strategy == ProcessStrategy.UPLOAD:
+            cost += (analysis["file_size_mb"] or 0) / self.UPLOAD_MB_PER_SECOND
+        if analysis["duration_seconds"]:
+            cost += analysis["duration_seconds"] * self.DURATION_COST_FACTOR
+        return round(cost, 1)
+
     def route(self, video_input: str, user_question: Optional[str] = None) -> Dict[str, Any]:
         """
         执行智能路由决策
@@ -274,6 +329,7 @@ class VideoRouter:
             "input_analysis": analysis,
             "strategy": None,
             "execution_plan": None,
+            "circuit_state": None,
             "warnings": [],
             "recommendations": []
         }
@@ -303,6 +359,9 @@ class VideoRouter:
         decision["strategy"] = strategy
 
         # 添加警告信息
+        if strategy == ProcessStrategy.URL_DIRECT and analysis["preflight"] and analysis["preflight"]["error"]:
+            decision["warnings"].append(f"⚠️  URL预检: {analysis['preflight']['error']}")
+
         if strategy == ProcessStrategy.BASE64_LARGE:
             file_size = analysis["file_size_mb"]
             decision["warnings"].append(
@@ -318,11 +377,29 @@ class VideoRouter:
                 "建议步骤:\n"
                 "1. 将视频上传到云存储（如七牛云、阿里云OSS、腾讯云COS）\n"
                 "2. 获取视频的公开访问URL\n"
-                "3. 使用URL方式进行分析（推荐）"
+                "3. 使用URL方式进行分析（推荐）\n"
+                "或安装 boto3 并在偏好配置中设置 upload_bucket（及 upload_endpoint），大文件将自动分片上传后分析"
+            )
+
+        # 检查模型熔断状态
+        circuit_state = get_circuit_breakers().state_of(self.ANALYSIS_MODEL)
+        decision["circuit_state"] = circuit_state.value if circuit_state else CircuitState.CLOSED.value
+
+        if circuit_state == CircuitState.OPEN:
+            decision["warnings"].append(
+                f"⚠️  模型 {self.ANALYSIS_MODEL} 近期错误率或延迟过高，已熔断，请求将快速失败，请稍后重试。"
             )
 
         # 构建执行计划
-        decision["execution_plan"] = self._build_execution_plan(analysis, strategy)
+        plan = self._build_execution_plan(analysis, strategy, user_question)
+        decision["execution_plan"] = plan
+
+        if plan and plan["estimated_tokens_max"] and \
+                plan["estimated_tokens_max"] + plan["question_tokens"] > plan["context_limit"]:
+            decision["warnings"].append(
+                f"⚠️  预估Token（{plan['estimated_tokens']} + 问题 {plan['question_tokens']}）"
+                f"可能超出模型 {self.ANALYSIS_MODEL} 的上下文长度 {plan['context_limit']:,}，请求可能失败。"
+            )
 
         logger.info(f"路由决策完成: {strategy.value if strategy else 'None'}")
         return decision
@@ -330,7 +407,8 @@ class VideoRouter:
     def _build_execution_plan(
         self,
         analysis: Dict[str, Any],
-        strategy: Optional[ProcessStrategy]
+        strategy: Optional[ProcessStrategy],
+        user_question: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
         """
         构建执行计划
@@ -338,6 +416,7 @@ class VideoRouter:
         Args:
             analysis: 输入分析结果
             strategy: 选定的策略
+            user_question: 用户问题（用于估算提示词Token）
 
         Returns:
             Optional[Dict]: 执行计划
@@ -350,29 +429,45 @@ class VideoRouter:
             "method": None,
             "estimated_time": None,
             "estimated_tokens": None,
+            "estimated_tokens_max": None,
+            "question_tokens": estimate_tokens(user_question or ""),
+            "context_limit": context_limit(self.ANALYSIS_MODEL),
+            "estimated_memory_mb": estimate_peak_memory_mb(analysis.get("file_size_mb"), strategy),
             "temp_files": 0
         }
 
+        token_range = None
+        # 预检获得URL文件大小时，与本地文件一样按大小估算
+        size_mb = analysis.get("file_size_mb") or 0
+        time_range = self.estimate_time_range(strategy, size_mb)
+        if time_range:
+            plan["estimated_time"] = f"{time_range[0]}-{time_range[1]}秒"
+
         if strategy == ProcessStrategy.URL_DIRECT:
             plan["method"] = "analyze_video_url"
-            plan["estimated_time"] = "20-30秒"
-            plan["estimated_tokens"] = "35,000-45,000"
             plan["temp_files"] = 1  # 仅JS脚本
+            token_range = (int(35000 + size_mb * 2000), int(45000 + size_mb * 3000))
 
         elif strategy == ProcessStrategy.BASE64_SMALL:
-            size_mb = analysis.get("file_size_mb", 0)
             plan["method"] = "analyze_video_base64"
-            plan["estimated_time"] = f"{int(20 + size_mb * 2)}-{int(30 + size_mb * 3)}秒"
-            plan["estimated_tokens"] = f"{int(40000 + size_mb * 2000)}-{int(55000 + size_mb * 3000)}"
+            token_range = (int(40000 + size_mb * 2000), int(55000 + size_mb * 3000))
             plan["temp_files"] = 2  # JS脚本 + Base64文件
 
+        elif strategy == ProcessStrategy.UPLOAD:
+            plan["method"] = "upload_then_analyze_video_url"
+            plan["estimated_time"] = f"上传 + {plan['estimated_time']}"
+            token_range = (int(35000 + size_mb * 2000), int(45000 + size_mb * 3000))
+            plan["temp_files"] = 1
+
         elif strategy == ProcessStrategy.BASE64_LARGE:
-            size_mb = analysis.get("file_size_mb", 0)
             plan["method"] = "analyze_video_base64"
-            plan["estimated_time"] = f"{int(30 + size_mb * 3)}-{int(50 + size_mb * 5)}秒"
-            plan["estimated_tokens"] = f"{int(50000 + size_mb * 3000)}-{int(80000 + size_mb * 5000)}"
+            token_range = (int(50000 + size_mb * 3000), int(80000 + size_mb * 5000))
             plan["temp_files"] = 2
 
+        if token_range:
+            plan["estimated_tokens"] = f"{token_range[0]:,}-{token_range[1]:,}"
+            plan["estimated_tokens_max"] = token_range[1]
+
         return plan
 
     def get_strategy_comparison(self) -> str:
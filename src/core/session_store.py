@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+会话存储
+基于SQLite保存多轮对话（包括模型对视频的描述），追问时优先用文本上下文构建请求，
+无需重新上传视频；上下文按Token预算截断
+"""
+import logging
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from src.utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 默认会话数据库位置（项目根目录）
+DEFAULT_SESSION_DB = Path(__file__).parent.parent.parent / "zai_sessions.db"
+
+# 追问时历史上下文的默认Token预算
+DEFAULT_CONTEXT_TOKENS = 6000
+
+# 出现这些词时，认为问题需要重新查看画面，文本上下文不足以回答
+MEDIA_KEYWORDS = (
+    "重新看", "再看", "再次观看", "回看", "仔细看", "画面中", "截图",
+    "第几秒", "哪一秒", "时间点", "逐帧", "帧",
+    "rewatch", "look again", "frame", "timestamp", "at second",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    media TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_turns_session ON turns (session_id, id);
+"""
+
+
+def needs_media(question: str) -> bool:
+    """
+    判断追问是否需要重新查看视频画面
+
+    Args:
+        question: 追问内容
+
+    Returns:
+        bool: 是否需要重新发送视频
+    """
+    lowered = question.lower()
+    return any(keyword in lowered for keyword in MEDIA_KEYWORDS)
+
+
+def result_content(result: Optional[Dict[str, Any]]) -> str:
+    """
+    提取模型回答文本
+
+    Args:
+        result: API返回结果
+
+    Returns:
+        str: 回答内容，没有时返回空字符串
+    """
+    if result and "choices" in result and len(result["choices"]) > 0:
+        return result["choices"][0].get("message", {}).get("content", "") or ""
+    return ""
+
+
+class SessionStore:
+    """SQLite会话存储"""
+
+    def __init__(self, db_path: Path = DEFAULT_SESSION_DB):
+        """
+        初始化会话存储
+
+        Args:
+            db_path: SQLite数据库文件路径
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        创建数据库连接（每次操作独立连接，便于多线程/多进程共享）
+
+        Returns:
+            sqlite3.Connection: 数据库连接
+        """
+        conn = sqlite3.connect(str(self.db_path), timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取会话信息
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            Optional[Dict]: 会话记录，不存在时返回None
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT * FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        return dict(row) if row else None
+
+    def get_turns(self, session_id: str) -> List[Dict[str, Any]]:
+        """
+        按时间顺序获取会话的全部轮次
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            List[Dict]: 轮次列表（role, content）
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT role, content FROM turns WHERE session_id = ? ORDER BY id",
+                (session_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        return [dict(row) for row in rows]
+
+    def record_exchange(
+        self,
+        session_id: Optional[str],
+        question: str,
+        answer: str,
+        media: Optional[str] = None
+    ) -> str:
+        """
+        记录一轮问答，会话不存在时自动创建
+
+        Args:
+            session_id: 会话ID，为空时生成新ID
+            question: 用户问题
+            answer: 模型回答
+            media: 会话关联的视频（URL或文件路径），只在首次提供时记录
+
+        Returns:
+            str: 会话ID
+        """
+        session_id = session_id or uuid.uuid4().hex[:12]
+        now = time.time()
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, media, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (session_id, media, now, now)
+            )
+            conn.execute(
+                "UPDATE sessions SET media = COALESCE(media, ?), updated_at = ? WHERE session_id = ?",
+                (media, now, session_id)
+            )
+            conn.executemany(
+                "INSERT INTO turns (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                [(session_id, "user", question, now), (session_id, "assistant", answer, now)]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        return session_id
+
+    def build_messages(
+        self,
+        session_id: str,
+        question: str,
+        max_context_tokens: int = DEFAULT_CONTEXT_TOKENS
+    ) -> List[Dict[str, str]]:
+        """
+        基于历史轮次构建纯文本追问请求
+
+        第一轮回答（视频描述）始终保留，其余轮次从最近往前按Token预算保留，
+        超出预算的较早轮次被丢弃
+
+        Args:
+            session_id: 会话ID
+            question: 追问内容
+            max_context_tokens: 整个请求（系统提示、历史上下文和追问）的Token预算
+
+        Returns:
+            List[Dict]: 消息列表
+        """
+        turns = self.get_turns(session_id)
+        session = self.get_session(session_id) or {}
+
+        system = "你正在继续一段关于视频内容的对话。视频本身不会再次提供，请根据之前对视频的描述和对话回答。"
+        if session.get("media"):
+            system += f"\n视频来源: {session['media']}"
+
+        # 系统提示和追问必须发送，历史上下文只能使用剩余的预算
+        available = max(0, max_context_tokens - estimate_tokens(system) - estimate_tokens(question))
+
+        pinned = turns[:2]
+        budget = available - sum(estimate_tokens(turn["content"]) for turn in pinned)
+
+        # 首轮描述本身超出预算时截断其内容
+        if budget < 0 and pinned:
+            description = pinned[-1]["content"]
+            description_tokens = max(1, estimate_tokens(description))
+            allowed = max(0, budget + description_tokens)
+            keep = len(description) * allowed // description_tokens
+            pinned = pinned[:-1] + [{"role": pinned[-1]["role"], "content": description[:keep]}]
+            budget = 0
+
+        # 问答成对保留，避免出现没有问题的回答
+        recent: List[Dict[str, Any]] = []
+        history = turns[2:]
+        for end in range(len(history), 0, -2):
+            pair = history[max(0, end - 2):end]
+            cost = sum(estimate_tokens(turn["content"]) for turn in pair)
+            if cost > budget:
+                break
+            recent = pair + recent
+            budget -= cost
+
+        dropped = len(turns) - len(pinned) - len(recent)
+        if dropped:
+            logger.info(f"会话 {session_id} 上下文超出预算，省略较早的 {dropped} 条消息")
+
+        messages = [{"role": "system", "content": system}]
+        messages.extend({"role": turn["role"], "content": turn["content"]} for turn in pinned + recent)
+        messages.append({"role": "user", "content": question})
+        return messages
+
+    def delete_session(self, session_id: str) -> bool:
+        """
+        删除会话及其全部轮次
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            bool: 会话是否存在
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            deleted = conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        return deleted > 0
+
+
+# 全局会话存储实例
+_global_session_store = None
+
+
+def get_session_store() -> SessionStore:
+    """
+    获取全局会话存储实例（单例模式）
+
+    Returns:
+        SessionStore: 会话存储实例
+    """
+    global _global_session_store
+    if _global_session_store is None:
+        _global_session_store = SessionStore()
+    return _global_session_store
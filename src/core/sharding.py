@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+批量任务分片
+使用基于输入摘要的最高随机权重（Rendezvous）哈希把任务确定性地分配到各节点：
+重跑时同一输入总落在同一节点，节点数变化时只有少量任务迁移
+"""
+import hashlib
+from typing import List, Tuple
+
+
+def input_digest(video_input: str) -> str:
+    """
+    计算视频输入的摘要（同一视频的不同问题落在同一节点，便于复用缓存）
+
+    Args:
+        video_input: 视频输入（URL或文件路径）
+
+    Returns:
+        str: SHA-256 十六进制摘要
+    """
+    return hashlib.sha256(video_input.encode("utf-8")).hexdigest()
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    解析分片参数
+
+    Args:
+        spec: 形如 "i/N" 的分片描述，i 从 0 开始
+
+    Returns:
+        Tuple[int, int]: (分片序号, 分片总数)
+
+    Raises:
+        ValueError: 格式错误或序号越界
+    """
+    try:
+        index_str, total_str = spec.split("/", 1)
+        index, total = int(index_str), int(total_str)
+    except ValueError:
+        raise ValueError(f"分片格式错误: {spec} (应为 i/N，例如 0/4)")
+
+    if total < 1 or not 0 <= index < total:
+        raise ValueError(f"分片序号越界: {spec} (要求 0 <= i < N)")
+
+    return index, total
+
+
+def shard_of(digest: str, total: int) -> int:
+    """
+    计算摘要所属的分片
+
+    Args:
+        digest: 输入摘要
+        total: 分片总数
+
+    Returns:
+        int: 分片序号
+    """
+    if total == 1:
+        return 0
+
+    def weight(shard: int) -> int:
+        return int.from_bytes(
+            hashlib.blake2b(f"{shard}:{digest}".encode("utf-8"), digest_size=8).digest(),
+            "big"
+        )
+
+    return max(range(total), key=weight)
+
+
+def select_shard(items: List[Tuple[str, str]], index: int, total: int) -> List[Tuple[str, str]]:
+    """
+    从任务列表中挑选属于指定分片的任务
+
+    Args:
+        items: (视频输入, 问题) 列表
+        index: 分片序号
+        total: 分片总数
+
+    Returns:
+        List[Tuple[str, str]]: 属于该分片的任务
+    """
+    return [
+        (video_input, question)
+        for video_input, question in items
+        if shard_of(input_digest(video_input), total) == index
+    ]
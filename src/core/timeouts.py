@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+自适应超时模块
+按处理策略和文件大小分档记录请求耗时，每次请求的超时时间取同档耗时的高百分位数乘以余量
+（例如 p99 × 3）；样本不足时按路由器的耗时估算上限推算。结果限制在最小超时和策略超时上限之间，
+使小文件的卡死请求尽快被终止、释放工作线程，而大文件的正常慢请求不会被误杀
+"""
+import logging
+from typing import Optional, Any
+
+from src.core.router import VideoRouter, ProcessStrategy
+from src.utils.config_manager import ConfigManager, DEFAULT_PREFERENCES, get_config_manager
+from src.utils.latency import LatencyTracker, get_latency_tracker
+
+logger = logging.getLogger(__name__)
+
+# 在观测到的耗时百分位数上乘的余量、使用的耗时百分位和超时时间下限（秒）均取偏好默认值
+DEFAULT_TIMEOUT_MARGIN = float(DEFAULT_PREFERENCES["timeout_margin"])
+DEFAULT_TIMEOUT_PERCENTILE = float(DEFAULT_PREFERENCES["timeout_percentile"])
+DEFAULT_MIN_TIMEOUT = float(DEFAULT_PREFERENCES["timeout_min_seconds"])
+
+# 同档样本数达到该值后才按观测值计算超时
+MIN_TIMEOUT_SAMPLES = 20
+
+# 样本不足时，在耗时估算上限上乘的余量
+ESTIMATE_MARGIN = 2.0
+
+
+def base64_strategy(size_mb: float) -> ProcessStrategy:
+    """
+    按文件大小选择Base64策略（与路由器的阈值一致）
+
+    Args:
+        size_mb: 文件大小（MB）
+
+    Returns:
+        ProcessStrategy: BASE64_SMALL 或 BASE64_LARGE
+    """
+    if size_mb <= VideoRouter.SMALL_FILE_THRESHOLD:
+        return ProcessStrategy.BASE64_SMALL
+    return ProcessStrategy.BASE64_LARGE
+
+
+def size_bucket(size_mb: Optional[float]) -> str:
+    """
+    文件大小分档：按2的幂划分（<=1MB、<=2MB、<=4MB ...），同档请求的耗时分布相近
+
+    Args:
+        size_mb: 文件大小（MB），未知时为None
+
+    Returns:
+        str: 分档名称
+    """
+    if size_mb is None:
+        return "unknown"
+
+    upper = 1
+    while upper < size_mb:
+        upper *= 2
+    return f"<={upper}MB"
+
+
+class AdaptiveTimeouts:
+    """自适应超时计算器（耗时样本保存在共享的延迟统计实例中）"""
+
+    def __init__(
+        self,
+        latency: Optional[LatencyTracker] = None,
+        margin: float = DEFAULT_TIMEOUT_MARGIN,
+        percentile: float = DEFAULT_TIMEOUT_PERCENTILE,
+        min_timeout: float = DEFAULT_MIN_TIMEOUT,
+        min_samples: int = MIN_TIMEOUT_SAMPLES
+    ):
+        """
+        初始化自适应超时计算器
+
+        Args:
+            latency: 延迟统计实例，默认使用全局实例
+            margin: 在耗时百分位数上乘的余量
+            percentile: 使用的耗时百分位（0-100）
+            min_timeout: 超时时间下限（秒）
+            min_samples: 按观测值计算超时所需的最少样本数
+        """
+        self.latency = latency or get_latency_tracker()
+        self.margin = margin
+        self.percentile = percentile
+        self.min_timeout = min_timeout
+        self.min_samples = min_samples
+
+    @classmethod
+    def from_config(cls, config_manager: Optional[ConfigManager] = None) -> "AdaptiveTimeouts":
+        """
+        根据用户偏好（timeout_margin、timeout_percentile、timeout_min_seconds）创建计算器
+
+        Args:
+            config_manager: 配置管理器，默认使用全局实例
+
+        Returns:
+            AdaptiveTimeouts: 自适应超时计算器
+        """
+        config = config_manager or get_config_manager()
+        return cls(
+            margin=float(config.get_preference("timeout_margin", DEFAULT_TIMEOUT_MARGIN)),
+            percentile=float(config.get_preference("timeout_percentile", DEFAULT_TIMEOUT_PERCENTILE)),
+            min_timeout=float(config.get_preference("timeout_min_seconds", DEFAULT_MIN_TIMEOUT))
+        )
+
+    @staticmethod
+    def key(strategy: Any, size_mb: Optional[float]) -> str:
+        """耗时样本的统计维度，例如 "base64_small|<=4MB" """
+        return f"{getattr(strategy, 'value', strategy)}|{size_bucket(size_mb)}"
+
+    def record(self, strategy: Any, size_mb: Optional[float], seconds: float) -> None:
+        """
+        记录一次请求耗时（超时的请求应记录所用的超时时间，使下次的超时随之放宽）
+
+        Args:
+            strategy: 处理策略
+            size_mb: 文件大小（MB）
+            seconds: 耗时（秒）
+        """
+        self.latency.record(self.key(strategy, size_mb), seconds)
+
+    def estimate(self, strategy: Any, size_mb: Optional[float]) -> Optional[float]:
+        """
+        按路由器的耗时估算上限推算超时（上传策略另加上传时间）
+
+        Args:
+            strategy: 处理策略
+            size_mb: 文件大小（MB）
+
+        Returns:
+            Optional[float]: 超时时间（秒），大小未知或策略不支持时返回None
+        """
+        try:
+            strategy = ProcessStrategy(getattr(strategy, "value", strategy))
+        except ValueError:
+            return None
+
+        time_range = VideoRouter.TIME_ESTIMATES.get(strategy)
+        if size_mb is None or time_range is None:
+            return None
+
+        _, _, high_base, high_per_mb = time_range
+        seconds = high_base + size_mb * high_per_mb
+        if strategy == ProcessStrategy.UPLOAD:
+            seconds += size_mb / VideoRouter.UPLOAD_MB_PER_SECOND
+        return seconds * ESTIMATE_MARGIN
+
+    def timeout(self, strategy: Any, size_mb: Optional[float], ceiling: float) -> float:
+        """
+        计算单次请求的超时时间
+
+        Args:
+            strategy: 处理策略
+            size_mb: 文件大小（MB），未知时为None
+            ceiling: 超时上限（秒），通常为策略配置的超时时间
+
+        Returns:
+            float: 超时时间（秒）；既无足够样本也无法估算时返回上限
+        """
+        key = self.key(strategy, size_mb)
+
+        if self.latency.count(key) >= self.min_samples:
+            seconds = self.latency.percentile(key, self.percentile) * self.margin
+            basis = f"p{self.percentile:g}"
+        else:
+            seconds = self.estimate(strategy, size_mb)
+            basis = "估算"
+
+        if seconds is None:
+            return ceiling
+
+        timeout = min(max(seconds, self.min_timeout), ceiling)
+        logger.debug(f"{key} 的超时时间: {timeout:.1f} 秒（依据: {basis}）")
+        return timeout
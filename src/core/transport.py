@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+录制/回放传输模块
+作为执行器的脚本执行后端（见 executor.set_script_backend）：录制模式照常启动Node.js进程，
+并把请求/响应对保存为夹具；回放模式按请求指纹返回录制的响应，可按原始耗时或缩放后的耗时等待，
+用于离线、可重复地做基准测试和回归测试（除网络外的整条链路照常执行）
+
+夹具中不保存API密钥；请求引用的临时数据文件（Base64视频、图像内容）和脚本中的长Base64串
+只保存SHA-256摘要和大小
+"""
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import subprocess
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple
+
+from src.core.executor import ScriptCancelled, spawn_node_script, load_mcp_config
+
+logger = logging.getLogger(__name__)
+
+# 默认夹具目录（项目根目录）
+DEFAULT_FIXTURE_DIR = Path(__file__).parent.parent.parent / "zai_fixtures"
+
+REDACTED = "<REDACTED>"
+
+# 脚本中的API密钥
+_API_KEY_PATTERN = re.compile(r'(apiKey:\s*")[^"]*(")')
+
+# 脚本引用的临时数据文件（文件名带随机后缀，每次请求都不同）
+_TEMP_FILE_PATTERN = re.compile(r"temp_[a-z0-9_]+?_[0-9a-f]{12}\.(?:txt|json)")
+
+# 脚本中内嵌的长Base64串（例如Data URI形式的图像）
+_LARGE_INLINE_PATTERN = re.compile(r"[A-Za-z0-9+/]{1024,}={0,2}")
+
+
+def _digest_placeholder(data: bytes) -> str:
+    return f"<sha256:{hashlib.sha256(data).hexdigest()} bytes={len(data)}>"
+
+
+def _api_key() -> str:
+    """当前配置的API密钥（读取失败时返回空字符串）"""
+    try:
+        return load_mcp_config().get("env", {}).get("Z_AI_API_KEY", "")
+    except Exception:
+        return ""
+
+
+def redact(text: str, api_key: str) -> str:
+    """
+    从文本中移除API密钥
+
+    Args:
+        text: 原始文本
+        api_key: API密钥
+
+    Returns:
+        str: 处理后的文本
+    """
+    if api_key:
+        text = text.replace(api_key, REDACTED)
+    return text
+
+
+def normalize_request(script_path: Path) -> Tuple[str, str]:
+    """
+    规范化脚本内容并计算请求指纹：移除API密钥，临时数据文件名和长Base64串替换为内容摘要，
+    使同一请求在不同时间、不同密钥下得到相同的指纹
+
+    Args:
+        script_path: 脚本文件路径
+
+    Returns:
+        Tuple[str, str]: (规范化后的请求内容, 请求指纹)
+    """
+    script = script_path.read_text(encoding='utf-8')
+    script = _API_KEY_PATTERN.sub(rf"\g<1>{REDACTED}\g<2>", script)
+
+    def replace_file(match: re.Match) -> str:
+        try:
+            return _digest_placeholder((script_path.parent / match.group(0)).read_bytes())
+        except OSError:
+            return match.group(0)
+
+    script = _TEMP_FILE_PATTERN.sub(replace_file, script)
+    script = _LARGE_INLINE_PATTERN.sub(lambda match: _digest_placeholder(match.group(0).encode()), script)
+
+    return script, hashlib.sha256(script.encode('utf-8')).hexdigest()
+
+
+class FixtureStore:
+    """夹具存储：每个请求指纹一个JSON文件，同一请求可录制多个响应"""
+
+    def __init__(self, directory: Path = DEFAULT_FIXTURE_DIR):
+        """
+        初始化夹具存储
+
+        Args:
+            directory: 夹具目录
+        """
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        # 回放时每个指纹下一次使用的响应序号（多个响应轮流使用）
+        self._cursors: Dict[str, int] = {}
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取夹具
+
+        Args:
+            key: 请求指纹
+
+        Returns:
+            Optional[Dict]: 夹具内容，不存在时返回None
+        """
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def record(self, key: str, request: str, response: Dict[str, Any]) -> None:
+        """
+        追加一次录制的响应
+
+        Args:
+            key: 请求指纹
+            request: 规范化后的请求内容
+            response: 响应（returncode、stdout、stderr、seconds，超时时 timeout 为真）
+        """
+        path = self._path(key)
+        with self._lock:
+            fixture = self.load(key) or {"key": key, "request": request, "responses": []}
+            fixture["responses"].append(response)
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix(".tmp")
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(fixture, f, ensure_ascii=False, indent=2)
+            temp_path.replace(path)
+
+    def next_response(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        取下一个录制的响应（按录制顺序轮流返回）
+
+        Args:
+            key: 请求指纹
+
+        Returns:
+            Optional[Dict]: 响应，没有夹具时返回None
+        """
+        fixture = self.load(key)
+        if not fixture or not fixture["responses"]:
+            return None
+
+        with self._lock:
+            index = self._cursors.get(key, 0)
+            self._cursors[key] = index + 1
+        return fixture["responses"][index % len(fixture["responses"])]
+
+
+class RecordingBackend:
+    """录制后端：照常执行脚本，并把请求/响应对写入夹具存储"""
+
+    def __init__(self, store: FixtureStore):
+        """
+        初始化录制后端
+
+        Args:
+            store: 夹具存储
+        """
+        self.store = store
+
+    def __call__(
+        self,
+        script_path: Path,
+        timeout: float,
+        cancel_event: Optional[threading.Event] = None
+    ) -> subprocess.CompletedProcess:
+        """执行并录制一次脚本（接口同 executor.run_node_script）"""
+        request, key = normalize_request(script_path)
+        api_key = _api_key()
+        started = time.monotonic()
+
+        try:
+            result = spawn_node_script(script_path, timeout, cancel_event)
+        except subprocess.TimeoutExpired:
+            self.store.record(key, request, {
+                "timeout": True,
+                "seconds": round(time.monotonic() - started, 3),
+                "recorded_at": time.time(),
+            })
+            raise
+        except ScriptCancelled:
+            # 被取消的请求没有完整响应，不录制
+            raise
+
+        self.store.record(key, request, {
+            "returncode": result.returncode,
+            "stdout": redact(result.stdout or "", api_key),
+            "stderr": redact(result.stderr or "", api_key),
+            "seconds": round(time.monotonic() - started, 3),
+            "recorded_at": time.time(),
+        })
+        logger.info(f"已录制请求 {key[:12]}")
+        return result
+
+
+class ReplayBackend:
+    """回放后端：按请求指纹返回录制的响应，不访问网络"""
+
+    def __init__(self, store: FixtureStore, timing_scale: float = 1.0):
+        """
+        初始化回放后端
+
+        Args:
+            store: 夹具存储
+            timing_scale: 耗时缩放系数：1 按录制时的耗时等待，0.5 以两倍速回放，0 立即返回
+        """
+        self.store = store
+        self.timing_scale = timing_scale
+
+    def __call__(
+        self,
+        script_path: Path,
+        timeout: float,
+        cancel_event: Optional[threading.Event] = None
+    ) -> subprocess.CompletedProcess:
+        """
+        回放一次脚本执行（接口同 executor.run_node_script）
+
+        Raises:
+            subprocess.TimeoutExpired: 录制时超时，或缩放后的耗时超过超时时间
+            ScriptCancelled: 等待期间被取消
+        """
+        _, key = normalize_request(script_path)
+        args = ["node", str(script_path)]
+        response = self.store.next_response(key)
+
+        if response is None:
+            logger.error(f"没有录制的响应: {key[:12]}（{script_path.name}）")
+            return subprocess.CompletedProcess(args, 1, "", f"回放夹具不存在: {key}")
+
+        delay = response.get("seconds", 0.0) * self.timing_scale
+        if delay > 0:
+            waiter = cancel_event or threading.Event()
+            if waiter.wait(min(delay, timeout)):
+                raise ScriptCancelled(f"脚本执行已取消: {script_path.name}")
+
+        if response.get("timeout") or delay > timeout:
+            raise subprocess.TimeoutExpired(args, timeout)
+
+        return subprocess.CompletedProcess(
+            args, response["returncode"], response["stdout"], response["stderr"]
+        )
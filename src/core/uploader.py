@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+视频上传模块
+将本地大文件以分片并行方式上传到 S3 兼容的对象存储（AWS S3、MinIO、OSS/COS 的 S3 接口等），
+生成预签名URL后交给URL方式分析；对象按内容摘要命名，摘要→对象的上传记录带有效期缓存，
+同一文件不会重复上传
+
+依赖 boto3（可选）：未安装或未配置存储桶时不启用上传策略
+凭证使用 boto3 的标准来源（AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY 环境变量、~/.aws/credentials 等）
+"""
+import logging
+import mimetypes
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # pragma: no cover - 取决于运行环境
+    boto3 = None
+
+from src.utils.config_manager import ConfigManager, get_config_manager
+from src.utils.cpu_executor import get_cpu_executor
+
+logger = logging.getLogger(__name__)
+
+# 默认上传记录数据库位置（项目根目录）
+DEFAULT_UPLOAD_DB = Path(__file__).parent.parent.parent / "zai_uploads.db"
+
+# 分片大小（MB，S3 要求除最后一片外不小于 5MB）和并发分片数
+DEFAULT_PART_SIZE_MB = 8
+MIN_PART_SIZE_MB = 5
+DEFAULT_UPLOAD_WORKERS = 4
+
+# 预签名URL有效期（秒）
+DEFAULT_URL_EXPIRY = 3600
+
+# 上传记录有效期（秒）：超过后重新确认对象是否存在（存储桶可能配置了生命周期清理）
+DEFAULT_OBJECT_TTL = 7 * 24 * 3600
+
+# 创建上传器使用的偏好及默认值；其中任一项变化时重新创建上传器
+UPLOAD_PREFERENCES = {
+    "upload_bucket": None,
+    "upload_endpoint": None,
+    "upload_region": None,
+    "upload_prefix": "zai-videos/",
+    "upload_part_size_mb": DEFAULT_PART_SIZE_MB,
+    "upload_workers": DEFAULT_UPLOAD_WORKERS,
+    "upload_url_expiry": DEFAULT_URL_EXPIRY,
+}
+
+def upload_settings(config_manager: Optional[ConfigManager] = None) -> Tuple[Any, ...]:
+    """
+    读取当前的上传偏好（配置文件修改后由配置管理器自动重新加载）
+
+    Args:
+        config_manager: 配置管理器，默认使用全局实例
+
+    Returns:
+        Tuple: 按 UPLOAD_PREFERENCES 顺序排列的偏好值
+    """
+    config = config_manager or get_config_manager()
+    return tuple(config.get_preference(key, default) for key, default in UPLOAD_PREFERENCES.items())
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    digest TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    object_key TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    uploaded_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (digest, bucket)
+);
+"""
+
+
+class S3Uploader:
+    """S3兼容存储上传器 - 分片并行上传 + 预签名URL + 摘要缓存"""
+
+    def __init__(
+        self,
+        bucket: Optional[str],
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        prefix: str = "zai-videos/",
+        part_size_mb: float = DEFAULT_PART_SIZE_MB,
+        workers: int = DEFAULT_UPLOAD_WORKERS,
+        url_expiry: int = DEFAULT_URL_EXPIRY,
+        object_ttl: float = DEFAULT_OBJECT_TTL,
+        db_path: Path = DEFAULT_UPLOAD_DB
+    ):
+        """
+        初始化上传器
+
+        Args:
+            bucket: 存储桶名称，为空时上传策略不可用
+            endpoint_url: S3 兼容服务地址（例如 MinIO 的 http://127.0.0.1:9000），为空时使用 AWS S3
+            region: 区域
+            prefix: 对象键前缀
+            part_size_mb: 分片大小（MB，不小于 5）
+            workers: 并发上传的分片数
+            url_expiry: 预签名URL有效期（秒）
+            object_ttl: 上传记录有效期（秒）
+            db_path: 上传记录数据库文件路径
+        """
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.prefix = prefix
+        self.part_size = int(max(MIN_PART_SIZE_MB, part_size_mb) * 1024 * 1024)
+        self.workers = max(1, workers)
+        self.url_expiry = url_expiry
+        self.object_ttl = object_ttl
+        self.db_path = Path(db_path)
+        self._client = None
+        self._client_lock = threading.Lock()
+        # 由 from_config 创建时记录所用的上传偏好，用于判断配置是否已变更
+        self.settings: Optional[Tuple[Any, ...]] = None
+
+    @classmethod
+    def from_config(cls, config_manager: Optional[ConfigManager] = None) -> "S3Uploader":
+        """
+        根据用户偏好创建上传器
+
+        Args:
+            config_manager: 配置管理器，默认使用全局实例
+
+        Returns:
+            S3Uploader: 上传器实例
+        """
+        settings = upload_settings(config_manager)
+        bucket, endpoint_url, region, prefix, part_size_mb, workers, url_expiry = settings
+        uploader = cls(
+            bucket=bucket,
+            endpoint_url=endpoint_url,
+            region=region,
+            prefix=prefix,
+            part_size_mb=float(part_size_mb),
+            workers=int(workers),
+            url_expiry=int(url_expiry)
+        )
+        uploader.settings = settings
+        return uploader
+
+    @property
+    def available(self) -> bool:
+        """是否可以使用上传策略（已安装 boto3 且配置了存储桶）"""
+        return boto3 is not None and bool(self.bucket)
+
+    def _get_client(self):
+        with self._client_lock:
+            if self._client is None:
+                self._client = boto3.client(
+                    "s3",
+                    endpoint_url=self.endpoint_url,
+                    region_name=self.region,
+                    config=BotoConfig(
+                        signature_version="s3v4",
+                        max_pool_connections=self.workers + 2,
+                        retries={"max_attempts": 3, "mode": "standard"}
+                    )
+                )
+            return self._client
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        创建上传记录数据库连接
+
+        Returns:
+            sqlite3.Connection: 数据库连接
+        """
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _cached_key(self, digest: str) -> Optional[str]:
+        """查询未过期的上传记录"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT object_key FROM uploads WHERE digest = ? AND bucket = ? AND expires_at > ?",
+                (digest, self.bucket, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        return row["object_key"] if row else None
+
+    def _remember(self, digest: str, object_key: str, size: int) -> None:
+        """记录上传结果"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO uploads (digest, bucket, object_key, size, uploaded_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, self.bucket, object_key, size, now, now + self.object_ttl)
+            )
+        finally:
+            conn.close()
+
+    def _object_exists(self, object_key: str) -> bool:
+        """确认对象是否已存在于存储桶中"""
+        try:
+            self._get_client().head_object(Bucket=self.bucket, Key=object_key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _put_multipart(self, path: Path, object_key: str, size: int, content_type: str) -> None:
+        """
+        分片并行上传（文件不超过一个分片时直接上传）
+
+        Args:
+            path: 本地文件路径
+            object_key: 对象键
+            size: 文件大小（字节）
+            content_type: 内容类型
+        """
+        client = self._get_client()
+
+        if size <= self.part_size:
+            with open(path, 'rb') as f:
+                client.put_object(Bucket=self.bucket, Key=object_key, Body=f, ContentType=content_type)
+            return
+
+        upload_id = client.create_multipart_upload(
+            Bucket=self.bucket, Key=object_key, ContentType=content_type
+        )["UploadId"]
+
+        def send(part: Dict[str, int]) -> Dict[str, Any]:
+            # 每个分片独立打开文件读取，内存中同时最多 workers 个分片
+            with open(path, 'rb') as f:
+                f.seek(part["offset"])
+                data = f.read(part["length"])
+            response = client.upload_part(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id,
+                PartNumber=part["number"], Body=data
+            )
+            return {"PartNumber": part["number"], "ETag": response["ETag"]}
+
+        parts: List[Dict[str, int]] = [
+            {"number": number, "offset": offset, "length": min(self.part_size, size - offset)}
+            for number, offset in enumerate(range(0, size, self.part_size), 1)
+        ]
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                completed = list(pool.map(send, parts))
+            client.complete_multipart_upload(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id,
+                MultipartUpload={"Parts": completed}
+            )
+        except Exception:
+            client.abort_multipart_upload(Bucket=self.bucket, Key=object_key, UploadId=upload_id)
+            raise
+
+    def upload(self, file_path: str) -> Dict[str, Any]:
+        """
+        上传本地视频并返回预签名URL（同一内容已上传过时直接生成URL）
+
+        Args:
+            file_path: 本地视频路径
+
+        Returns:
+            Dict: {"url", "object_key", "digest", "uploaded", "seconds"}，失败时返回 {"error": ...}
+        """
+        if not self.available:
+            return {"error": "上传策略不可用：需要安装 boto3 并在偏好配置中设置 upload_bucket"}
+
+        started = time.monotonic()
+        path = Path(file_path)
+
+        try:
+            size = path.stat().st_size
+            digest = get_cpu_executor().file_digest(str(path))
+            object_key = f"{self.prefix}{digest[:2]}/{digest}{path.suffix.lower()}"
+
+            uploaded = False
+            if self._cached_key(digest) is None:
+                # 对象按内容命名，其他进程或之前的记录可能已经上传过
+                if not self._object_exists(object_key):
+                    content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+                    logger.info(f"开始上传 {path.name} ({size / (1024 * 1024):.1f} MB) → {self.bucket}/{object_key}")
+                    self._put_multipart(path, object_key, size, content_type)
+                    uploaded = True
+                self._remember(digest, object_key, size)
+            else:
+                logger.info(f"命中上传缓存，跳过上传: {path.name}")
+
+            url = self._get_client().generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self.bucket, "Key": object_key},
+                ExpiresIn=self.url_expiry
+            )
+        except (OSError, BotoCoreError, ClientError) as e:
+            logger.error(f"上传失败: {e}")
+            return {"error": f"上传失败: {e}"}
+
+        elapsed = time.monotonic() - started
+        if uploaded:
+            logger.info(f"上传完成，用时 {elapsed:.1f} 秒")
+
+        return {
+            "url": url,
+            "object_key": object_key,
+            "digest": digest,
+            "uploaded": uploaded,
+            "seconds": round(elapsed, 3),
+        }
+
+
+# 全局上传器实例
+_global_uploader = None
+_global_uploader_lock = threading.Lock()
+
+
+def get_uploader() -> S3Uploader:
+    """
+    获取全局上传器实例（按用户偏好创建；上传偏好变化后重新创建，
+    config set-upload 或直接修改配置文件无需重启即可生效）
+
+    Returns:
+        S3Uploader: 上传器实例
+    """
+    global _global_uploader
+    settings = upload_settings()
+    with _global_uploader_lock:
+        if _global_uploader is None or _global_uploader.settings != settings:
+            if _global_uploader is not None:
+                logger.info("上传配置已变更，重新创建上传器")
+            _global_uploader = S3Uploader.from_config()
+        return _global_uploader
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+监视目录模式
+持续监视目录中新出现的视频文件（Linux 下使用 inotify，其他平台退化为目录轮询），
+等待文件停止增长后经路由器检查并加入任务队列；已处理文件按内容摘要记录在队列数据库中，
+重启后不会重复分析
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, Set, Tuple
+
+from src.core.job_queue import JobQueue, job_digest
+from src.core.router import VideoRouter, ProcessStrategy
+from src.utils.cpu_executor import get_cpu_executor
+
+logger = logging.getLogger(__name__)
+
+# 文件大小和修改时间保持不变多久后视为写入完成（秒）
+DEFAULT_SETTLE_SECONDS = 5.0
+
+# 轮询模式的扫描间隔；inotify 模式下等待事件的超时时间（秒）
+DEFAULT_POLL_INTERVAL = 2.0
+
+# inotify 模式下的兜底全量扫描间隔（秒），用于发现事件队列溢出时遗漏的文件
+DEFAULT_RESCAN_INTERVAL = 60.0
+
+# 正在写入的临时文件后缀，不做处理
+TEMP_SUFFIXES = ('.part', '.tmp', '.crdownload', '.download')
+
+# inotify 常量（见 <sys/inotify.h>）
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watched_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT,
+    status TEXT NOT NULL,
+    seen_at REAL NOT NULL
+);
+"""
+
+
+class _Inotify:
+    """通过 ctypes 调用 Linux inotify 接口（仅监视单个目录）"""
+
+    def __init__(self, directory: Path):
+        """
+        创建 inotify 实例并监视目录
+
+        Args:
+            directory: 监视的目录
+
+        Raises:
+            OSError: 当前平台不支持或调用失败
+        """
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify 仅支持 Linux")
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch 失败: {directory}")
+
+    def read(self, timeout: float) -> Tuple[Set[str], bool]:
+        """
+        等待并读取事件
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            Tuple[Set[str], bool]: (有变化的文件名集合, 事件队列是否溢出)
+        """
+        names: Set[str] = set()
+        overflow = False
+
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return names, overflow
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names, overflow
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & _IN_Q_OVERFLOW:
+                overflow = True
+            elif name:
+                names.add(os.fsdecode(name))
+
+        return names, overflow
+
+    def close(self) -> None:
+        """关闭 inotify 实例"""
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """目录监视器 - 等待写入完成 → 路由检查 → 按内容摘要去重后入队"""
+
+    def __init__(
+        self,
+        directory: Path,
+        queue: JobQueue,
+        question: str,
+        settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        rescan_interval: float = DEFAULT_RESCAN_INTERVAL,
+        router: Optional[VideoRouter] = None
+    ):
+        """
+        初始化目录监视器
+
+        Args:
+            directory: 监视的目录
+            queue: 任务队列（处理记录保存在同一个数据库文件中）
+            question: 对每个新视频提出的问题
+            settle_seconds: 文件停止增长多久后才入队（秒）
+            poll_interval: 轮询间隔（秒）
+            rescan_interval: inotify 模式下的兜底全量扫描间隔（秒）
+            router: 视频路由器，默认新建
+        """
+        self.directory = Path(directory)
+        self.queue = queue
+        self.question = question
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.router = router or VideoRouter()
+
+        # 等待写入完成的文件：路径 -> ((大小, 修改时间), 该签名首次出现的时间)
+        self._pending: Dict[str, Tuple[Tuple[int, int], float]] = {}
+
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+            rows = conn.execute("SELECT path, size, mtime_ns FROM watched_files").fetchall()
+        finally:
+            conn.close()
+
+        # 已处理文件的签名：路径 -> (大小, 修改时间)；启动时加载一次，此后由 _record 同步更新，
+        # 每次扫描无需为每个文件查询数据库（其他进程新增的记录由任务队列按内容摘要去重）
+        self._seen: Dict[str, Tuple[int, int]] = {
+            row["path"]: (row["size"], row["mtime_ns"]) for row in rows
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        创建处理记录数据库连接（与任务队列共用数据库文件）
+
+        Returns:
+            sqlite3.Connection: 数据库连接
+        """
+        conn = sqlite3.connect(str(self.queue.db_path), timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _is_candidate(self, name: str) -> bool:
+        """判断文件名是否为需要处理的视频文件"""
+        if name.startswith(".") or name.lower().endswith(TEMP_SUFFIXES):
+            return False
+        return Path(name).suffix.lower() in VideoRouter.SUPPORTED_FORMATS
+
+    def _already_seen(self, path: str, signature: Tuple[int, int]) -> bool:
+        """判断文件在当前大小和修改时间下是否已经处理过"""
+        return self._seen.get(path) == signature
+
+    def _record(self, path: str, signature: Tuple[int, int], digest: Optional[str], status: str) -> None:
+        """记录文件处理结果"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO watched_files (path, size, mtime_ns, digest, status, seen_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, signature[0], signature[1], digest, status, time.time())
+            )
+        finally:
+            conn.close()
+
+        self._seen[path] = signature
+
+    def observe(self, path: str, now: float) -> None:
+        """
+        记录文件的当前大小和修改时间，签名变化时重新开始计时
+
+        Args:
+            path: 文件路径
+            now: 当前时间（time.monotonic）
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._pending.pop(path, None)
+            return
+
+        signature = (stat.st_size, stat.st_mtime_ns)
+        previous = self._pending.get(path)
+        if previous is not None and previous[0] == signature:
+            return
+
+        if previous is None and self._already_seen(path, signature):
+            return
+
+        self._pending[path] = (signature, now)
+
+    def scan(self, now: float) -> None:
+        """
+        全量扫描目录
+
+        Args:
+            now: 当前时间（time.monotonic）
+        """
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and self._is_candidate(entry.name):
+                        self.observe(entry.path, now)
+        except OSError as e:
+            logger.warning(f"扫描目录失败: {e}")
+
+    def flush(self, now: float) -> int:
+        """
+        将写入完成（签名稳定超过 settle_seconds）的文件入队
+
+        Args:
+            now: 当前时间（time.monotonic）
+
+        Returns:
+            int: 本次新增的任务数
+        """
+        settled = [
+            path for path, (_, since) in self._pending.items()
+            if now - since >= self.settle_seconds
+        ]
+
+        added = 0
+        for path in settled:
+            signature, _ = self._pending.pop(path)
+            # 入队前再确认一次，避免在稳定期末尾又被写入
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != signature:
+                self._pending[path] = ((stat.st_size, stat.st_mtime_ns), now)
+                continue
+
+            added += self._ingest(path, signature)
+
+        return added
+
+    def _ingest(self, path: str, signature: Tuple[int, int]) -> int:
+        """
+        路由检查单个文件并加入任务队列
+
+        Args:
+            path: 文件路径
+            signature: (大小, 修改时间)
+
+        Returns:
+            int: 新增的任务数（0 或 1）
+        """
+        info = self.router.analyze_input(path)
+        if not info["valid"] or info["recommended_strategy"] == ProcessStrategy.UPLOAD_RECOMMEND:
+            reason = info["error"] or "文件过大，需要先上传到云存储"
+            logger.warning(f"跳过 {path}: {reason}")
+            self._record(path, signature, None, "skipped")
+            return 0
+
+        try:
+            content_digest = get_cpu_executor().file_digest(path)
+        except OSError as e:
+            logger.warning(f"读取文件失败，稍后重试: {path}: {e}")
+            return 0
+
+        # 同一内容（例如改名或重复拷贝）只分析一次
+        added = self.queue.add_jobs([(path, self.question, job_digest(content_digest, self.question))])
+        self._record(path, signature, content_digest, "queued" if added else "duplicate")
+
+        if added:
+            logger.info(f"已入队: {path} ({info['file_size_mb']} MB)")
+        else:
+            logger.info(f"内容已处理过，跳过: {path}")
+        return added
+
+    def run(self, stop_event: threading.Event) -> None:
+        """
+        持续监视目录，直到 stop_event 置位
+
+        Args:
+            stop_event: 停止信号
+        """
+        try:
+            inotify: Optional[_Inotify] = _Inotify(self.directory)
+            logger.info(f"使用 inotify 监视目录: {self.directory}")
+        except (OSError, AttributeError) as e:
+            inotify = None
+            logger.info(f"inotify 不可用（{e}），改为每 {self.poll_interval} 秒轮询目录: {self.directory}")
+
+        last_scan = time.monotonic()
+        self.scan(last_scan)
+
+        try:
+            while not stop_event.is_set():
+                if inotify is None:
+                    stop_event.wait(self.poll_interval)
+                    self.scan(time.monotonic())
+                else:
+                    # 有待稳定的文件时缩短等待，以便按时检查
+                    timeout = min(self.poll_interval, self.settle_seconds) if self._pending else self.poll_interval
+                    names, overflow = inotify.read(timeout)
+                    now = time.monotonic()
+
+                    if overflow or now - last_scan >= self.rescan_interval:
+                        self.scan(now)
+                        last_scan = now
+                    else:
+                        for name in names:
+                            if self._is_candidate(name):
+                                self.observe(str(self.directory / name), now)
+
+                    # 已在等待的文件没有新事件时也需要重新确认签名
+                    for path in list(self._pending):
+                        self.observe(path, now)
+
+                self.flush(time.monotonic())
+        finally:
+            if inotify is not None:
+                inotify.close()
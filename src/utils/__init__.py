@@ -2,9 +2,42 @@
 工具模块
 包含配置管理等工具函数
 """
+from src import _lazy_loader
 
-from src.utils.config_manager import ConfigManager
+__getattr__ = _lazy_loader(__name__, {
+    "ConfigManager": "src.utils.config_manager",
+    "LatencyTracker": "src.utils.latency",
+    "get_latency_tracker": "src.utils.latency",
+    "RateLimiter": "src.utils.rate_limiter",
+    "ImagePreprocessor": "src.utils.image_preprocessor",
+    "TokenEstimator": "src.utils.tokens",
+    "get_token_estimator": "src.utils.tokens",
+    "estimate_tokens": "src.utils.tokens",
+    "MemoryBudget": "src.utils.memory_budget",
+    "get_memory_budget": "src.utils.memory_budget",
+    "UrlProbe": "src.utils.url_probe",
+    "get_url_probe": "src.utils.url_probe",
+    "file_digest": "src.utils.hashing",
+    "Profiler": "src.utils.profiler",
+    "CpuStageExecutor": "src.utils.cpu_executor",
+    "get_cpu_executor": "src.utils.cpu_executor",
+})
 
 __all__ = [
     "ConfigManager",
+    "LatencyTracker",
+    "get_latency_tracker",
+    "RateLimiter",
+    "ImagePreprocessor",
+    "TokenEstimator",
+    "get_token_estimator",
+    "estimate_tokens",
+    "MemoryBudget",
+    "get_memory_budget",
+    "UrlProbe",
+    "get_url_probe",
+    "file_digest",
+    "Profiler",
+    "CpuStageExecutor",
+    "get_cpu_executor",
 ]
@@ -3,13 +3,89 @@
 配置管理模块
 统一管理所有配置文件的加载和保存
 """
+import copy
 import json
 import logging
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# 用户偏好默认值
+DEFAULT_PREFERENCES = {
+    "default_strategy": "auto",  # auto | url_first | base64_only
+    "auto_fallback": True,       # 失败时自动切换策略
+    "max_file_size_mb": 100.0,   # 最大文件大小限制
+    "warn_large_file": True,     # 大文件警告
+    "prefer_url": True,          # 优先使用URL方式
+    "hedge_percentile": 95,      # 对冲延迟取主策略耗时的百分位
+    "hedge_default_delay": 60.0,  # 样本不足时的对冲延迟（秒）
+    "url_preflight": True,       # 分析前预检URL（HEAD + Range GET）
+    "upload_bucket": None,       # S3兼容存储桶，设置后大文件自动分片上传并按URL分析（需要 boto3）
+    "upload_endpoint": None,     # S3兼容服务地址（MinIO/OSS/COS等），None 表示 AWS S3
+    "upload_region": None,
+    "upload_prefix": "zai-videos/",
+    "upload_part_size_mb": 8,
+    "upload_workers": 4,
+    "upload_url_expiry": 3600,   # 预签名URL有效期（秒）
+    "circuit_breaker": {         # 模型熔断器参数（只有超时、网络错误、5xx、限流计入失败）
+        "window_size": 20,             # 统计窗口内的调用次数
+        "min_calls": 5,                # 开始计算比率前所需的最少调用次数
+        "failure_rate_threshold": 0.5,
+        "slow_call_duration": 120.0,   # 慢调用判定耗时（秒）
+        "slow_call_rate_threshold": 0.8,
+        "open_duration": 30.0,         # 熔断持续时间（秒），之后进入半开探测
+        "half_open_max_calls": 1
+    },
+    "memory_budget_mb": None,    # 并发分析的内存预算（MB），None 表示物理内存的一半
+    "cpu_workers": None,         # Base64编码、摘要、图像压缩等CPU阶段的进程数（与分析并发数分开），None 表示CPU核数，0 表示在调用线程中执行
+    "scheduler_tenants": {},     # 分析调度器的租户配置 {租户: {"weight", "max_concurrency", "token_quota"}}
+    "scheduler_interactive_reserved": 1,  # 只执行交互式请求的工作线程数
+    "scheduler_token_window": 3600,       # 租户Token配额的滑动统计窗口（秒）
+    "scheduler_queue_timeout": None,      # 任务的排队截止时间（秒），配额用尽的任务等待额度释放，超过后以错误结束；None 表示一直等待
+    "strategy_order": [          # 策略优先顺序：同一策略有多个回退目标时按此排序；回退图为 None 时按此推导
+        "url_direct",
+        "base64_small",
+        "base64_large",
+        "upload"
+    ],
+    "fallback_graph": {          # 回退图 {策略: [回退策略, ...]}，是否适用仍按输入类型和文件大小判断；None 表示由 strategy_order 推导
+        "url_direct": [],
+        "base64_small": [],
+        "base64_large": ["base64_small"],
+        "upload": ["base64_large"]
+    },
+    "strategy_policies": {       # 各策略单次尝试的超时上限（秒）和尝试次数
+        "url_direct": {"timeout": 300, "attempts": 1},
+        "base64_small": {"timeout": 300, "attempts": 1},
+        "base64_large": {"timeout": 1200, "attempts": 1},
+        "upload": {"timeout": 1800, "attempts": 1}
+    },
+    "analysis_deadline": 3600,   # 一次分析（含重试和回退）的总截止时间（秒），0 表示不限制
+    "adaptive_timeouts": True,   # 按文件大小和历史耗时计算每次请求的超时（不超过策略的超时上限）
+    "timeout_margin": 3.0,       # 自适应超时：在历史耗时百分位数上乘的余量
+    "timeout_percentile": 99,    # 自适应超时：使用的耗时百分位
+    "timeout_min_seconds": 30    # 自适应超时的下限（秒）
+}
+
+
+def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    """
+    获取文件签名（修改时间 + 大小），文件不存在时返回None
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        Optional[Tuple[int, int]]: (mtime_ns, size)
+    """
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
 
 class ConfigManager:
     """统一配置管理器"""
@@ -33,83 +109,78 @@ class ConfigManager:
         self.mcp_config_path = self.config_dir / "mcp_config.json"
         self.user_prefs_path = self.config_dir / "user_preferences.json"
 
-        # 缓存配置
+        # 缓存配置及其对应的文件签名；签名变化（文件被修改）时重新加载
         self._mcp_config = None
+        self._mcp_signature = None
         self._user_prefs = None
+        self._prefs_signature = None
+        self._lock = threading.RLock()
 
     def load_mcp_config(self) -> Dict[str, Any]:
         """
-        加载MCP配置
+        加载MCP配置（文件未变化时直接返回缓存）
 
         Returns:
             Dict: MCP配置字典
         """
-        if self._mcp_config is not None:
-            return self._mcp_config
+        signature = _file_signature(self.mcp_config_path)
 
-        try:
-            if not self.mcp_config_path.exists():
-                raise FileNotFoundError(f"MCP配置文件不存在: {self.mcp_config_path}")
+        with self._lock:
+            if self._mcp_config is not None and signature == self._mcp_signature:
+                return self._mcp_config
 
-            with open(self.mcp_config_path, 'r', encoding='utf-8') as f:
-                self._mcp_config = json.load(f)
+            try:
+                if signature is None:
+                    raise FileNotFoundError(f"MCP配置文件不存在: {self.mcp_config_path}")
 
-            # 验证必要字段
-            if "env" not in self._mcp_config:
-                raise ValueError("MCP配置文件缺少 'env' 字段")
+                with open(self.mcp_config_path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
 
-            if "Z_AI_API_KEY" not in self._mcp_config.get("env", {}):
-                raise ValueError("MCP配置文件中未找到 Z_AI_API_KEY")
+                # 验证必要字段
+                if "env" not in config:
+                    raise ValueError("MCP配置文件缺少 'env' 字段")
 
-            logger.info("MCP配置加载成功")
-            return self._mcp_config
+                if "Z_AI_API_KEY" not in config.get("env", {}):
+                    raise ValueError("MCP配置文件中未找到 Z_AI_API_KEY")
 
-        except json.JSONDecodeError as e:
-            raise ValueError(f"MCP配置文件JSON格式错误: {e}")
-        except Exception as e:
-            logger.error(f"加载MCP配置失败: {e}")
-            raise
+                self._mcp_config = config
+                self._mcp_signature = signature
+                logger.info("MCP配置加载成功")
+                return self._mcp_config
+
+            except json.JSONDecodeError as e:
+                raise ValueError(f"MCP配置文件JSON格式错误: {e}")
+            except Exception as e:
+                logger.error(f"加载MCP配置失败: {e}")
+                raise
 
     def load_user_preferences(self) -> Dict[str, Any]:
         """
-        加载用户偏好配置
+        加载用户偏好配置（文件未变化时直接返回缓存）
 
         Returns:
             Dict: 用户偏好字典
         """
-        if self._user_prefs is not None:
-            return self._user_prefs
+        signature = _file_signature(self.user_prefs_path)
 
-        default_prefs = {
-            "default_strategy": "auto",
-            "auto_fallback": True,
-            "max_file_size_mb": 100.0,
-            "warn_large_file": True,
-            "prefer_url": True,
-            "strategy_order": [
-                "url_direct",
-                "base64_small",
-                "base64_large"
-            ]
-        }
+        with self._lock:
+            if self._user_prefs is not None and signature == self._prefs_signature:
+                return self._user_prefs
 
-        try:
-            if self.user_prefs_path.exists():
-                with open(self.user_prefs_path, 'r', encoding='utf-8') as f:
-                    user_prefs = json.load(f)
-                    default_prefs.update(user_prefs)
+            prefs = copy.deepcopy(DEFAULT_PREFERENCES)
+
+            try:
+                if signature is not None:
+                    with open(self.user_prefs_path, 'r', encoding='utf-8') as f:
+                        prefs.update(json.load(f))
                     logger.info("用户偏好配置加载成功")
-            else:
-                # 创建默认配置文件
-                self.save_user_preferences(default_prefs)
-                logger.info("创建默认用户偏好配置")
+                # 文件不存在时直接使用默认值，只有修改偏好时才写入文件
 
-            self._user_prefs = default_prefs
-            return self._user_prefs
+            except Exception as e:
+                logger.warning(f"加载用户偏好失败，使用默认配置: {e}")
 
-        except Exception as e:
-            logger.warning(f"加载用户偏好失败，使用默认配置: {e}")
-            self._user_prefs = default_prefs
+            self._user_prefs = prefs
+            self._prefs_signature = signature
             return self._user_prefs
 
     def save_user_preferences(self, preferences: Dict[str, Any]) -> bool:
@@ -122,15 +193,17 @@ class ConfigManager:
         Returns:
             bool: 是否保存成功
         """
-        try:
-            with open(self.user_prefs_path, 'w', encoding='utf-8') as f:
-                json.dump(preferences, f, indent=2, ensure_ascii=False)
-            logger.info("用户偏好配置保存成功")
-            self._user_prefs = preferences
-            return True
-        except Exception as e:
-            logger.error(f"保存用户偏好失败: {e}")
-            return False
+        with self._lock:
+            try:
+                with open(self.user_prefs_path, 'w', encoding='utf-8') as f:
+                    json.dump(preferences, f, indent=2, ensure_ascii=False)
+                logger.info("用户偏好配置保存成功")
+                self._user_prefs = preferences
+                self._prefs_signature = _file_signature(self.user_prefs_path)
+                return True
+            except Exception as e:
+                logger.error(f"保存用户偏好失败: {e}")
+                return False
 
     def get_api_key(self) -> str:
         """
@@ -180,9 +253,10 @@ class ConfigManager:
         Returns:
             bool: 是否设置成功
         """
-        prefs = self.load_user_preferences()
-        prefs[key] = value
-        return self.save_user_preferences(prefs)
+        with self._lock:
+            prefs = dict(self.load_user_preferences())
+            prefs[key] = value
+            return self.save_user_preferences(prefs)
 
     def reset_preferences(self) -> bool:
         """
@@ -191,18 +265,7 @@ class ConfigManager:
         Returns:
             bool: 是否重置成功
         """
-        default_prefs = {
-            "default_strategy": "auto",
-            "auto_fallback": True,
-            "max_file_size_mb": 100.0,
-            "warn_large_file": True,
-            "prefer_url": True,
-            "strategy_order": [
-                "url_direct",
-                "base64_small",
-                "base64_large"
-            ]
-        }
+        default_prefs = copy.deepcopy(DEFAULT_PREFERENCES)
         return self.save_user_preferences(default_prefs)
 
     def get_config_info(self) -> Dict[str, Any]:
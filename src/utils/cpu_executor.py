@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+CPU阶段执行器
+Base64编码、内容摘要、图像缩放压缩等CPU密集阶段统一在一个进程池中执行，
+不占用调用线程的GIL；进程数（cpu_workers）与分析/上传等I/O并发数分开配置
+
+大数据不经过进程间管道：文件类任务只传路径，由工作进程直接读写文件；
+内存中的数据通过共享内存传递，工作进程把结果写回共享内存
+"""
+import os
+import sys
+import base64
+import binascii
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Optional, Callable, Any
+
+from src.utils.config_manager import get_config_manager
+from src.utils.hashing import file_digest
+
+logger = logging.getLogger(__name__)
+
+# 编码时每次处理的字节数（3的倍数，保证分块编码结果可以直接拼接）
+ENCODE_CHUNK_SIZE = 3 * 1024 * 1024
+
+# 小于该大小的数据/文件直接在当前线程处理，进程间调度的开销大于收益
+MIN_OFFLOAD_BYTES = 1024 * 1024
+
+# 工作进程的启动方式：进程池在批量、调度、对冲等工作线程中按需创建，此时 fork 出的子进程
+# 会继承其他线程持有的锁（logging、sqlite 等）而可能死锁，因此不使用 fork
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """在工作进程中打开共享内存（由创建方负责释放）"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    # 3.13 之前打开已有的共享内存也会登记到资源跟踪器；进程池的工作进程与创建方共用同一个
+    # 资源跟踪器，而跟踪器按名称去重，重复登记没有影响，创建方 unlink 时注销一次即可。
+    # 工作进程不能自行注销，否则创建方 unlink 时跟踪器会因名称不存在而报错
+    return shared_memory.SharedMemory(name=name)
+
+
+def new_process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    创建进程池（使用 POOL_START_METHOD 启动工作进程，可以在多线程进程中安全创建）
+
+    Args:
+        workers: 进程数
+
+    Returns:
+        ProcessPoolExecutor: 进程池
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(POOL_START_METHOD)
+    )
+
+
+def encode_file_base64(source_path: str, target_path: str) -> int:
+    """
+    分块读取文件并把Base64编码结果写入目标文件（在工作进程中执行）
+
+    Args:
+        source_path: 源文件路径
+        target_path: Base64文本的输出路径
+
+    Returns:
+        int: Base64文本长度（字符）
+    """
+    written = 0
+    with open(source_path, 'rb') as source, open(target_path, 'wb') as target:
+        for chunk in iter(lambda: source.read(ENCODE_CHUNK_SIZE), b''):
+            written += target.write(binascii.b2a_base64(chunk, newline=False))
+    return written
+
+
+def encode_shared_base64(source_name: str, size: int, target_name: str) -> int:
+    """
+    把共享内存中的数据编码为Base64并写入另一块共享内存（在工作进程中执行）
+
+    Args:
+        source_name: 输入数据所在的共享内存名称
+        size: 输入数据长度（字节）
+        target_name: 输出共享内存名称（容量至少为 4 * ceil(size / 3)）
+
+    Returns:
+        int: Base64文本长度（字节）
+    """
+    source = _attach_shared_memory(source_name)
+    target = _attach_shared_memory(target_name)
+    written = 0
+
+    try:
+        for offset in range(0, size, ENCODE_CHUNK_SIZE):
+            with source.buf[offset:min(offset + ENCODE_CHUNK_SIZE, size)] as chunk:
+                encoded = binascii.b2a_base64(chunk, newline=False)
+            target.buf[written:written + len(encoded)] = encoded
+            written += len(encoded)
+    finally:
+        source.close()
+        target.close()
+
+    return written
+
+
+class CpuStageExecutor:
+    """CPU阶段执行器（进程池按需创建，线程安全）"""
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        初始化CPU阶段执行器
+
+        Args:
+            workers: 进程数，默认为CPU核数；为 0 时所有阶段在调用线程中执行
+        """
+        self.workers = (os.cpu_count() or 1) if workers is None else max(0, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self) -> Optional[ProcessPoolExecutor]:
+        """共享的进程池，workers 为 0 时为None"""
+        if self.workers == 0:
+            return None
+
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = new_process_pool(self.workers)
+            return self._pool
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """
+        提交CPU阶段任务（函数和参数需可序列化）；未启用进程池时在当前线程执行
+
+        Args:
+            fn: 模块级函数
+            *args: 参数
+
+        Returns:
+            Future: 任务结果
+        """
+        pool = self.pool
+        if pool is not None:
+            return pool.submit(fn, *args)
+
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _offload(self, size: int) -> bool:
+        return self.workers > 0 and size >= MIN_OFFLOAD_BYTES
+
+    def encode_file_base64(self, source_path: Path, target_path: Path) -> int:
+        """
+        把文件编码为Base64文本文件（编码结果不经过当前进程的内存）
+
+        Args:
+            source_path: 源文件路径
+            target_path: 输出路径
+
+        Returns:
+            int: Base64文本长度（字符）
+        """
+        if not self._offload(Path(source_path).stat().st_size):
+            return encode_file_base64(str(source_path), str(target_path))
+        return self.submit(encode_file_base64, str(source_path), str(target_path)).result()
+
+    def file_digest(self, file_path: str) -> str:
+        """
+        计算文件的 SHA-256 摘要
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            str: 十六进制摘要
+        """
+        if not self._offload(Path(file_path).stat().st_size):
+            return file_digest(str(file_path))
+        return self.submit(file_digest, str(file_path)).result()
+
+    def b64encode(self, data: bytes) -> str:
+        """
+        把内存中的数据编码为Base64字符串，输入和输出通过共享内存在进程间传递
+
+        Args:
+            data: 原始数据
+
+        Returns:
+            str: Base64字符串
+        """
+        if not self._offload(len(data)):
+            return base64.b64encode(data).decode('ascii')
+
+        source = shared_memory.SharedMemory(create=True, size=len(data))
+        target = shared_memory.SharedMemory(create=True, size=(len(data) + 2) // 3 * 4)
+        try:
+            source.buf[:len(data)] = data
+            length = self.submit(encode_shared_base64, source.name, len(data), target.name).result()
+            with target.buf[:length] as encoded:
+                return bytes(encoded).decode('ascii')
+        finally:
+            for segment in (source, target):
+                segment.close()
+                segment.unlink()
+
+    def close(self) -> None:
+        """关闭进程池"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+# 全局CPU阶段执行器实例
+_global_cpu_executor = None
+_global_cpu_executor_lock = threading.Lock()
+
+
+def get_cpu_executor() -> CpuStageExecutor:
+    """
+    获取全局CPU阶段执行器实例（单例模式，进程数取偏好 cpu_workers，None 表示CPU核数）
+
+    Returns:
+        CpuStageExecutor: CPU阶段执行器实例
+    """
+    global _global_cpu_executor
+    with _global_cpu_executor_lock:
+        if _global_cpu_executor is None:
+            _global_cpu_executor = CpuStageExecutor(get_config_manager().get_preference("cpu_workers"))
+        return _global_cpu_executor
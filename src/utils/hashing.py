@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+文件摘要模块
+流式计算文件内容摘要，用于按内容去重（监视目录、上传缓存等）
+"""
+import hashlib
+
+# 计算文件摘要时的读取块大小
+DIGEST_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(file_path: str) -> str:
+    """
+    流式计算文件内容摘要
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        str: SHA-256 十六进制摘要
+    """
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+本地图像预处理模块
+读取本地图像，按最长边缩放并重新压缩为JPEG/WebP，结果按内容摘要缓存到磁盘；
+解码和缩放默认在共享的CPU阶段进程池中执行（见 cpu_executor），避免占用调用线程的GIL
+
+依赖 Pillow（可选）：未安装时直接使用原图，不做缩放
+"""
+import hashlib
+import io
+import os
+import logging
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, List, Tuple
+
+from src.utils.cpu_executor import get_cpu_executor, new_process_pool
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - 取决于运行环境
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# 默认参数
+DEFAULT_MAX_EDGE = 1536       # 缩放后最长边（像素）
+DEFAULT_IMAGE_FORMAT = "JPEG"  # JPEG | WEBP
+DEFAULT_QUALITY = 85
+DEFAULT_CACHE_DIR = Path(tempfile.gettempdir()) / "zai_image_cache"
+
+_FORMAT_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+_SOURCE_MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+}
+
+
+def is_remote_image(image: str) -> bool:
+    """
+    判断图像输入是否为URL或Data URI（无需本地读取）
+
+    Args:
+        image: 图像路径、URL或Data URI
+
+    Returns:
+        bool: 是否为远程/内联图像
+    """
+    return image.startswith(("http://", "https://", "data:"))
+
+
+def preprocess_image(
+    image_path: str,
+    max_edge: int,
+    image_format: str,
+    quality: int,
+    cache_dir: str
+) -> Tuple[bytes, str]:
+    """
+    预处理单张图像（在工作进程中执行）
+
+    Args:
+        image_path: 本地图像路径
+        max_edge: 最长边上限（像素）
+        image_format: 输出格式（JPEG | WEBP）
+        quality: 压缩质量
+        cache_dir: 缓存目录
+
+    Returns:
+        Tuple[bytes, str]: (图像数据, MIME类型)
+
+    Raises:
+        ValueError: 不支持的图像格式
+    """
+    path = Path(image_path)
+    source_mime = _SOURCE_MIME_TYPES.get(path.suffix.lower())
+    if source_mime is None:
+        raise ValueError(f"不支持的图像格式: {path.suffix}")
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if Image is None:
+        return data, source_mime
+
+    mime_type = _FORMAT_MIME_TYPES[image_format]
+    key = hashlib.sha256(data).hexdigest()
+    cache_file = Path(cache_dir) / f"{key}_{max_edge}_{quality}.{image_format.lower()}"
+
+    if cache_file.exists():
+        return cache_file.read_bytes(), mime_type
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail((max_edge, max_edge))
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        image.save(output, format=image_format, quality=quality)
+        encoded = output.getvalue()
+
+    # 先写临时文件再改名，避免并发进程读到不完整的缓存
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = cache_file.with_suffix(cache_file.suffix + f".{os.getpid()}.tmp")
+    temp_file.write_bytes(encoded)
+    temp_file.replace(cache_file)
+
+    return encoded, mime_type
+
+
+class ImagePreprocessor:
+    """图像预处理器 - 缩放、重新压缩并编码为Data URI"""
+
+    def __init__(
+        self,
+        max_edge: int = DEFAULT_MAX_EDGE,
+        image_format: str = DEFAULT_IMAGE_FORMAT,
+        quality: int = DEFAULT_QUALITY,
+        cache_dir: Optional[Path] = None,
+        workers: Optional[int] = None
+    ):
+        """
+        初始化图像预处理器
+
+        Args:
+            max_edge: 最长边上限（像素）
+            image_format: 输出格式（JPEG | WEBP）
+            quality: 压缩质量（1-100）
+            cache_dir: 缓存目录，默认为系统临时目录下的 zai_image_cache
+            workers: 独立的解码进程数；默认使用共享的CPU阶段进程池，为 0 时在当前进程中处理
+        """
+        image_format = image_format.upper()
+        if image_format not in _FORMAT_MIME_TYPES:
+            raise ValueError(f"不支持的输出格式: {image_format} (可选: {', '.join(_FORMAT_MIME_TYPES)})")
+
+        self.max_edge = max_edge
+        self.image_format = image_format
+        self.quality = quality
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+        if Image is None:
+            logger.warning("未安装 Pillow，图像将以原始尺寸上传（pip install Pillow 以启用缩放压缩）")
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        # 未安装Pillow时只需读取文件，无需进程池
+        if self.workers == 0 or Image is None:
+            return None
+
+        if self.workers is None:
+            return get_cpu_executor().pool
+
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = new_process_pool(self.workers)
+            return self._pool
+
+    def _args(self, image_path: str) -> tuple:
+        return (str(image_path), self.max_edge, self.image_format, self.quality, str(self.cache_dir))
+
+    def to_data_uri(self, image_path: str) -> str:
+        """
+        预处理单张图像并编码为Data URI
+
+        Args:
+            image_path: 本地图像路径
+
+        Returns:
+            str: Data URI
+        """
+        data, mime_type = self.submit(image_path).result()
+        return f"data:{mime_type};base64,{get_cpu_executor().b64encode(data)}"
+
+    def preprocess_many(self, image_paths: List[str]) -> List[str]:
+        """
+        通过进程池并行预处理多张图像
+
+        Args:
+            image_paths: 本地图像路径列表
+
+        Returns:
+            List[str]: 与输入顺序一致的Data URI列表
+
+        Raises:
+            Exception: 任意一张图像处理失败时抛出对应异常
+        """
+        futures = [self.submit(path) for path in image_paths]
+        uris = []
+        for future in futures:
+            data, mime_type = future.result()
+            uris.append(f"data:{mime_type};base64,{get_cpu_executor().b64encode(data)}")
+        return uris
+
+    def submit(self, image_path: str) -> Future:
+        """
+        提交单张图像到进程池，返回Future（结果为 (数据, MIME类型)）
+
+        Args:
+            image_path: 本地图像路径
+
+        Returns:
+            Future: 预处理任务
+        """
+        pool = self._get_pool()
+        if pool is None:
+            future: Future = Future()
+            try:
+                future.set_result(preprocess_image(*self._args(image_path)))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        return pool.submit(preprocess_image, *self._args(image_path))
+
+    def close(self) -> None:
+        """关闭独立的进程池（共享的CPU阶段进程池不受影响）"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+延迟统计模块
+按策略/模型等维度记录请求耗时，提供滚动窗口百分位数
+"""
+import math
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Deque
+
+
+class LatencyTracker:
+    """滚动窗口延迟统计器（线程安全）"""
+
+    def __init__(self, window_size: int = 200):
+        """
+        初始化延迟统计器
+
+        Args:
+            window_size: 每个键保留的最近样本数
+        """
+        self.window_size = window_size
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        """
+        记录一次耗时
+
+        Args:
+            key: 统计维度，例如策略名称
+            seconds: 耗时（秒）
+        """
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = deque(maxlen=self.window_size)
+                self._samples[key] = samples
+            samples.append(seconds)
+
+    def count(self, key: str) -> int:
+        """
+        获取样本数量
+
+        Args:
+            key: 统计维度
+
+        Returns:
+            int: 当前窗口内的样本数
+        """
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def percentile(self, key: str, pct: float, default: Optional[float] = None) -> Optional[float]:
+        """
+        计算百分位数（最近秩法）
+
+        Args:
+            key: 统计维度
+            pct: 百分位，取值 0-100
+            default: 无样本时的返回值
+
+        Returns:
+            Optional[float]: 百分位耗时（秒）
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+
+        if not samples:
+            return default
+
+        rank = max(1, math.ceil(pct / 100.0 * len(samples)))
+        return samples[min(rank, len(samples)) - 1]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取所有维度的统计摘要
+
+        Returns:
+            Dict: {键: {count, p50, p95, p99}}
+        """
+        with self._lock:
+            keys = list(self._samples.keys())
+
+        return {
+            key: {
+                "count": self.count(key),
+                "p50": self.percentile(key, 50),
+                "p95": self.percentile(key, 95),
+                "p99": self.percentile(key, 99),
+            }
+            for key in keys
+        }
+
+
+# 全局延迟统计实例
+_global_latency_tracker = None
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """
+    获取全局延迟统计实例（单例模式）
+
+    Returns:
+        LatencyTracker: 延迟统计实例
+    """
+    global _global_latency_tracker
+    if _global_latency_tracker is None:
+        _global_latency_tracker = LatencyTracker()
+    return _global_latency_tracker
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+内存准入控制模块
+按文件大小和处理策略估算每个分析任务的峰值内存，只在总量不超过内存预算时放行，
+其余任务按到达顺序排队等待，避免多个大文件同时Base64编码导致主机使用交换分区
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Optional, Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# 每MB视频在各策略下的峰值内存倍数：
+# Base64 编码在CPU阶段进程池中分块完成并直接写入临时文件（只占用固定的分块缓冲），
+# 随后 Node 进程读入字符串、拼接 Data URI 并序列化请求体（各约 4/3）
+PEAK_MEMORY_FACTORS = {
+    "url_direct": 0.0,
+    "base64_small": 4.0,
+    "base64_large": 4.0,
+    "upload": 0.0,  # 分片流式读取，只占用固定的分片缓冲
+}
+
+# 每个任务的固定开销（MB）：Node 子进程及请求处理的基础内存
+TASK_BASE_MEMORY_MB = 64.0
+
+# 未配置内存预算时使用物理内存的比例；无法获取物理内存时的默认预算（MB）
+DEFAULT_BUDGET_FRACTION = 0.5
+FALLBACK_BUDGET_MB = 2048.0
+
+# 等待准入时检查取消信号的间隔（秒）
+WAIT_POLL_INTERVAL = 0.5
+
+
+def estimate_peak_memory_mb(file_size_mb: Optional[float], strategy: Any) -> float:
+    """
+    估算单个分析任务的峰值内存
+
+    Args:
+        file_size_mb: 视频文件大小（MB），URL输入为None
+        strategy: 处理策略（ProcessStrategy 或其取值字符串）
+
+    Returns:
+        float: 峰值内存估算（MB）
+    """
+    key = getattr(strategy, "value", strategy)
+    factor = PEAK_MEMORY_FACTORS.get(key, max(PEAK_MEMORY_FACTORS.values()))
+    return round(TASK_BASE_MEMORY_MB + (file_size_mb or 0.0) * factor, 1)
+
+
+def default_budget_mb() -> float:
+    """
+    默认内存预算：物理内存的一半
+
+    Returns:
+        float: 内存预算（MB）
+    """
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return FALLBACK_BUDGET_MB
+    return round(total / (1024 * 1024) * DEFAULT_BUDGET_FRACTION, 1)
+
+
+class MemoryBudget:
+    """内存准入控制器（线程安全，按到达顺序放行）"""
+
+    def __init__(self, limit_mb: float):
+        """
+        初始化内存准入控制器
+
+        Args:
+            limit_mb: 内存预算（MB），<= 0 表示不限制
+        """
+        self.limit_mb = limit_mb
+        self.in_use_mb = 0.0
+        self._waiting: deque = deque()
+        self._condition = threading.Condition()
+
+    def _fits(self, ticket: object, amount_mb: float) -> bool:
+        # 队首任务才能放行，避免大任务被源源不断的小任务饿死；
+        # 单个任务超过整个预算时，在没有其他任务占用内存时单独放行
+        if self._waiting[0] is not ticket:
+            return False
+        return self.in_use_mb == 0 or self.in_use_mb + amount_mb <= self.limit_mb
+
+    def acquire(self, amount_mb: float, cancel_event: Optional[threading.Event] = None) -> Optional[float]:
+        """
+        申请内存额度，预算不足时排队等待
+
+        Args:
+            amount_mb: 申请的内存（MB）
+            cancel_event: 取消信号，置位后放弃等待
+
+        Returns:
+            Optional[float]: 等待时间（秒）；等待期间被取消时返回None
+        """
+        if self.limit_mb <= 0 or amount_mb <= 0:
+            return 0.0
+
+        started = time.monotonic()
+        ticket = object()
+
+        with self._condition:
+            self._waiting.append(ticket)
+            try:
+                while not self._fits(ticket, amount_mb):
+                    if cancel_event is not None and cancel_event.is_set():
+                        return None
+                    self._condition.wait(WAIT_POLL_INTERVAL)
+
+                self.in_use_mb += amount_mb
+            finally:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+
+        waited = time.monotonic() - started
+        if waited >= WAIT_POLL_INTERVAL:
+            logger.info(f"内存预算不足，任务排队 {waited:.1f} 秒后放行 ({amount_mb:.0f} MB)")
+        return waited
+
+    def release(self, amount_mb: float) -> None:
+        """
+        归还内存额度
+
+        Args:
+            amount_mb: 归还的内存（MB），应与 acquire 时一致
+        """
+        if self.limit_mb <= 0 or amount_mb <= 0:
+            return
+
+        with self._condition:
+            self.in_use_mb = max(0.0, self.in_use_mb - amount_mb)
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取当前占用情况
+
+        Returns:
+            Dict: 预算、已占用和排队中的任务数
+        """
+        with self._condition:
+            return {
+                "limit_mb": self.limit_mb,
+                "in_use_mb": round(self.in_use_mb, 1),
+                "waiting": len(self._waiting),
+            }
+
+
+# 全局内存准入控制器实例
+_global_memory_budget = None
+_global_memory_budget_lock = threading.Lock()
+
+
+def get_memory_budget(limit_mb: Optional[float] = None) -> MemoryBudget:
+    """
+    获取全局内存准入控制器实例（单例模式，同一进程内的所有分析器共享）
+
+    Args:
+        limit_mb: 内存预算（MB），仅在首次创建时生效，默认为物理内存的一半
+
+    Returns:
+        MemoryBudget: 内存准入控制器实例
+    """
+    global _global_memory_budget
+    with _global_memory_budget_lock:
+        if _global_memory_budget is None:
+            _global_memory_budget = MemoryBudget(limit_mb if limit_mb is not None else default_budget_mb())
+        return _global_memory_budget
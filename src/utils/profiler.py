@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+性能剖析模块
+用 cProfile 记录调用耗时、tracemalloc 记录内存分配，并通过 getrusage(RUSAGE_CHILDREN)
+统计 Node 子进程的CPU时间和峰值内存；按阶段记录Python堆峰值，结果写入剖析目录
+
+未启用剖析时使用 NULL_PROFILER，各阶段钩子只是空的上下文管理器，没有额外开销
+"""
+import cProfile
+import contextlib
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows 没有 resource 模块
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# 报告中列出的函数/分配位置数量
+DEFAULT_TOP_N = 25
+
+# tracemalloc 记录的调用栈深度
+TRACEMALLOC_FRAMES = 10
+
+
+def _children_rusage() -> Optional[Dict[str, float]]:
+    """
+    获取已结束子进程的资源用量
+
+    Returns:
+        Optional[Dict]: CPU时间（秒）和峰值常驻内存（MB），不支持的平台返回None
+    """
+    if resource is None:
+        return None
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # Linux 下 ru_maxrss 单位为 KB，macOS 下为字节
+    maxrss_mb = usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    return {
+        "user_seconds": round(usage.ru_utime, 3),
+        "system_seconds": round(usage.ru_stime, 3),
+        "max_rss_mb": round(maxrss_mb, 1),
+    }
+
+
+class _NullProfiler:
+    """未启用剖析时的空实现"""
+
+    enabled = False
+
+    def __enter__(self) -> "_NullProfiler":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+    def stage(self, name: str) -> contextlib.nullcontext:
+        return contextlib.nullcontext()
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+class Profiler:
+    """性能剖析器（作为上下文管理器包裹一次分析）"""
+
+    enabled = True
+
+    def __init__(self, profile_dir: Path, top_n: int = DEFAULT_TOP_N):
+        """
+        初始化性能剖析器
+
+        Args:
+            profile_dir: 剖析结果根目录，每次运行写入其中按时间命名的子目录
+            top_n: 报告中列出的函数和分配位置数量
+        """
+        self.output_dir = Path(profile_dir) / time.strftime(f"%Y%m%d-%H%M%S-{os.getpid()}")
+        self.top_n = top_n
+        self.stages: List[Dict[str, Any]] = []
+        self._profile = cProfile.Profile()
+        self._started_tracing = False
+        self._started = 0.0
+        self._children_before: Optional[Dict[str, float]] = None
+
+    def __enter__(self) -> "Profiler":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracing = True
+        tracemalloc.reset_peak()
+
+        self._children_before = _children_rusage()
+        self._started = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._profile.disable()
+        elapsed = time.perf_counter() - self._started
+        # 在生成报告之前拍摄快照，避免报告本身的分配混入
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+        ])
+
+        try:
+            self._write_reports(elapsed, snapshot)
+        except OSError as e:
+            logger.error(f"写入剖析结果失败: {e}")
+        finally:
+            if self._started_tracing:
+                tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        记录一个阶段的耗时、Python堆峰值和子进程资源用量
+
+        Args:
+            name: 阶段名称
+        """
+        tracemalloc.reset_peak()
+        children_before = _children_rusage()
+        current_before, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            record = {
+                "stage": name,
+                "seconds": round(time.perf_counter() - started, 3),
+                "python_peak_mb": round(peak / (1024 * 1024), 2),
+                "python_retained_mb": round((current - current_before) / (1024 * 1024), 2),
+            }
+
+            children_after = _children_rusage()
+            if children_before and children_after:
+                record["children_cpu_seconds"] = max(0.0, round(
+                    children_after["user_seconds"] + children_after["system_seconds"]
+                    - children_before["user_seconds"] - children_before["system_seconds"], 3
+                ))
+                record["children_max_rss_mb"] = children_after["max_rss_mb"]
+
+            self.stages.append(record)
+
+    def _write_reports(self, elapsed: float, snapshot: tracemalloc.Snapshot) -> None:
+        """写入 pstats、文本报告、内存分配快照和阶段汇总"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        self._profile.dump_stats(str(self.output_dir / "profile.pstats"))
+
+        text = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=text)
+        stats.sort_stats("cumulative").print_stats(self.top_n)
+        (self.output_dir / "profile.txt").write_text(text.getvalue(), encoding="utf-8")
+
+        lines = [f"Top {self.top_n} 内存分配位置（当前仍被持有）", ""]
+        for index, stat in enumerate(snapshot.statistics("lineno")[:self.top_n], 1):
+            frame = stat.traceback[0]
+            lines.append(
+                f"#{index}: {frame.filename}:{frame.lineno}  "
+                f"{stat.size / 1024:.1f} KB  ({stat.count} 个对象)"
+            )
+        (self.output_dir / "allocations.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        children_after = _children_rusage()
+        summary = {
+            "total_seconds": round(elapsed, 3),
+            "python_peak_mb": max((stage["python_peak_mb"] for stage in self.stages), default=None),
+            "stages": self.stages,
+            "children": None,
+        }
+        if self._children_before and children_after:
+            summary["children"] = {
+                "user_seconds": round(children_after["user_seconds"] - self._children_before["user_seconds"], 3),
+                "system_seconds": round(children_after["system_seconds"] - self._children_before["system_seconds"], 3),
+                # 内核只记录进程生命周期内所有子进程的最大值
+                "max_rss_mb": children_after["max_rss_mb"],
+            }
+
+        with open(self.output_dir / "summary.json", 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        logger.info(f"剖析结果已写入: {self.output_dir}")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+请求限速模块
+令牌桶限速器，控制并发任务向API发起请求的速率
+"""
+import time
+import threading
+from typing import Optional
+
+
+class RateLimiter:
+    """令牌桶限速器（线程安全）"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        """
+        初始化限速器
+
+        Args:
+            rate: 每秒允许的请求数，<= 0 表示不限速
+            burst: 令牌桶容量（允许的突发请求数），默认等于 max(1, rate)
+        """
+        self.rate = rate
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        获取令牌，不足时阻塞等待
+
+        Args:
+            tokens: 需要的令牌数
+
+        Returns:
+            float: 实际等待的时间（秒）
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+
+                wait_time = (tokens - self._tokens) / self.rate
+
+            time.sleep(wait_time)
+            waited += wait_time
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Token估算模块
+按字符类别的字符/Token比例在本地估算提示词大小（适配中英文混合文本），
+并根据接口返回的真实用量持续校准；发送前据此检查并裁剪消息历史
+"""
+import re
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+# 各类字符每个字符对应的Token数（GLM系列分词器的经验值）
+CJK_TOKENS_PER_CHAR = 0.7      # 中日韩文字及全角标点
+WORD_TOKENS_PER_CHAR = 0.25    # 英文字母（约4个字符1个Token）
+DIGIT_TOKENS_PER_CHAR = 0.5    # 数字
+SYMBOL_TOKENS_PER_CHAR = 1.0   # 其他符号
+MESSAGE_OVERHEAD_TOKENS = 4    # 每条消息的角色/分隔符开销
+
+# 校准参数：只用足够长的提示词校准，校准系数限制在合理范围内
+MIN_CALIBRATION_TOKENS = 50
+MIN_SCALE = 0.5
+MAX_SCALE = 2.0
+
+# 各模型的上下文长度（Token），未列出的模型使用默认值
+MODEL_CONTEXT_LIMITS = {
+    "glm-4": 128000,
+    "glm-4.5v": 64000,
+    "glm-4.6v": 128000,
+}
+DEFAULT_CONTEXT_LIMIT = 32000
+
+# 未指定 max_tokens 时为回答预留的Token数
+DEFAULT_RESPONSE_TOKENS = 2000
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]')
+_WORD_PATTERN = re.compile(r'[A-Za-z]')
+_DIGIT_PATTERN = re.compile(r'[0-9]')
+_SPACE_PATTERN = re.compile(r'\s')
+
+
+def content_text(content: Any) -> str:
+    """
+    提取消息内容中的文本（多模态内容只保留文本部分，多段文本按行拼接）
+
+    Args:
+        content: 消息的 content 字段（字符串或多模态内容列表）
+
+    Returns:
+        str: 文本内容
+    """
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(
+            part.get("text", "") for part in content
+            if isinstance(part, dict) and part.get("text")
+        )
+    return str(content)
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    """提取消息中的文本内容（多模态内容只计入文本部分）"""
+    return content_text(message.get("content", ""))
+
+
+class TokenEstimator:
+    """字符比例Token估算器（线程安全，可用真实用量校准）"""
+
+    def __init__(self, smoothing: float = 0.2):
+        """
+        初始化Token估算器
+
+        Args:
+            smoothing: 校准系数的指数平滑权重（0-1，越大越偏向最近的观测）
+        """
+        self.smoothing = smoothing
+        self.scale = 1.0
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def raw_estimate(self, text: str) -> float:
+        """
+        未经校准的Token估算
+
+        Args:
+            text: 文本
+
+        Returns:
+            float: 估算Token数
+        """
+        cjk = len(_CJK_PATTERN.findall(text))
+        words = len(_WORD_PATTERN.findall(text))
+        digits = len(_DIGIT_PATTERN.findall(text))
+        spaces = len(_SPACE_PATTERN.findall(text))
+        symbols = len(text) - cjk - words - digits - spaces
+
+        return (
+            cjk * CJK_TOKENS_PER_CHAR
+            + words * WORD_TOKENS_PER_CHAR
+            + digits * DIGIT_TOKENS_PER_CHAR
+            + symbols * SYMBOL_TOKENS_PER_CHAR
+        )
+
+    def estimate(self, text: str) -> int:
+        """
+        估算文本Token数
+
+        Args:
+            text: 文本
+
+        Returns:
+            int: 估算Token数
+        """
+        if not text:
+            return 0
+        return max(1, round(self.raw_estimate(text) * self.scale))
+
+    def estimate_messages(self, messages: List[Dict[str, Any]]) -> int:
+        """
+        估算消息列表的提示词Token数
+
+        Args:
+            messages: 消息列表（多模态内容只计入文本部分）
+
+        Returns:
+            int: 估算Token数
+        """
+        return sum(
+            MESSAGE_OVERHEAD_TOKENS + self.estimate(_message_text(message))
+            for message in messages
+        )
+
+    def observe(self, messages: List[Dict[str, Any]], prompt_tokens: Optional[int]) -> None:
+        """
+        用接口返回的真实提示词用量校准估算比例
+
+        Args:
+            messages: 已发送的消息列表
+            prompt_tokens: 接口返回的 usage.prompt_tokens
+        """
+        if not prompt_tokens:
+            return
+
+        raw = sum(
+            MESSAGE_OVERHEAD_TOKENS + self.raw_estimate(_message_text(message))
+            for message in messages
+        )
+        # 过短的提示词中固定开销占比过大，不用于校准
+        if raw < MIN_CALIBRATION_TOKENS:
+            return
+
+        ratio = min(MAX_SCALE, max(MIN_SCALE, prompt_tokens / raw))
+        with self._lock:
+            self.scale = self.scale * (1 - self.smoothing) + ratio * self.smoothing
+            self.samples += 1
+
+
+def context_limit(model: str) -> int:
+    """
+    获取模型的上下文长度
+
+    Args:
+        model: 模型名称
+
+    Returns:
+        int: 上下文Token数
+    """
+    return MODEL_CONTEXT_LIMITS.get(model.lower(), DEFAULT_CONTEXT_LIMIT)
+
+
+def fit_messages(
+    messages: List[Dict[str, Any]],
+    model: str,
+    max_tokens: Optional[int] = None,
+    estimator: Optional[TokenEstimator] = None
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    裁剪消息历史，使提示词 + 回答预留不超过模型上下文长度
+
+    system 消息和最后一条消息始终保留，从最早的历史消息开始丢弃
+
+    Args:
+        messages: 消息列表
+        model: 模型名称
+        max_tokens: 回答的最大Token数，默认预留 DEFAULT_RESPONSE_TOKENS
+        estimator: Token估算器，默认使用全局实例
+
+    Returns:
+        Tuple[List[Dict], int, int]: (裁剪后的消息, 估算提示词Token数, 丢弃的消息数)
+
+    Raises:
+        ValueError: 必须保留的消息本身已超出上下文长度
+    """
+    estimator = estimator or get_token_estimator()
+    budget = context_limit(model) - (max_tokens or DEFAULT_RESPONSE_TOKENS)
+
+    costs = [MESSAGE_OVERHEAD_TOKENS + estimator.estimate(_message_text(m)) for m in messages]
+    total = sum(costs)
+    keep = [True] * len(messages)
+
+    for index, message in enumerate(messages[:-1]):
+        if total <= budget:
+            break
+        if message.get("role") == "system":
+            continue
+        keep[index] = False
+        total -= costs[index]
+
+    if total > budget:
+        raise ValueError(
+            f"提示词约 {total} Token，超出模型 {model} 的可用上下文 {budget} Token"
+            f"（上下文 {context_limit(model)}，回答预留 {max_tokens or DEFAULT_RESPONSE_TOKENS}）"
+        )
+
+    fitted = [message for message, kept in zip(messages, keep) if kept]
+    return fitted, total, len(messages) - len(fitted)
+
+
+# 全局Token估算器实例
+_global_token_estimator = None
+
+
+def get_token_estimator() -> TokenEstimator:
+    """
+    获取全局Token估算器实例（单例模式）
+
+    Returns:
+        TokenEstimator: Token估算器实例
+    """
+    global _global_token_estimator
+    if _global_token_estimator is None:
+        _global_token_estimator = TokenEstimator()
+    return _global_token_estimator
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    使用全局估算器估算文本Token数
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算Token数
+    """
+    return get_token_estimator().estimate(text)
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+URL预检模块
+在把视频URL交给模型之前，通过连接池复用的长连接发起 HEAD 请求和小范围 Range GET，
+获取内容类型、文件大小以及 MP4 文件头中的时长/码率；失效链接（无法连接、404/410、持续 5xx）
+或网页地址在毫秒级即可判定，预检结果按 ETag/TTL 缓存。签名URL和防盗链的CDN常拒绝预检请求，
+鉴权/限流类状态（401/403/405/429）只视为无法确认（大小未知），不据此判定URL失效
+"""
+import http.client
+import logging
+import socket
+import ssl
+import struct
+import threading
+import time
+from collections import defaultdict
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urlsplit, urljoin
+
+logger = logging.getLogger(__name__)
+
+# 请求超时（秒）
+DEFAULT_PROBE_TIMEOUT = 5.0
+
+# 预检结果缓存时间（秒），过期后携带 If-None-Match 重新验证
+DEFAULT_PROBE_TTL = 300.0
+
+# 每个主机保留的空闲连接数
+MAX_IDLE_PER_HOST = 4
+
+# 单次 Range 请求读取的字节数，以及查找 moov 时最多发起的 Range 请求数
+RANGE_PROBE_BYTES = 64 * 1024
+MAX_RANGE_REQUESTS = 3
+
+# 最多跟随的重定向次数
+MAX_REDIRECTS = 5
+
+# 鉴权、防盗链和限流类状态：服务端可能只拒绝预检请求而允许模型访问，无法据此判定URL失效
+INCONCLUSIVE_STATUSES = (401, 403, 405, 429)
+
+# 明确不是视频的内容类型
+NON_VIDEO_CONTENT_TYPES = ("text/", "application/json", "application/xml", "application/xhtml")
+
+# MP4/MOV 系列容器（可以解析文件头）
+MP4_CONTENT_TYPES = ("video/mp4", "video/quicktime", "video/x-m4v", "application/mp4")
+
+_USER_AGENT = "zai-plus-skill-preflight/1.0"
+_BOX_HEADER = struct.Struct(">I4s")
+
+
+class ConnectionPool:
+    """HTTP长连接池（按 scheme/host/port 复用空闲连接，线程安全）"""
+
+    def __init__(self, timeout: float = DEFAULT_PROBE_TIMEOUT, max_idle_per_host: int = MAX_IDLE_PER_HOST):
+        """
+        初始化连接池
+
+        Args:
+            timeout: 连接和读取超时（秒）
+            max_idle_per_host: 每个主机保留的空闲连接数
+        """
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context()
+
+    def _new_connection(self, key: Tuple[str, str, int]) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self._ssl_context)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        max_body: Optional[int] = None
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        发起请求（复用空闲连接，连接已被服务端关闭时自动重连一次）
+
+        Args:
+            method: HTTP方法
+            url: 请求地址
+            headers: 请求头
+            max_body: 最多读取的响应体字节数（默认读完）；响应体未读完时关闭连接而不放回连接池
+
+        Returns:
+            Tuple[int, Dict, bytes]: (状态码, 响应头（小写键）, 响应体)
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname or "", port)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+        request_headers = {"User-Agent": _USER_AGENT, "Accept": "*/*"}
+        request_headers.update(headers or {})
+
+        for attempt in range(2):
+            with self._lock:
+                idle = self._idle[key]
+                conn = idle.pop() if idle else None
+            reused = conn is not None
+            conn = conn or self._new_connection(key)
+
+            try:
+                conn.request(method, path, headers=request_headers)
+                response = conn.getresponse()
+                body = response.read(max_body) if max_body is not None else response.read()
+                response_headers = {name.lower(): value for name, value in response.getheaders()}
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                # 空闲连接可能已被服务端关闭，换新连接重试一次
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+            # 响应体已读完且服务端允许保持连接时放回连接池
+            if response.isclosed() and not response.will_close:
+                with self._lock:
+                    if len(self._idle[key]) < self.max_idle_per_host:
+                        self._idle[key].append(conn)
+                        conn = None
+            if conn is not None:
+                conn.close()
+
+            return response.status, response_headers, body
+
+        raise ConnectionError(f"请求失败: {url}")
+
+    def close(self) -> None:
+        """关闭全部空闲连接"""
+        with self._lock:
+            for connections in self._idle.values():
+                for conn in connections:
+                    conn.close()
+            self._idle.clear()
+
+
+def _iter_boxes(data: bytes, start: int, end: int) -> List[Tuple[bytes, int, int, int]]:
+    """
+    解析 [start, end) 范围内的 MP4 box 头
+
+    Args:
+        data: 数据
+        start: 起始位置
+        end: 结束位置
+
+    Returns:
+        List[Tuple]: (类型, 起始位置, box大小（0表示延伸到文件末尾）, 头部长度)；
+            最后一个 box 可能只有部分数据在 data 中
+    """
+    boxes = []
+    offset = start
+    while offset + _BOX_HEADER.size <= end:
+        size, box_type = _BOX_HEADER.unpack_from(data, offset)
+        header = _BOX_HEADER.size
+        if size == 1:
+            if offset + 16 > end:
+                break
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size != 0 and size < header:
+            break
+
+        boxes.append((box_type, offset, size, header))
+        if size == 0:
+            break
+        offset += size
+    return boxes
+
+
+def parse_mvhd(payload: bytes) -> Optional[float]:
+    """
+    从 mvhd box 内容中解析时长
+
+    Args:
+        payload: mvhd box 内容（不含头部）
+
+    Returns:
+        Optional[float]: 时长（秒），数据不足时返回None
+    """
+    if len(payload) < 1:
+        return None
+
+    if payload[0] == 1:
+        if len(payload) < 32:
+            return None
+        timescale, duration = struct.unpack_from(">IQ", payload, 20)
+    else:
+        if len(payload) < 20:
+            return None
+        timescale, duration = struct.unpack_from(">II", payload, 12)
+
+    return round(duration / timescale, 3) if timescale else None
+
+
+class UrlProbe:
+    """视频URL预检器 - HEAD + Range GET，结果按 ETag/TTL 缓存"""
+
+    def __init__(
+        self,
+        timeout: float = DEFAULT_PROBE_TIMEOUT,
+        ttl: float = DEFAULT_PROBE_TTL,
+        pool: Optional[ConnectionPool] = None
+    ):
+        """
+        初始化URL预检器
+
+        Args:
+            timeout: 请求超时（秒）
+            ttl: 预检结果缓存时间（秒）
+            pool: 连接池，默认新建
+        """
+        self.ttl = ttl
+        self.pool = pool or ConnectionPool(timeout)
+        self._cache: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._lock = threading.Lock()
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        max_body: Optional[int] = None
+    ) -> Tuple[int, Dict[str, str], bytes, str]:
+        """发起请求并跟随重定向，返回 (状态码, 响应头, 响应体, 最终URL)"""
+        for _ in range(MAX_REDIRECTS + 1):
+            status, response_headers, body = self.pool.request(method, url, headers, max_body)
+            if status in (301, 302, 303, 307, 308) and response_headers.get("location"):
+                url = urljoin(url, response_headers["location"])
+                continue
+            return status, response_headers, body, url
+        raise ConnectionError(f"重定向次数过多: {url}")
+
+    def probe(self, url: str) -> Dict[str, Any]:
+        """
+        预检视频URL（命中未过期缓存时直接返回）
+
+        Args:
+            url: 视频URL
+
+        Returns:
+            Dict: 预检结果，主要字段：
+                ok: 是否可以交给模型处理（无法连接、HEAD 和 Range GET 都返回 404/410/5xx
+                    或返回非视频内容时为 False；预检超时或返回鉴权/限流类状态时无法确认，ok 为 True）
+                reachable: 是否收到HTTP响应
+                inconclusive: 是否未能确认（大小未知，仍按URL方式处理）
+                status / content_type / content_length / size_mb
+                duration_seconds / bitrate_kbps: MP4 文件头解析结果（可能为None）
+                etag / final_url / error / elapsed_ms / cached
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(url)
+
+        if cached and cached[1] > now:
+            return dict(cached[0], cached=True)
+
+        started = time.monotonic()
+        if cached and cached[0].get("etag"):
+            result = self._revalidate(url, cached[0])
+        else:
+            result = self._probe(url)
+        result["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+        result["cached"] = False
+
+        # 只缓存确定的结果，连接失败、超时、5xx 和未能确认的预检下次重新执行
+        if result["reachable"] and not result["inconclusive"] and (result["status"] or 0) < 500:
+            with self._lock:
+                self._cache[url] = (result, time.monotonic() + self.ttl)
+
+        return result
+
+    def _revalidate(self, url: str, previous: Dict[str, Any]) -> Dict[str, Any]:
+        """缓存过期后携带 ETag 重新验证，未变化时沿用旧结果"""
+        try:
+            status, _, _, _ = self._request("HEAD", url, {"If-None-Match": previous["etag"]})
+        except (OSError, http.client.HTTPException):
+            return self._probe(url)
+
+        if status == 304:
+            return dict(previous)
+        return self._probe(url)
+
+    def _probe(self, url: str) -> Dict[str, Any]:
+        """执行预检请求"""
+        result: Dict[str, Any] = {
+            "url": url,
+            "ok": False,
+            "reachable": False,
+            "inconclusive": False,
+            "status": None,
+            "content_type": None,
+            "content_length": None,
+            "size_mb": None,
+            "duration_seconds": None,
+            "bitrate_kbps": None,
+            "etag": None,
+            "final_url": url,
+            "error": None,
+        }
+
+        try:
+            status, headers, _, final_url = self._request("HEAD", url)
+            # 部分服务器不支持 HEAD，HEAD 返回错误状态时改用 Range GET 获取同样的信息并确认错误
+            if status >= 400:
+                status, headers, _, final_url = self._request(
+                    "GET", url, {"Range": "bytes=0-0"}, max_body=1
+                )
+        except socket.timeout:
+            result["ok"] = True
+            result["inconclusive"] = True
+            result["error"] = "预检超时，跳过检查"
+            return result
+        except (OSError, http.client.HTTPException) as e:
+            result["error"] = f"无法连接: {e}"
+            return result
+
+        result["reachable"] = True
+        result["status"] = status
+        result["final_url"] = final_url
+        result["etag"] = headers.get("etag")
+        content_type = (headers.get("content-type") or "").split(";")[0].strip().lower()
+        result["content_type"] = content_type or None
+
+        if status in INCONCLUSIVE_STATUSES:
+            result["ok"] = True
+            result["inconclusive"] = True
+            result["error"] = f"预检未能确认URL (HTTP {status})，按大小未知处理"
+            return result
+
+        # HEAD 和 Range GET 都返回的 404/410、5xx 等错误状态视为链接失效
+        if status >= 400:
+            result["error"] = f"URL不可访问: HTTP {status}"
+            return result
+
+        if content_type.startswith(NON_VIDEO_CONTENT_TYPES):
+            result["error"] = f"URL返回的不是视频（Content-Type: {content_type}）"
+            return result
+
+        # Range GET 的响应中，文件总大小在 Content-Range 的 "/" 之后
+        if status == 206:
+            length = headers.get("content-range", "").rsplit("/", 1)[-1]
+        else:
+            length = headers.get("content-length", "")
+        if length.isdigit():
+            result["content_length"] = int(length)
+
+        if result["content_length"] is not None:
+            result["size_mb"] = round(result["content_length"] / (1024 * 1024), 2)
+
+        result["ok"] = True
+
+        if content_type in MP4_CONTENT_TYPES or url.lower().split("?")[0].endswith((".mp4", ".mov", ".m4v")):
+            try:
+                result["duration_seconds"] = self._mp4_duration(final_url, result["content_length"])
+            except (OSError, http.client.HTTPException, struct.error) as e:
+                logger.debug(f"解析MP4文件头失败: {e}")
+
+            if result["duration_seconds"] and result["content_length"]:
+                result["bitrate_kbps"] = round(
+                    result["content_length"] * 8 / result["duration_seconds"] / 1000, 1
+                )
+
+        return result
+
+    def _mp4_duration(self, url: str, total_length: Optional[int]) -> Optional[float]:
+        """
+        通过 Range GET 读取 MP4 文件头，查找 moov/mvhd 获取时长（moov 在文件末尾时跳过 mdat）
+
+        Args:
+            url: 视频URL
+            total_length: 文件总大小（未知时不跳读）
+
+        Returns:
+            Optional[float]: 时长（秒）
+        """
+        offset = 0
+        for _ in range(MAX_RANGE_REQUESTS):
+            status, _, data, _ = self._request(
+                "GET", url, {"Range": f"bytes={offset}-{offset + RANGE_PROBE_BYTES - 1}"},
+                max_body=RANGE_PROBE_BYTES
+            )
+            # 服务器忽略 Range 时只能解析开头部分
+            if status == 200 and offset > 0:
+                return None
+            if status not in (200, 206) or not data:
+                return None
+
+            next_offset = None
+            for box_type, start, size, header in _iter_boxes(data, 0, len(data)):
+                if box_type == b"moov":
+                    payload_start = start + header
+                    for child, child_start, _, child_header in _iter_boxes(data, payload_start, len(data)):
+                        if child == b"mvhd":
+                            return parse_mvhd(data[child_start + child_header:])
+                    # mvhd 不在已读取的数据中，从 moov 位置重新读取
+                    next_offset = offset + start if start > 0 else None
+                    break
+                if size == 0:
+                    return None
+                next_offset = offset + start + size
+
+            if next_offset is None or next_offset <= offset:
+                return None
+            if total_length is not None and next_offset >= total_length:
+                return None
+            offset = next_offset
+
+        return None
+
+    def clear_cache(self) -> None:
+        """清空预检缓存"""
+        with self._lock:
+            self._cache.clear()
+
+
+# 全局URL预检器实例
+_global_url_probe = None
+
+
+def get_url_probe() -> UrlProbe:
+    """
+    获取全局URL预检器实例（单例模式，共享连接池和缓存）
+
+    Returns:
+        UrlProbe: URL预检器实例
+    """
+    global _global_url_probe
+    if _global_url_probe is None:
+        _global_url_probe = UrlProbe()
+    return _global_url_probe
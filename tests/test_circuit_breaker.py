@@ -0,0 +1,109 @@
+"""熔断器状态转换测试"""
+import pytest
+
+from src.core import circuit_breaker
+from src.core.circuit_breaker import CircuitBreaker, CircuitState, is_service_failure
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动拨动的单调时钟"""
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_breaker(**options):
+    options = {"window_size": 10, "min_calls": 4, "open_duration": 30.0, **options}
+    return CircuitBreaker("glm-4.5v", **options)
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure(1.0)
+
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.allow_request()
+
+
+def test_opens_on_failure_rate_and_rejects(clock):
+    breaker = make_breaker()
+    breaker.record_success(1.0)
+    breaker.record_success(1.0)
+    breaker.record_failure(1.0)
+    assert breaker.state == CircuitState.CLOSED
+
+    breaker.record_failure(1.0)
+
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow_request()
+
+
+def test_opens_on_slow_call_rate(clock):
+    breaker = make_breaker(slow_call_duration=10.0, slow_call_rate_threshold=0.75)
+    breaker.record_success(1.0)
+    for _ in range(3):
+        breaker.record_success(20.0)
+
+    assert breaker.state == CircuitState.OPEN
+
+
+def test_half_open_probe_success_closes(clock):
+    breaker = make_breaker(half_open_max_calls=1)
+    for _ in range(4):
+        breaker.record_failure(1.0)
+
+    clock[0] += 30.0
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success(1.0)
+
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.snapshot()["calls"] == 0
+
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure(1.0)
+    clock[0] += 30.0
+    assert breaker.allow_request()
+
+    breaker.record_failure(1.0)
+
+    assert breaker.state == CircuitState.OPEN
+    clock[0] += 29.0
+    assert not breaker.allow_request()
+
+
+def test_client_errors_do_not_trip_and_release_probe(clock):
+    breaker = make_breaker()
+    for _ in range(10):
+        breaker.record_result({"error": "Request failed with status code 400"}, 1.0)
+    assert breaker.state == CircuitState.CLOSED
+
+    for _ in range(4):
+        breaker.record_result({"error": "HTTP 503"}, 1.0)
+    clock[0] += 30.0
+    assert breaker.allow_request()
+    breaker.record_result({"error": "无效的视频文件"}, 1.0)
+
+    # 客户端错误只释放探测名额，不改变半开状态
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.allow_request()
+
+
+@pytest.mark.parametrize("response, expected", [
+    ({"error": "timeout", "timeout": True}, True),
+    ({"error": "Request failed with status code 503"}, True),
+    ({"error": "HTTP 429"}, True),
+    ({"error": "x", "status": 502}, True),
+    ({"error": "read ECONNRESET"}, True),
+    ({"error": "Request failed with status code 413"}, False),
+    ({"error": "视频文件不存在"}, False),
+])
+def test_is_service_failure(response, expected):
+    assert is_service_failure(response) is expected
@@ -0,0 +1,88 @@
+"""回退策略测试：回退图、策略预算与总截止时间"""
+import json
+import time
+
+import pytest
+
+from src.analyzers.smart_analyzer import SmartVideoAnalyzer
+from src.core.fallback import FallbackPolicy
+from src.core.router import ProcessStrategy
+from src.utils.config_manager import ConfigManager
+
+ORDER = ["url_direct", "base64_small", "base64_large", "upload"]
+
+
+def config_with(tmp_path, **preferences):
+    config = ConfigManager(tmp_path)
+    (tmp_path / "mcp_config.json").write_text(json.dumps({"env": {"Z_AI_API_KEY": "test-key"}}), encoding="utf-8")
+    if preferences:
+        (tmp_path / "user_preferences.json").write_text(json.dumps(preferences), encoding="utf-8")
+    return config
+
+
+def test_default_graph_from_preferences(tmp_path):
+    policy = FallbackPolicy.from_config(config_with(tmp_path))
+
+    assert policy.describe()["graph"] == {
+        "url_direct": [],
+        "base64_small": [],
+        "base64_large": ["base64_small"],
+        "upload": ["base64_large"],
+    }
+    assert policy.deadline == 3600.0
+    assert policy.adaptive is not None
+
+
+def test_graph_derived_from_order_when_unset(tmp_path):
+    policy = FallbackPolicy.from_config(config_with(tmp_path, fallback_graph=None))
+
+    assert policy.next_strategies("url_direct") == [
+        ProcessStrategy.BASE64_SMALL, ProcessStrategy.BASE64_LARGE, ProcessStrategy.UPLOAD
+    ]
+    assert policy.next_strategies(ProcessStrategy.UPLOAD) == []
+
+
+def test_graph_targets_follow_order_and_skip_unknown():
+    policy = FallbackPolicy(
+        strategy_order=ORDER,
+        graph={"upload": ["base64_large", "bogus", "url_direct", "base64_large"], "bogus": ["upload"]},
+    )
+
+    assert policy.next_strategies("upload") == [ProcessStrategy.URL_DIRECT, ProcessStrategy.BASE64_LARGE]
+    assert policy.next_strategies("base64_small") == []
+    assert set(policy.graph) == {ProcessStrategy.UPLOAD}
+
+
+def test_policies_merge_with_defaults():
+    policy = FallbackPolicy(policies={"upload": {"attempts": 3}, "base64_small": {"timeout": 60}})
+
+    assert policy.attempts("upload") == 3
+    assert policy.timeout("upload") == 1800.0
+    assert policy.timeout(ProcessStrategy.BASE64_SMALL) == 60.0
+    assert policy.attempts("base64_small") == 1
+
+
+@pytest.mark.parametrize("deadline", [None, 0, -5])
+def test_no_deadline(deadline):
+    policy = FallbackPolicy(deadline=deadline)
+
+    assert policy.deadline is None
+    assert policy.deadline_at() is None
+    assert policy.attempt_timeout("upload", None) == 1800.0
+
+
+def test_attempt_timeout_is_clipped_by_deadline():
+    policy = FallbackPolicy(deadline=100.0)
+    deadline_at = policy.deadline_at(time.monotonic())
+
+    assert 99.0 < policy.attempt_timeout("upload", deadline_at) <= 100.0
+    assert policy.attempt_timeout("upload", time.monotonic() - 1) < 0
+
+
+def test_upload_falls_back_to_base64_only_within_size_limit(tmp_path):
+    analyzer = SmartVideoAnalyzer(config_with(tmp_path), verbose=False)
+    limit = analyzer.router.LARGE_FILE_THRESHOLD
+
+    assert analyzer._strategy_applicable(ProcessStrategy.BASE64_LARGE, "a.mp4", limit)
+    assert not analyzer._strategy_applicable(ProcessStrategy.BASE64_LARGE, "a.mp4", limit + 1)
+    assert not analyzer._strategy_applicable(ProcessStrategy.BASE64_SMALL, "https://example.com/a.mp4")
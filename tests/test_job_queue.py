@@ -0,0 +1,136 @@
+"""JobQueue 行为测试：原子领取、旧队列文件升级、短作业优先与等待抵扣"""
+import sqlite3
+import threading
+
+from src.core.job_queue import JobQueue, JobStatus, Lane, _MIGRATIONS
+
+
+def test_claim_marks_job_running_and_counts_attempt(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db")
+    queue.add_jobs([("a.mp4", "q")])
+
+    job = queue.claim()
+
+    assert job["input"] == "a.mp4"
+    assert job["status"] == JobStatus.RUNNING.value
+    assert job["attempts"] == 1
+    assert queue.claim() is None
+
+
+def test_add_jobs_ignores_duplicates(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db")
+
+    assert queue.add_jobs([("a.mp4", "q"), ("b.mp4", "q")]) == 2
+    assert queue.add_jobs([("a.mp4", "q"), ("c.mp4", "q")]) == 1
+
+
+def test_concurrent_claims_hand_out_each_job_once(tmp_path):
+    db_path = tmp_path / "jobs.db"
+    JobQueue(db_path).add_jobs([(f"{i}.mp4", "q") for i in range(40)])
+    claimed = []
+    lock = threading.Lock()
+
+    def worker():
+        # 每个线程使用独立的队列对象，模拟多个进程共享同一个队列文件
+        queue = JobQueue(db_path)
+        while True:
+            job = queue.claim()
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["id"])
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == list(range(1, 41))
+
+
+def test_opening_old_queue_file_adds_missing_columns(tmp_path):
+    db_path = tmp_path / "jobs.db"
+    conn = sqlite3.connect(str(db_path))
+    conn.execute(
+        "CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, digest TEXT NOT NULL UNIQUE, "
+        "input TEXT NOT NULL, question TEXT NOT NULL, status TEXT NOT NULL, strategy TEXT, "
+        "attempts INTEGER NOT NULL DEFAULT 0, result_path TEXT, error TEXT, prompt_tokens INTEGER, "
+        "completion_tokens INTEGER, total_tokens INTEGER, worker TEXT, "
+        "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO jobs (digest, input, question, status, created_at, updated_at) "
+        "VALUES ('d', 'old.mp4', 'q', 'pending', 0, 0)"
+    )
+    conn.commit()
+    conn.close()
+
+    queue = JobQueue(db_path)
+    # 再次打开已升级的文件不应重复执行迁移
+    JobQueue(db_path)
+
+    conn = sqlite3.connect(str(db_path))
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+    conn.close()
+    assert set(_MIGRATIONS) <= columns
+
+    job = queue.claim(shortest_first=True)
+    assert job["input"] == "old.mp4"
+    assert job["cost"] is None and job["lane"] is None
+
+
+def _priced_queue(tmp_path, costs):
+    """按 costs（输入 → (预测耗时, 通道)）创建已预测耗时的队列"""
+    queue = JobQueue(tmp_path / "jobs.db")
+    queue.add_jobs([(name, "q") for name in costs])
+    ids = {job["input"]: job["id"] for job in queue.unpriced_jobs()}
+    queue.set_costs([(ids[name], cost, lane) for name, (cost, lane) in costs.items()])
+    return queue
+
+
+def test_shortest_first_claims_cheapest_job(tmp_path):
+    queue = _priced_queue(tmp_path, {
+        "long.mp4": (300.0, Lane.LARGE),
+        "short.mp4": (10.0, Lane.SMALL),
+        "medium.mp4": (60.0, Lane.SMALL),
+    })
+
+    order = [queue.claim(shortest_first=True)["input"] for _ in range(3)]
+
+    assert order == ["short.mp4", "medium.mp4", "long.mp4"]
+    assert queue.unpriced_jobs() == []
+
+
+def test_unpriced_jobs_are_claimed_first(tmp_path):
+    queue = _priced_queue(tmp_path, {"short.mp4": (1.0, Lane.SMALL)})
+    queue.add_jobs([("new.mp4", "q")])
+
+    assert queue.claim(shortest_first=True)["input"] == "new.mp4"
+
+
+def test_aging_lets_long_waiting_job_overtake(tmp_path):
+    queue = _priced_queue(tmp_path, {
+        "long.mp4": (300.0, Lane.LARGE),
+        "short.mp4": (10.0, Lane.SMALL),
+    })
+    # long.mp4 已等待 1000 秒：按 0.5 的抵扣率，有效耗时 300 - 500 < 10
+    conn = sqlite3.connect(str(queue.db_path))
+    conn.execute("UPDATE jobs SET created_at = created_at - 1000 WHERE input = 'long.mp4'")
+    conn.commit()
+    conn.close()
+
+    assert queue.claim(shortest_first=True, aging_rate=0.0)["input"] == "short.mp4"
+    queue.requeue_unfinished()
+    assert queue.claim(shortest_first=True, aging_rate=0.5)["input"] == "long.mp4"
+
+
+def test_claim_respects_lane(tmp_path):
+    queue = _priced_queue(tmp_path, {
+        "long.mp4": (300.0, Lane.LARGE),
+        "short.mp4": (10.0, Lane.SMALL),
+    })
+
+    assert queue.claim(shortest_first=True, lane=Lane.LARGE)["input"] == "long.mp4"
+    assert queue.claim(shortest_first=True, lane=Lane.LARGE) is None
+    assert queue.claim(shortest_first=True, lane=Lane.SMALL)["input"] == "short.mp4"
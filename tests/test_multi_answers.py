@@ -0,0 +1,58 @@
+"""多问题、多图回答拆分测试"""
+from src.analyzers.image_batch_analyzer import IMAGE_MARKER_PATTERN, build_multi_image_prompt
+from src.analyzers.smart_analyzer import build_multi_question_prompt, split_multi_answers
+
+
+def test_prompt_numbers_each_question():
+    prompt = build_multi_question_prompt(["场景是什么？", " 有几个人？ "])
+
+    assert "[Q1] 场景是什么？" in prompt
+    assert "[Q2] 有几个人？" in prompt
+
+
+def test_split_by_markers():
+    content = "[Q1] 室内厨房\n有灯光\n[Q2] 两个人"
+
+    assert split_multi_answers(content, 2) == ["室内厨房\n有灯光", "两个人"]
+
+
+def test_markdown_headings_and_out_of_order_markers():
+    content = "## [Q2]\n两个人\n\n## [Q1]\n室内厨房"
+
+    assert split_multi_answers(content, 2) == ["室内厨房", "两个人"]
+
+
+def test_missing_answer_is_none():
+    assert split_multi_answers("[Q1] 室内\n[Q3] 白天", 3) == ["室内", None, "白天"]
+
+
+def test_first_marker_wins_and_unknown_numbers_are_ignored():
+    content = "[Q1] 第一次\n[Q1] 重复\n[Q9] 多余"
+
+    assert split_multi_answers(content, 2) == ["第一次", None]
+
+
+def test_inline_marker_is_not_a_boundary():
+    content = "[Q1] 参见 [Q2] 的回答\n[Q2] 两个人"
+
+    assert split_multi_answers(content, 2) == ["参见 [Q2] 的回答", "两个人"]
+
+
+def test_without_markers_whole_answer_goes_to_first_question():
+    assert split_multi_answers("  一段完整的回答  ", 2) == ["一段完整的回答", None]
+    assert split_multi_answers("", 2) == [None, None]
+    assert split_multi_answers(None, 1) == [None]
+
+
+def test_split_image_answers():
+    content = "[IMG1] 一只猫\n### [IMG2] 一条狗\n[Q1] 不是图像标记"
+
+    answers = split_multi_answers(content, 3, IMAGE_MARKER_PATTERN)
+
+    assert answers == ["一只猫", "一条狗\n[Q1] 不是图像标记", None]
+
+
+def test_image_prompt_asks_for_image_markers():
+    prompt = build_multi_image_prompt("图中有什么？", 3)
+
+    assert "[IMG编号]" in prompt and "1 到 3" in prompt
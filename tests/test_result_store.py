@@ -0,0 +1,83 @@
+"""分段结果存储测试：跨分段读写、覆盖、遍历与摘要别名"""
+import pytest
+
+from src.core.result_store import ResultStore, project_result
+
+
+def result(text, reasoning="思考过程"):
+    return {
+        "id": "chatcmpl-1",
+        "choices": [{"message": {"content": text, "reasoning_content": reasoning}}],
+        "usage": {"total_tokens": 10},
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    # 分段上限 1 字节：每次写入都落在新的分段
+    return ResultStore(tmp_path / "results", compression="gzip", segment_max_bytes=1)
+
+
+def test_put_get_across_segments(store):
+    locations = [store.put(f"d{i}", result(f"回答{i}")) for i in range(3)]
+
+    assert len({segment for segment, _, _ in locations}) == 3
+    assert store.stats()["segments"] == 3
+    for i in range(3):
+        assert store.get(f"d{i}")["choices"][0]["message"]["content"] == f"回答{i}"
+    assert store.get("missing") is None
+    assert "d1" in store and "missing" not in store
+
+
+def test_default_projection_drops_reasoning_and_ids(store):
+    store.put("d", result("回答"))
+
+    stored = store.get("d")
+    assert "id" not in stored
+    assert "reasoning_content" not in stored["choices"][0]["message"]
+    assert stored["usage"] == {"total_tokens": 10}
+
+
+def test_overwrite_and_iter_results_in_write_order(store):
+    store.put("a", result("旧"))
+    store.put("b", result("b"))
+    store.put("a", result("新"))
+
+    items = [(digest, stored["choices"][0]["message"]["content"]) for digest, stored in store.iter_results()]
+
+    assert items == [("b", "b"), ("a", "新")]
+    assert store.stats()["results"] == 2
+
+
+def test_reopened_store_reads_existing_segments(tmp_path, store):
+    store.put("a", result("回答"))
+
+    reopened = ResultStore(store.directory, compression="gzip")
+    reopened.put("b", result("b"))
+
+    assert reopened.get("a")["choices"][0]["message"]["content"] == "回答"
+    assert [digest for digest, _ in reopened.iter_results()] == ["a", "b"]
+
+
+def test_link_points_alias_at_existing_result(store):
+    store.put("content-digest", result("回答"))
+
+    assert store.link("job-digest", "content-digest")
+    assert not store.link("other", "missing")
+    assert store.get("job-digest") == store.get("content-digest")
+    assert store.stats()["segments"] == 1
+    assert "other" not in store
+
+
+def test_project_result_keeps_original():
+    original = result("回答")
+
+    projected = project_result(original, ["choices.*.message.content", "usage.missing"])
+
+    assert "content" not in projected["choices"][0]["message"]
+    assert original["choices"][0]["message"]["content"] == "回答"
+
+
+def test_unknown_compression_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ResultStore(tmp_path, compression="lz4")
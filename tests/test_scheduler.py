@@ -0,0 +1,67 @@
+"""分析调度器测试：Token配额用尽时延后执行、排队截止时间"""
+import time
+
+import pytest
+
+from src.analyzers.scheduler import AnalysisScheduler
+
+
+def task(analyzer):
+    return {"ok": True, "usage": {"total_tokens": 100}}
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = AnalysisScheduler(
+        workers=2,
+        analyzer_factory=object,
+        tenants={"limited": {"token_quota": 100}},
+        interactive_reserved=0,
+        token_window=0.5
+    )
+    yield scheduler
+    scheduler.shutdown()
+
+
+def exhaust_quota(scheduler):
+    assert scheduler.submit_task(task, "limited").result(timeout=2)["ok"]
+
+
+def test_exhausted_tenant_is_deferred_until_window_frees(scheduler):
+    exhaust_quota(scheduler)
+    started = time.monotonic()
+
+    future = scheduler.submit_task(task, "limited")
+
+    assert future.result(timeout=3)["ok"]
+    assert time.monotonic() - started >= 0.3
+
+
+def test_other_tenants_run_while_one_is_deferred(scheduler):
+    exhaust_quota(scheduler)
+    deferred = scheduler.submit_task(task, "limited")
+
+    assert scheduler.submit_task(task, "other").result(timeout=0.3)["ok"]
+    assert not deferred.done()
+
+
+def test_deferred_task_fails_past_its_deadline(scheduler):
+    exhaust_quota(scheduler)
+
+    result = scheduler.submit_task(task, "limited", queue_timeout=0.1).result(timeout=1)
+
+    assert result["queue_timeout"] and result["quota_exceeded"]
+    assert "Token配额已用尽" in result["error"]
+
+
+def test_shutdown_fails_tasks_still_waiting_for_quota():
+    scheduler = AnalysisScheduler(
+        workers=1, analyzer_factory=object, tenants={"limited": {"token_quota": 100}},
+        interactive_reserved=0, token_window=60.0
+    )
+    exhaust_quota(scheduler)
+    future = scheduler.submit_task(task, "limited")
+
+    scheduler.shutdown()
+
+    assert future.result(timeout=1)["quota_exceeded"]
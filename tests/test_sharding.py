@@ -0,0 +1,47 @@
+"""分片测试：Rendezvous 哈希的稳定性与节点数变化时的迁移量"""
+import pytest
+
+from src.core.sharding import input_digest, parse_shard, select_shard, shard_of
+
+INPUTS = [f"video_{i}.mp4" for i in range(500)]
+
+
+@pytest.mark.parametrize("video_input, expected", [
+    ("a.mp4", [1, 1, 1]),
+    ("https://example.com/v.mp4", [1, 1, 1]),
+    ("D:/Video/sample.mp4", [0, 2, 6]),
+])
+def test_shard_assignment_is_pinned(video_input, expected):
+    # 分配结果跨进程、跨版本固定：改变哈希方式会让已跑过的分片重新分配
+    assert [shard_of(input_digest(video_input), total) for total in (2, 4, 8)] == expected
+
+
+def test_single_shard_takes_everything():
+    assert {shard_of(input_digest(item), 1) for item in INPUTS} == {0}
+
+
+def test_shards_partition_the_items():
+    items = [(item, "q") for item in INPUTS]
+    shards = [select_shard(items, index, 4) for index in range(4)]
+
+    assert sorted(item for shard in shards for item in shard) == sorted(items)
+    assert all(len(shard) > len(items) // 8 for shard in shards)
+
+
+def test_adding_a_node_only_moves_items_to_it():
+    before = {item: shard_of(input_digest(item), 4) for item in INPUTS}
+    after = {item: shard_of(input_digest(item), 5) for item in INPUTS}
+
+    moved = [item for item in INPUTS if before[item] != after[item]]
+    assert all(after[item] == 4 for item in moved)
+    assert len(moved) < len(INPUTS) * 0.35
+
+
+@pytest.mark.parametrize("spec", ["4/4", "-1/4", "0/0", "1", "a/b"])
+def test_parse_shard_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_shard(spec)
+
+
+def test_parse_shard():
+    assert parse_shard("2/8") == (2, 8)
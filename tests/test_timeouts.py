@@ -0,0 +1,60 @@
+"""自适应超时测试"""
+import pytest
+
+from src.core.router import ProcessStrategy
+from src.core.timeouts import AdaptiveTimeouts, MIN_TIMEOUT_SAMPLES, size_bucket
+from src.utils.latency import LatencyTracker
+
+
+@pytest.fixture
+def timeouts():
+    return AdaptiveTimeouts(latency=LatencyTracker(), margin=3.0, percentile=99, min_timeout=30.0)
+
+
+def record(timeouts, strategy, size_mb, seconds, count=MIN_TIMEOUT_SAMPLES):
+    for _ in range(count):
+        timeouts.record(strategy, size_mb, seconds)
+
+
+@pytest.mark.parametrize("size_mb, bucket", [
+    (None, "unknown"), (0.2, "<=1MB"), (1, "<=1MB"), (1.5, "<=2MB"), (4, "<=4MB"), (100, "<=128MB"),
+])
+def test_size_bucket(size_mb, bucket):
+    assert size_bucket(size_mb) == bucket
+
+
+def test_estimate_used_until_enough_samples(timeouts):
+    # base64_small 上限估算 30 + 3 秒/MB，乘以余量 2
+    assert timeouts.timeout(ProcessStrategy.BASE64_SMALL, 4, 300) == pytest.approx(84.0)
+
+    record(timeouts, ProcessStrategy.BASE64_SMALL, 4, 50.0, count=MIN_TIMEOUT_SAMPLES - 1)
+    assert timeouts.timeout(ProcessStrategy.BASE64_SMALL, 4, 300) == pytest.approx(84.0)
+
+    timeouts.record(ProcessStrategy.BASE64_SMALL, 4, 50.0)
+    assert timeouts.timeout(ProcessStrategy.BASE64_SMALL, 4, 300) == pytest.approx(150.0)
+
+
+def test_upload_estimate_includes_transfer_time(timeouts):
+    # (30 + 2 秒/MB × 20 + 20MB ÷ 10MB/秒) × 2
+    assert timeouts.timeout("upload", 20, 1800) == pytest.approx(144.0)
+
+
+def test_clamped_between_minimum_and_ceiling(timeouts):
+    record(timeouts, "url_direct", None, 1.0)
+    record(timeouts, "base64_large", 64, 200.0)
+
+    assert timeouts.timeout("url_direct", None, 300) == 30.0
+    assert timeouts.timeout("base64_large", 64, 300) == 300.0
+
+
+def test_unknown_size_without_samples_uses_ceiling(timeouts):
+    assert timeouts.timeout("url_direct", None, 300) == 300.0
+    assert timeouts.timeout("upload_recommend", 10, 120) == 120.0
+
+
+def test_samples_are_kept_per_strategy_and_bucket(timeouts):
+    record(timeouts, "base64_small", 1, 40.0)
+
+    assert timeouts.timeout("base64_small", 1, 300) == pytest.approx(120.0)
+    assert timeouts.timeout("base64_small", 3, 300) == pytest.approx(78.0)
+    assert timeouts.timeout("base64_large", 1, 300) == pytest.approx(110.0)
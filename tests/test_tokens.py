@@ -0,0 +1,97 @@
+"""Token估算与消息裁剪测试"""
+import pytest
+
+from src.utils.tokens import (
+    DEFAULT_CONTEXT_LIMIT,
+    MESSAGE_OVERHEAD_TOKENS,
+    TokenEstimator,
+    fit_messages,
+)
+
+# 400 个英文字母约 100 Token，加上消息开销
+TEXT = "a" * 400
+MESSAGE_TOKENS = 100 + MESSAGE_OVERHEAD_TOKENS
+
+
+def message(role, text=TEXT):
+    return {"role": role, "content": text}
+
+
+def budget_max_tokens(budget):
+    """返回使未知模型可用预算恰为 budget 的 max_tokens"""
+    return DEFAULT_CONTEXT_LIMIT - budget
+
+
+def test_estimate_mixed_text():
+    estimator = TokenEstimator()
+
+    assert estimator.estimate("") == 0
+    assert estimator.estimate("abcd") == 1
+    assert estimator.estimate("你好世界啊") == 4
+    assert estimator.estimate_messages([message("user")]) == MESSAGE_TOKENS
+
+
+def test_messages_within_budget_are_untouched():
+    messages = [message("system"), message("user"), message("assistant"), message("user")]
+
+    fitted, total, dropped = fit_messages(messages, "unknown", estimator=TokenEstimator())
+
+    assert fitted == messages
+    assert total == 4 * MESSAGE_TOKENS
+    assert dropped == 0
+
+
+def test_drops_oldest_history_but_keeps_system_and_last():
+    messages = [
+        message("system", "s" * 400),
+        message("user", "u" * 400),
+        message("assistant", "x" * 400),
+        message("user", "q" * 400),
+    ]
+
+    fitted, total, dropped = fit_messages(
+        messages, "unknown", max_tokens=budget_max_tokens(2 * MESSAGE_TOKENS + 10),
+        estimator=TokenEstimator()
+    )
+
+    assert fitted == [messages[0], messages[3]]
+    assert total == 2 * MESSAGE_TOKENS
+    assert dropped == 2
+
+
+def test_stops_dropping_once_within_budget():
+    messages = [message("user"), message("assistant"), message("user")]
+
+    fitted, _, dropped = fit_messages(
+        messages, "unknown", max_tokens=budget_max_tokens(2 * MESSAGE_TOKENS),
+        estimator=TokenEstimator()
+    )
+
+    assert fitted == messages[1:]
+    assert dropped == 1
+
+
+def test_multimodal_content_counts_text_only():
+    content = [
+        {"type": "video_url", "video_url": {"url": "data:video/mp4;base64," + "A" * 100000}},
+        {"type": "text", "text": TEXT},
+    ]
+
+    _, total, _ = fit_messages([{"role": "user", "content": content}], "glm-4.5v", estimator=TokenEstimator())
+
+    assert total == MESSAGE_TOKENS
+
+
+def test_required_messages_over_budget_raise():
+    messages = [message("system"), message("user")]
+
+    with pytest.raises(ValueError):
+        fit_messages(messages, "unknown", max_tokens=budget_max_tokens(MESSAGE_TOKENS), estimator=TokenEstimator())
+
+
+def test_calibration_scales_estimates():
+    estimator = TokenEstimator(smoothing=1.0)
+    estimator.observe([message("user")], prompt_tokens=2 * MESSAGE_TOKENS)
+
+    assert estimator.scale == pytest.approx(2.0)
+    assert estimator.estimate(TEXT) == 200
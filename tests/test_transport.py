@@ -0,0 +1,89 @@
+"""录制/回放传输测试：请求指纹稳定性与夹具回放"""
+import subprocess
+import uuid
+
+import pytest
+
+from src.core.transport import REDACTED, FixtureStore, ReplayBackend, normalize_request
+
+INLINE_IMAGE = "A" * 2048
+
+
+def write_script(directory, api_key, data=b"video-base64", inline=INLINE_IMAGE, question="描述视频"):
+    """按分析器生成脚本的方式写出一个引用临时数据文件的脚本"""
+    data_file = directory / f"temp_video_base64_{uuid.uuid4().hex[:12]}.txt"
+    data_file.write_bytes(data)
+    script = directory / f"temp_analysis_{uuid.uuid4().hex[:12]}.js"
+    script.write_text(
+        f'const client = new ZhipuAI({{ apiKey: "{api_key}" }});\n'
+        f'const video = fs.readFileSync(path.join(__dirname, "{data_file.name}"), "utf8");\n'
+        f'const image = "data:image/png;base64,{inline}";\n'
+        f'const question = "{question}";\n',
+        encoding="utf-8"
+    )
+    return script
+
+
+def test_fingerprint_ignores_api_key_and_temp_file_names(tmp_path):
+    request, key = normalize_request(write_script(tmp_path, "key-one"))
+    _, other_key = normalize_request(write_script(tmp_path, "key-two"))
+
+    assert key == other_key
+    assert "key-one" not in request and REDACTED in request
+    assert "temp_video_base64_" not in request
+    assert INLINE_IMAGE not in request and "<sha256:" in request
+
+
+@pytest.mark.parametrize("changes", [
+    {"data": b"other-video"},
+    {"inline": "B" * 2048},
+    {"question": "视频里有几个人"},
+])
+def test_fingerprint_changes_with_request_content(tmp_path, changes):
+    _, key = normalize_request(write_script(tmp_path, "key"))
+    _, other_key = normalize_request(write_script(tmp_path, "key", **changes))
+
+    assert key != other_key
+
+
+def test_missing_temp_file_keeps_its_name(tmp_path):
+    script = write_script(tmp_path, "key")
+    for data_file in tmp_path.glob("temp_video_base64_*.txt"):
+        data_file.unlink()
+
+    request, _ = normalize_request(script)
+
+    assert "temp_video_base64_" in request
+
+
+def test_replay_returns_recorded_responses_in_turn(tmp_path):
+    store = FixtureStore(tmp_path / "fixtures")
+    script = write_script(tmp_path, "key")
+    request, key = normalize_request(script)
+    store.record(key, request, {"returncode": 0, "stdout": "first", "stderr": "", "seconds": 5.0})
+    store.record(key, request, {"returncode": 0, "stdout": "second", "stderr": "", "seconds": 5.0})
+    backend = ReplayBackend(store, timing_scale=0)
+
+    # 换一个密钥、换一个临时文件名的同一请求也能命中夹具
+    outputs = [backend(write_script(tmp_path, "other-key"), 30.0).stdout for _ in range(3)]
+
+    assert outputs == ["first", "second", "first"]
+
+
+def test_replay_of_unknown_request_fails(tmp_path):
+    backend = ReplayBackend(FixtureStore(tmp_path / "fixtures"), timing_scale=0)
+
+    result = backend(write_script(tmp_path, "key"), 30.0)
+
+    assert result.returncode == 1
+    assert "回放夹具不存在" in result.stderr
+
+
+def test_replay_of_recorded_timeout_raises(tmp_path):
+    store = FixtureStore(tmp_path / "fixtures")
+    script = write_script(tmp_path, "key")
+    request, key = normalize_request(script)
+    store.record(key, request, {"timeout": True, "seconds": 30.0})
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        ReplayBackend(store, timing_scale=0)(script, 30.0)
@@ -0,0 +1,170 @@
+"""URL预检测试：用本地HTTP服务器模拟各类状态码"""
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.url_probe import UrlProbe
+
+
+def mp4_bytes(timescale=1000, duration=12500):
+    """构造带 moov/mvhd 的最小 MP4 文件头"""
+    def box(box_type, payload):
+        return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+    mvhd = box(b"mvhd", struct.pack(">IIIII", 0, 0, 0, timescale, duration) + b"\0" * 80)
+    return box(b"ftyp", b"isom\0\0\0\0") + box(b"moov", mvhd) + box(b"mdat", b"\0" * 1024)
+
+
+VIDEO = mp4_bytes()
+
+# 路径 → (HEAD 状态码, GET 状态码, 内容类型)
+ROUTES = {
+    "/video.mp4": (200, 200, "video/mp4"),
+    "/missing.mp4": (404, 404, "text/html"),
+    "/gone.mp4": (410, 410, "text/html"),
+    "/broken.mp4": (503, 503, "text/html"),
+    "/head-fails.mp4": (500, 200, "video/mp4"),
+    "/no-head.mp4": (405, 200, "video/mp4"),
+    "/signed.mp4": (403, 403, "text/html"),
+    "/throttled.mp4": (429, 429, "text/plain"),
+    "/page": (200, 200, "text/html; charset=utf-8"),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, method):
+        Handler.requests.append((method, self.path))
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/video.mp4")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        head_status, get_status, content_type = ROUTES.get(self.path, (404, 404, "text/html"))
+        status = head_status if method == "HEAD" else get_status
+        body = VIDEO if status == 200 else b"error"
+        headers = {"Content-Type": content_type, "ETag": '"v1"'}
+
+        byte_range = self.headers.get("Range")
+        if method == "GET" and status == 200 and byte_range:
+            start, end = (int(value) for value in byte_range.split("=")[1].split("-"))
+            end = min(end, len(body) - 1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+            body, status = body[start:end + 1], 206
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if method == "GET":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._respond("HEAD")
+
+    def do_GET(self):
+        self._respond("GET")
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def probe():
+    probe = UrlProbe(timeout=2.0)
+    Handler.requests.clear()
+    yield probe
+    probe.pool.close()
+
+
+def test_video_size_and_duration(probe, base_url):
+    result = probe.probe(f"{base_url}/video.mp4")
+
+    assert result["ok"] and not result["inconclusive"]
+    assert result["status"] == 200
+    assert result["content_length"] == len(VIDEO)
+    assert result["duration_seconds"] == 12.5
+    assert result["etag"] == '"v1"'
+
+
+@pytest.mark.parametrize("path, status", [
+    ("/missing.mp4", 404), ("/gone.mp4", 410), ("/broken.mp4", 503),
+])
+def test_dead_links_fail_fast_after_range_get(probe, base_url, path, status):
+    result = probe.probe(base_url + path)
+
+    assert not result["ok"]
+    assert not result["inconclusive"]
+    assert result["status"] == status
+    assert result["error"] == f"URL不可访问: HTTP {status}"
+    assert [method for method, _ in Handler.requests] == ["HEAD", "GET"]
+
+
+@pytest.mark.parametrize("path", ["/head-fails.mp4", "/no-head.mp4"])
+def test_range_get_recovers_from_failed_head(probe, base_url, path):
+    result = probe.probe(base_url + path)
+
+    assert result["ok"] and not result["inconclusive"]
+    assert result["status"] == 206
+    assert result["content_length"] == len(VIDEO)
+
+
+@pytest.mark.parametrize("path, status", [("/signed.mp4", 403), ("/throttled.mp4", 429)])
+def test_auth_and_rate_limit_are_inconclusive(probe, base_url, path, status):
+    result = probe.probe(base_url + path)
+
+    assert result["ok"] and result["inconclusive"]
+    assert result["status"] == status
+    assert result["size_mb"] is None
+
+
+def test_web_page_is_rejected(probe, base_url):
+    result = probe.probe(f"{base_url}/page")
+
+    assert not result["ok"]
+    assert result["content_type"] == "text/html"
+
+
+def test_redirect_is_followed(probe, base_url):
+    result = probe.probe(f"{base_url}/redirect")
+
+    assert result["ok"]
+    assert result["final_url"] == f"{base_url}/video.mp4"
+
+
+def test_conclusive_results_are_cached(probe, base_url):
+    assert not probe.probe(f"{base_url}/missing.mp4")["cached"]
+    assert probe.probe(f"{base_url}/missing.mp4")["cached"]
+    assert probe.probe(f"{base_url}/video.mp4")["cached"] is False
+    assert probe.probe(f"{base_url}/video.mp4")["cached"] is True
+
+
+@pytest.mark.parametrize("path", ["/broken.mp4", "/signed.mp4"])
+def test_server_errors_and_inconclusive_results_are_not_cached(probe, base_url, path):
+    probe.probe(base_url + path)
+
+    assert not probe.probe(base_url + path)["cached"]
+
+
+def test_connection_refused_is_a_failure(probe):
+    result = probe.probe("http://127.0.0.1:9/video.mp4")
+
+    assert not result["ok"] and not result["reachable"]
+    assert result["error"].startswith("无法连接")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+命令行启动耗时基准
+多次运行 zai_analyze.py 的轻量命令（默认 version），统计墙钟耗时；
+中位数超过阈值时返回非零退出码，可放入CI防止启动路径引入重型导入
+"""
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+CLI_PATH = Path(__file__).parent.parent / "scripts" / "zai_analyze.py"
+
+# version 命令的启动耗时上限（毫秒）
+DEFAULT_THRESHOLD_MS = 50.0
+
+
+def measure(command: list, runs: int) -> list:
+    """
+    多次运行命令并记录耗时
+
+    Args:
+        command: 命令参数列表
+        runs: 运行次数
+
+    Returns:
+        list: 每次运行的耗时（毫秒）
+    """
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="zai_analyze.py 启动耗时基准")
+    parser.add_argument("args", nargs="*", default=["version"], help="传给 zai_analyze.py 的参数（默认 version）")
+    parser.add_argument("-n", "--runs", type=int, default=20, help="运行次数（默认 20）")
+    parser.add_argument("--threshold-ms", type=float, default=DEFAULT_THRESHOLD_MS,
+                        help=f"中位数耗时上限（毫秒，默认 {DEFAULT_THRESHOLD_MS:g}）")
+    args = parser.parse_args()
+
+    command = [sys.executable, str(CLI_PATH)] + args.args
+    baseline = statistics.median(measure([sys.executable, "-c", "pass"], args.runs))
+    timings = measure(command, args.runs)
+    median = statistics.median(timings)
+
+    print(f"命令: zai_analyze.py {' '.join(args.args)}")
+    print(f"运行次数: {args.runs}")
+    print(f"中位数: {median:.1f} ms  最小: {min(timings):.1f} ms  最大: {max(timings):.1f} ms")
+    print(f"解释器空启动: {baseline:.1f} ms")
+
+    if median > args.threshold_ms:
+        print(f"❌ 启动耗时超过阈值 {args.threshold_ms:g} ms")
+        sys.exit(1)
+
+    print(f"✅ 启动耗时在阈值 {args.threshold_ms:g} ms 以内")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
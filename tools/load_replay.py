@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+"""
+生产流量回放压测工具
+按录制的请求轨迹（JSONL）重放到分析链路：视频请求经 SmartVideoAnalyzer（路由、内存准入、
+Base64编码、熔断器等与生产一致），其他工具请求经 execute_tool；只有Node.js脚本执行被替换为
+按轨迹中录制的耗时分布和错误率响应的本地模拟后端。依次在多个并发度下重放，报告吞吐量、
+端到端延迟 p50/p95/p99、错误率和主机资源用量，并给出吞吐量拐点，用于确定工作线程数
+
+轨迹格式（每行一个JSON对象，未列出的字段忽略）:
+    {"t": 12.5, "input": "https://example.com/a.mp4", "question": "...",
+     "strategy": "url_direct", "latency_seconds": 21.3, "ok": true}
+    {"t": 13.0, "size_mb": 6.2, "strategy": "base64_small", "latency_seconds": 35.0, "ok": false}
+    {"t": 20.1, "tool": "text_generation", "tool_input": {"prompt": "..."}, "latency_seconds": 2.4}
+    {"t": 21.0, "input": "...", "tenant": "shop-a", "priority": "interactive", ...}
+
+    t: 到达时间（秒，相对或绝对时间均可，按差值计算到达间隔）
+    input: 视频URL；本地文件的路径在压测机上通常不存在，改用 size_mb 生成同样大小的临时文件
+    latency_seconds: 生产环境中该请求的接口耗时，缺省时读取 timings.strategy_seconds
+    ok: 生产环境中是否成功，用于统计模拟后端的错误率
+    tenant / priority: 使用 --scheduler 时的租户和优先级（interactive / batch / backfill）
+"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows 没有 resource 模块
+    resource = None
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core import executor
+from src.core.executor import ScriptCancelled, execute_tool
+from src.core.circuit_breaker import get_circuit_breakers
+from src.core.transport import FixtureStore, ReplayBackend
+from src.analyzers.smart_analyzer import SmartVideoAnalyzer
+from src.analyzers.scheduler import AnalysisScheduler, Priority, DEFAULT_TENANT
+from src.utils.config_manager import ConfigManager, get_config_manager
+from src.utils.latency import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = "1,2,4,8,16"
+
+# 吞吐量达到最大值的该比例时视为已到拐点
+KNEE_THROUGHPUT_RATIO = 0.9
+
+# 轨迹中没有对应类型的耗时样本时，模拟后端使用的耗时（秒）
+DEFAULT_MOCK_LATENCY = 1.0
+
+# 内存采样间隔（秒）
+RSS_SAMPLE_INTERVAL = 0.2
+
+# 临时脚本文件名前缀 -> 请求类型（与轨迹中的策略/工具对应）
+SCRIPT_KINDS = {
+    "temp_url_script": "url",
+    "temp_base64_script": "base64",
+    "temp_video_analysis": "base64",
+    "temp_chat_script": "text",
+    "temp_image_script": "image",
+}
+
+# 轨迹中的策略/工具名 -> 请求类型（上传策略上传后按URL分析）
+TRACE_KINDS = {
+    "url_direct": "url",
+    "upload": "url",
+    "base64_small": "base64",
+    "base64_large": "base64",
+    "chat_completion": "text",
+    "text_generation": "text",
+    "image_understanding": "image",
+}
+
+
+def load_trace(path: Path) -> List[Dict[str, Any]]:
+    """
+    读取请求轨迹，到达时间换算为相对第一个请求的偏移
+
+    Args:
+        path: 轨迹文件路径（JSONL）
+
+    Returns:
+        List[Dict]: 按到达时间排序的请求列表
+    """
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                logger.warning(f"跳过第 {line_number} 行: {e}")
+
+    entries.sort(key=lambda entry: float(entry.get("t", 0.0)))
+    if entries:
+        origin = float(entries[0].get("t", 0.0))
+        for entry in entries:
+            entry["t"] = float(entry.get("t", 0.0)) - origin
+    return entries
+
+
+def _entry_kind(entry: Dict[str, Any]) -> Optional[str]:
+    """请求对应的模拟后端类型"""
+    return TRACE_KINDS.get(entry.get("tool") or entry.get("strategy") or "")
+
+
+def _entry_latency(entry: Dict[str, Any]) -> Optional[float]:
+    """请求在生产环境中的接口耗时"""
+    latency = entry.get("latency_seconds")
+    if latency is None:
+        latency = (entry.get("timings") or {}).get("strategy_seconds")
+    return float(latency) if latency is not None else None
+
+
+class MockBackend:
+    """模拟脚本执行后端：按录制的耗时分布等待后返回固定回答或错误"""
+
+    def __init__(self, entries: List[Dict[str, Any]], latency_scale: float = 1.0, seed: Optional[int] = None):
+        """
+        根据轨迹初始化耗时分布和错误率
+
+        Args:
+            entries: 轨迹请求列表
+            latency_scale: 耗时缩放系数（例如 0.01 表示以百分之一的时间快速回放）
+            seed: 随机数种子
+        """
+        self.latency_scale = latency_scale
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.error_rates: Dict[str, float] = {}
+
+        outcomes: Dict[str, List[bool]] = {}
+        for entry in entries:
+            kind = _entry_kind(entry) or "url"
+            latency = _entry_latency(entry)
+            if latency is not None:
+                self.samples.setdefault(kind, []).append(latency)
+            outcomes.setdefault(kind, []).append(bool(entry.get("ok", True)))
+
+        for kind, results in outcomes.items():
+            self.error_rates[kind] = results.count(False) / len(results)
+
+        self._all_samples = [sample for samples in self.samples.values() for sample in samples]
+
+    def _draw(self, kind: str):
+        """抽取一次耗时和是否失败"""
+        samples = self.samples.get(kind) or self._all_samples
+        with self._lock:
+            latency = self._random.choice(samples) if samples else DEFAULT_MOCK_LATENCY
+            failed = self._random.random() < self.error_rates.get(kind, 0.0)
+        return latency * self.latency_scale, failed
+
+    def __call__(
+        self,
+        script_path: Path,
+        timeout: float,
+        cancel_event: Optional[threading.Event] = None
+    ) -> subprocess.CompletedProcess:
+        """
+        模拟一次脚本执行（接口同 executor.run_node_script）
+
+        Raises:
+            subprocess.TimeoutExpired: 模拟耗时超过超时时间
+            ScriptCancelled: 等待期间被取消
+        """
+        kind = next(
+            (kind for prefix, kind in SCRIPT_KINDS.items() if script_path.name.startswith(prefix)), "url"
+        )
+        latency, failed = self._draw(kind)
+
+        waiter = cancel_event or threading.Event()
+        if waiter.wait(min(latency, timeout)):
+            raise ScriptCancelled(f"脚本执行已取消: {script_path.name}")
+        if latency > timeout:
+            raise subprocess.TimeoutExpired(["node", str(script_path)], timeout)
+
+        if failed:
+            response = {"error": "模拟后端错误", "code": "MOCK_ERROR"}
+        else:
+            response = {
+                "choices": [{"message": {"role": "assistant", "content": f"[mock:{kind}] 回放响应"}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+        return subprocess.CompletedProcess(["node", str(script_path)], 0, json.dumps(response), "")
+
+
+class _RssSampler:
+    """在后台线程中采样进程常驻内存峰值（依赖 /proc，其他平台不采样）"""
+
+    def __init__(self):
+        self.peak_mb: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with open("/proc/self/statm", 'r') as f:
+                    rss_mb = int(f.read().split()[1]) * self._page_size / (1024 * 1024)
+            except (OSError, ValueError, IndexError):
+                return
+            self.peak_mb = max(self.peak_mb or 0.0, rss_mb)
+            self._stop.wait(RSS_SAMPLE_INTERVAL)
+
+    def __enter__(self) -> "_RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _cpu_seconds() -> Optional[float]:
+    """本进程及已结束子进程的CPU时间（秒）"""
+    if resource is None:
+        return None
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+class TraceReplayer:
+    """按轨迹重放请求并统计各并发度下的表现"""
+
+    def __init__(
+        self,
+        entries: List[Dict[str, Any]],
+        work_dir: Path,
+        config_manager: ConfigManager,
+        speed: float = 1.0,
+        use_scheduler: bool = False
+    ):
+        """
+        初始化回放器
+
+        Args:
+            entries: 轨迹请求列表
+            work_dir: 存放生成的临时视频文件的目录
+            config_manager: 分析器使用的配置管理器
+            speed: 到达间隔加速倍数，0 表示不等待到达间隔（持续满负荷）
+            use_scheduler: 经 AnalysisScheduler 按轨迹中的 tenant / priority 调度，
+                否则按到达顺序分给工作线程
+        """
+        self.entries = entries
+        self.work_dir = Path(work_dir)
+        self.config_manager = config_manager
+        self.speed = speed
+        self.use_scheduler = use_scheduler
+        self._inputs: Dict[int, str] = {}
+
+    def _video_input(self, entry: Dict[str, Any]) -> Optional[str]:
+        """URL原样使用；本地文件按录制的大小生成临时文件（同样大小复用同一文件）"""
+        video_input = entry.get("input") or ""
+        if video_input.startswith(("http://", "https://")):
+            return video_input
+        if entry.get("size_mb") is None:
+            return video_input or None
+
+        size = int(float(entry["size_mb"]) * 1024 * 1024)
+        if size not in self._inputs:
+            path = self.work_dir / f"replay_{size}.mp4"
+            with open(path, 'wb') as f:
+                remaining = size
+                while remaining > 0:
+                    chunk = min(remaining, 1024 * 1024)
+                    f.write(os.urandom(chunk))
+                    remaining -= chunk
+            self._inputs[size] = str(path)
+        return self._inputs[size]
+
+    def prepare(self) -> None:
+        """预先生成所有临时视频文件，避免计入回放耗时"""
+        for entry in self.entries:
+            if not entry.get("tool"):
+                entry["_input"] = self._video_input(entry)
+
+    def _process(self, analyzer: SmartVideoAnalyzer, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """按生产方式处理一个请求"""
+        if entry.get("tool"):
+            # execute_tool 会修改输入中的消息，每次使用副本
+            return execute_tool(entry["tool"], json.loads(json.dumps(entry.get("tool_input") or {})))
+
+        if not entry.get("_input"):
+            return {"error": "轨迹记录缺少 input 或 size_mb"}
+        return analyzer.analyze(
+            entry["_input"], entry.get("question") or "请分析这个视频", show_plan=False
+        ) or {"error": "未返回结果"}
+
+    def run_level(self, concurrency: int) -> Dict[str, Any]:
+        """
+        以指定并发度重放整个轨迹
+
+        Args:
+            concurrency: 工作线程数（每个线程使用独立的分析器，与批量模式一致）
+
+        Returns:
+            Dict: 吞吐量、延迟百分位、错误率和资源用量
+        """
+        get_circuit_breakers().reset()
+        tracker = LatencyTracker(window_size=max(1, len(self.entries)))
+        errors: Dict[str, int] = {}
+        errors_lock = threading.Lock()
+
+        def finish(entry: Dict[str, Any], arrival: float, result: Optional[Dict[str, Any]]) -> None:
+            latency = time.monotonic() - arrival
+            tracker.record("latency", latency)
+            tracker.record(f"priority:{entry.get('priority', Priority.BATCH.value)}", latency)
+            if not result or "error" in result:
+                reason = str((result or {}).get("error", "未返回结果")).splitlines()[0][:80]
+                with errors_lock:
+                    errors[reason] = errors.get(reason, 0) + 1
+
+        if self.use_scheduler:
+            scheduler = AnalysisScheduler.from_config(concurrency, self.config_manager)
+
+            def dispatch(entry: Dict[str, Any], arrival: float) -> None:
+                def task(analyzer: SmartVideoAnalyzer) -> Dict[str, Any]:
+                    tracker.record("queue_wait", time.monotonic() - arrival)
+                    return self._process(analyzer, entry)
+
+                future = scheduler.submit_task(
+                    task,
+                    entry.get("tenant", DEFAULT_TENANT),
+                    entry.get("priority", Priority.BATCH.value)
+                )
+                future.add_done_callback(lambda done: finish(entry, arrival, done.result()))
+
+            def drain() -> None:
+                scheduler.shutdown()
+        else:
+            pending: queue.Queue = queue.Queue()
+
+            def worker() -> None:
+                analyzer = SmartVideoAnalyzer(self.config_manager, verbose=False)
+                while True:
+                    item = pending.get()
+                    if item is None:
+                        return
+                    entry, arrival = item
+                    tracker.record("queue_wait", time.monotonic() - arrival)
+                    finish(entry, arrival, self._process(analyzer, entry))
+
+            threads = [
+                threading.Thread(target=worker, name=f"replay-worker-{i}", daemon=True)
+                for i in range(concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+
+            def dispatch(entry: Dict[str, Any], arrival: float) -> None:
+                pending.put((entry, arrival))
+
+            def drain() -> None:
+                for _ in threads:
+                    pending.put(None)
+                for thread in threads:
+                    thread.join()
+
+        cpu_before = _cpu_seconds()
+        started = time.monotonic()
+
+        with _RssSampler() as sampler:
+            # 按录制的到达间隔投递请求（开环），排队时间计入端到端延迟
+            for entry in self.entries:
+                if self.speed > 0:
+                    delay = started + entry["t"] / self.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                dispatch(entry, time.monotonic())
+            drain()
+
+        elapsed = time.monotonic() - started
+        cpu_after = _cpu_seconds()
+        snapshot = tracker.snapshot()
+        latency = snapshot.get("latency", {})
+        failed = sum(errors.values())
+
+        return {
+            "concurrency": concurrency,
+            "requests": len(self.entries),
+            "seconds": round(elapsed, 3),
+            "throughput_rps": round(len(self.entries) / elapsed, 3) if elapsed > 0 else None,
+            "p50": latency.get("p50"),
+            "p95": latency.get("p95"),
+            "p99": latency.get("p99"),
+            "queue_wait_p95": tracker.percentile("queue_wait", 95),
+            "by_priority": {
+                key.split(":", 1)[1]: summary
+                for key, summary in snapshot.items() if key.startswith("priority:")
+            },
+            "error_rate": round(failed / len(self.entries), 4) if self.entries else 0.0,
+            "errors": errors,
+            "cpu_cores": round((cpu_after - cpu_before) / elapsed, 2)
+            if cpu_before is not None and elapsed > 0 else None,
+            "peak_rss_mb": round(sampler.peak_mb, 1) if sampler.peak_mb else None,
+            "load_average": os.getloadavg()[0] if hasattr(os, "getloadavg") else None,
+        }
+
+
+def find_knee(levels: List[Dict[str, Any]]) -> Optional[int]:
+    """
+    吞吐量拐点：吞吐量达到最大值 KNEE_THROUGHPUT_RATIO 的最小并发度
+
+    Args:
+        levels: 各并发度的统计结果
+
+    Returns:
+        Optional[int]: 并发度，无结果时返回None
+    """
+    measured = [level for level in levels if level["throughput_rps"]]
+    if not measured:
+        return None
+    best = max(level["throughput_rps"] for level in measured)
+    return min(
+        level["concurrency"] for level in measured
+        if level["throughput_rps"] >= best * KNEE_THROUGHPUT_RATIO
+    )
+
+
+def _format_seconds(value: Optional[float]) -> str:
+    return f"{value:.2f}" if value is not None else "-"
+
+
+def print_report(levels: List[Dict[str, Any]], knee: Optional[int]) -> None:
+    """打印各并发度的统计表格"""
+    print(f"{'并发':>6} {'吞吐(req/s)':>12} {'p50(s)':>8} {'p95(s)':>8} {'p99(s)':>8} "
+          f"{'错误率':>8} {'CPU核':>6} {'峰值RSS(MB)':>12}")
+    for level in levels:
+        print(
+            f"{level['concurrency']:>6} {level['throughput_rps'] or 0:>12.3f} "
+            f"{_format_seconds(level['p50']):>8} {_format_seconds(level['p95']):>8} "
+            f"{_format_seconds(level['p99']):>8} {level['error_rate']:>8.1%} "
+            f"{level['cpu_cores'] if level['cpu_cores'] is not None else '-':>6} "
+            f"{level['peak_rss_mb'] if level['peak_rss_mb'] is not None else '-':>12}"
+        )
+
+    for level in levels:
+        if len(level["by_priority"]) > 1:
+            print(f"\n并发 {level['concurrency']} 各优先级端到端延迟:")
+            for priority, summary in sorted(level["by_priority"].items()):
+                print(f"  {priority:<12} {summary['count']:>5} 个  p50 {_format_seconds(summary['p50'])}s  "
+                      f"p95 {_format_seconds(summary['p95'])}s  p99 {_format_seconds(summary['p99'])}s")
+
+    if knee is not None:
+        print(f"\n吞吐量拐点: 并发 {knee}（达到最大吞吐量的 {KNEE_THROUGHPUT_RATIO:.0%}）")
+
+
+def _replay_config(work_dir: Path, memory_budget_mb: Optional[float]) -> ConfigManager:
+    """
+    基于当前用户偏好创建回放用的配置：关闭URL预检和上传策略，避免回放时访问外部服务
+
+    Args:
+        work_dir: 临时目录
+        memory_budget_mb: 内存预算（MB），None 时沿用当前配置
+
+    Returns:
+        ConfigManager: 配置管理器
+    """
+    source = get_config_manager()
+    config = ConfigManager(work_dir / "config")
+    if source.mcp_config_path.exists():
+        shutil.copy(source.mcp_config_path, config.mcp_config_path)
+
+    prefs = dict(source.load_user_preferences())
+    prefs["url_preflight"] = False
+    prefs["upload_bucket"] = None
+    if memory_budget_mb is not None:
+        prefs["memory_budget_mb"] = memory_budget_mb
+    config.save_user_preferences(prefs)
+    return config
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="按生产请求轨迹回放压测（模拟后端），扫描并发度")
+    parser.add_argument("trace", help="请求轨迹文件（JSONL）")
+    parser.add_argument("-c", "--concurrency", default=DEFAULT_CONCURRENCY,
+                        help=f"逗号分隔的并发度列表（默认 {DEFAULT_CONCURRENCY}）")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="到达间隔加速倍数，0 表示不等待到达间隔、持续满负荷（默认 1）")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="模拟后端耗时缩放系数，例如 0.01 以百分之一的时间回放（默认 1）")
+    parser.add_argument("--memory-budget", type=float, help="内存预算（MB），默认沿用当前配置")
+    parser.add_argument("--seed", type=int, help="模拟后端随机数种子")
+    parser.add_argument("--fixtures", help="改用录制的夹具回放响应（zai_analyze.py --record 录制的目录），"
+                                           "耗时按 --latency-scale 缩放")
+    parser.add_argument("--scheduler", action="store_true",
+                        help="经分析调度器按 tenant / priority 调度（租户配置读取 scheduler_tenants 偏好）")
+    parser.add_argument("-o", "--output", help="将统计结果写入JSON文件")
+    parser.add_argument("-v", "--verbose", action="store_true", help="显示分析链路的日志")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    entries = load_trace(Path(args.trace))
+    if not entries:
+        print("❌ 轨迹为空")
+        sys.exit(1)
+
+    levels = [int(value) for value in args.concurrency.split(",") if value.strip()]
+    mock = MockBackend(entries, args.latency_scale, args.seed)
+    if args.fixtures:
+        backend = ReplayBackend(FixtureStore(Path(args.fixtures)), args.latency_scale)
+    else:
+        backend = mock
+
+    with tempfile.TemporaryDirectory(prefix="zai_replay_") as work_dir:
+        replayer = TraceReplayer(
+            entries, Path(work_dir), _replay_config(Path(work_dir), args.memory_budget), args.speed, args.scheduler
+        )
+        replayer.prepare()
+
+        print(f"轨迹: {args.trace}（{len(entries)} 个请求，时长 {entries[-1]['t']:.1f} 秒）")
+        if args.fixtures:
+            print(f"回放夹具: {args.fixtures}\n")
+        else:
+            print(f"模拟后端错误率: {', '.join(f'{k}={v:.1%}' for k, v in mock.error_rates.items())}\n")
+
+        previous = executor.set_script_backend(backend)
+        try:
+            results = []
+            for concurrency in levels:
+                results.append(replayer.run_level(concurrency))
+                logger.info(f"并发 {concurrency} 完成")
+        finally:
+            executor.set_script_backend(previous)
+
+    knee = find_knee(results)
+    print_report(results, knee)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"trace": args.trace, "levels": results, "knee": knee}, f, ensure_ascii=False, indent=2)
+        print(f"统计结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()